@@ -1,5 +1,11 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.monitoring import ConnectionPoolListener
+from typing import Optional
+import asyncio
 from app.config.settings import settings
+from app.config.mock_engine import MockCollection
+from app.config.indexes import INDEX_REGISTRY, ensure_indexes, index_report
+from app.services.write_coalescer import write_coalescer
 import logging
 from datetime import datetime
 
@@ -8,6 +14,9 @@ logger = logging.getLogger(__name__)
 class Database:
     client: AsyncIOMotorClient = None
     database = None
+    connected_at: Optional[datetime] = None
+    reconnect_task: Optional[asyncio.Task] = None
+    index_task: Optional[asyncio.Task] = None
 
 db = Database()
 
@@ -17,7 +26,7 @@ now = datetime.utcnow().isoformat()
 # Demo users for testing
 demo_users = [
     {
-        "_id": "1",
+        "_id": "000000000000000000000001",
         "username": "admin",
         "email": "admin@meditrack.com",
         "password_hash": "$2b$12$QgEzpNpFI3foQCpXrEpaZuwWFjfOQY.uPmzBHaFrBhcgcyscu3zmO",  # admin123
@@ -25,6 +34,7 @@ demo_users = [
         "profile": {
             "firstName": "Admin",
             "lastName": "User",
+            "phone": "+1000000001",
             "title": "System Administrator"
         },
         "isActive": True,
@@ -32,7 +42,7 @@ demo_users = [
         "createdAt": now
     },
     {
-        "_id": "2",
+        "_id": "000000000000000000000002",
         "username": "doctor",
         "email": "doctor@meditrack.com",
         "password_hash": "$2b$12$kIvRvrTonbEt4nPOyAezG.t2E/HQbj.2LYk0VHbsHA65P8M1wQeMi",  # doctor123
@@ -40,6 +50,7 @@ demo_users = [
         "profile": {
             "firstName": "Dr. John",
             "lastName": "Smith",
+            "phone": "+1000000002",
             "title": "Cardiologist",
             "specialization": "Cardiology",
             "licenseNumber": "MD123456"
@@ -49,7 +60,7 @@ demo_users = [
         "createdAt": now
     },
     {
-        "_id": "3",
+        "_id": "000000000000000000000003",
         "username": "nurse",
         "email": "nurse@meditrack.com",
         "password_hash": "$2b$12$He.SGA6aikcEhSEFMGahzeIt2tZ7/aIm9NkNoN.Hhgs.TwIsPeIzy",  # nurse123
@@ -57,6 +68,7 @@ demo_users = [
         "profile": {
             "firstName": "Jane",
             "lastName": "Doe",
+            "phone": "+1000000003",
             "title": "Registered Nurse",
             "department": "Emergency",
             "licenseNumber": "RN789012"
@@ -69,43 +81,164 @@ demo_users = [
 
 # Simple in-memory database for demo (fallback when MongoDB is not available)
 mock_database = {
-    "users": demo_users.copy(),  # Initialize with demo users
-    "patients": [],
-    "vitals": [],
-    "appointments": [],
-    "prescriptions": [],
-    "reports": []
+    name: MockCollection(name, demo_users if name == "users" else [], indexes)
+    for name, indexes in INDEX_REGISTRY.items()
 }
 
-async def connect_to_mongo():
-    """Create database connection"""
+class PoolStatsListener(ConnectionPoolListener):
+    """Tracks connection pool utilization from driver CMAP events"""
+    
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+    
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    
+    def connection_created(self, event):
+        self.open += 1
+    
+    def connection_closed(self, event):
+        self.open = max(self.open - 1, 0)
+    
+    def connection_check_out_started(self, event):
+        self.waiting += 1
+    
+    def connection_check_out_failed(self, event):
+        self.waiting = max(self.waiting - 1, 0)
+        self.checkout_failures += 1
+    
+    def connection_checked_out(self, event):
+        self.waiting = max(self.waiting - 1, 0)
+        self.checked_out += 1
+    
+    def connection_checked_in(self, event):
+        self.checked_out = max(self.checked_out - 1, 0)
+    
+    def stats(self) -> dict:
+        return {
+            "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+            "open": self.open,
+            "inUse": self.checked_out,
+            "waiting": self.waiting,
+            "utilization": round(self.checked_out / settings.MONGO_MAX_POOL_SIZE, 3) if settings.MONGO_MAX_POOL_SIZE else 0.0,
+            "checkoutFailures": self.checkout_failures
+        }
+
+pool_stats = PoolStatsListener()
+
+def create_client() -> AsyncIOMotorClient:
+    """Build a Motor client with the configured pool, timeouts and compression"""
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "event_listeners": [pool_stats],
+    }
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return AsyncIOMotorClient(settings.DATABASE_URL, **options)
+
+async def _ping() -> bool:
     try:
-        db.client = AsyncIOMotorClient(settings.DATABASE_URL)
-        db.database = db.client.get_database("meditrack")
-        
-        # Test the connection
         await db.client.admin.command('ping')
-        logger.info("Successfully connected to MongoDB")
-        
+        return True
     except Exception as e:
-        logger.warning(f"Failed to connect to MongoDB: {e}")
-        logger.info("Using mock database for demo purposes")
+        logger.debug(f"MongoDB ping failed: {e}")
+        return False
+
+async def _provision_indexes(database):
+    """Apply the declared indexes, logging instead of failing startup"""
+    try:
+        await ensure_indexes(database)
+    except Exception as e:
+        logger.error(f"Index provisioning failed: {e}")
+
+async def _use_mongo():
+    db.database = db.client.get_database("meditrack")
+    db.connected_at = datetime.utcnow()
+    # Index builds can take a while on large collections, so don't block on them
+    db.index_task = asyncio.create_task(_provision_indexes(db.database))
+
+async def _reconnect_loop():
+    """Switch from the mock store to MongoDB once it becomes reachable"""
+    while db.database is None:
+        await asyncio.sleep(settings.MONGO_RECONNECT_INTERVAL_SECONDS)
+        if await _ping():
+            await _use_mongo()
+            logger.warning("MongoDB is reachable again; switched from mock database to MongoDB "
+                           "(writes made to the mock database while offline are not migrated)")
+
+async def connect_to_mongo():
+    """Create database connection
+
+    Startup waits at most the server selection timeout for MongoDB. If it
+    is not reachable the mock database is served and a background task
+    keeps retrying, switching over as soon as a ping succeeds.
+    """
+    db.client = create_client()
+    if await _ping():
+        await _use_mongo()
+        logger.info("Successfully connected to MongoDB")
+    else:
         db.database = None
+        await _provision_indexes(MockDatabase())
+        logger.warning("Failed to connect to MongoDB")
+        logger.info("Using mock database until MongoDB becomes available")
+        db.reconnect_task = asyncio.create_task(_reconnect_loop())
 
 async def close_mongo_connection():
     """Close database connection"""
+    # Write out buffered touches while the connection is still open
+    await write_coalescer.stop()
+    for task in (db.reconnect_task, db.index_task):
+        if task and not task.done():
+            task.cancel()
+    db.reconnect_task = db.index_task = None
     if db.client:
         db.client.close()
         logger.info("Disconnected from MongoDB")
 
 async def get_database():
     """Get database instance"""
-    if db.database:
+    if db.database is not None:
         return db.database
     else:
         # Return mock database interface
         return MockDatabase()
 
+async def insert_document(collection, document: dict, return_document: bool = False) -> dict:
+    """Insert a document and return it as stored
+
+    By default the inserted document is returned with its new ``_id`` and no
+    extra read; ``return_document`` re-reads it so server-side defaults show up.
+    """
+    result = await collection.insert_one(document)
+    if return_document:
+        return await collection.find_one({"_id": result.inserted_id})
+    document["_id"] = result.inserted_id
+    return document
+
+async def database_status() -> dict:
+    """Readiness of the active database backend and its pool utilization"""
+    if db.database is None:
+        return {"backend": "mock", "ready": True, "mongoReachable": False, "indexes": index_report}
+    reachable = await _ping()
+    return {
+        "backend": "mongodb",
+        "ready": reachable,
+        "mongoReachable": reachable,
+        "connectedAt": db.connected_at,
+        "pool": pool_stats.stats(),
+        "indexes": index_report
+    }
+
 class MockDatabase:
     """Mock database for demo purposes"""
     
@@ -113,78 +246,12 @@ class MockDatabase:
         self.data = mock_database
     
     def __getattr__(self, name):
-        # Return a mock collection
-        return MockCollection(name, self.data.get(name, []))
-
-class MockCollection:
-    """Mock MongoDB collection for demo purposes"""
-    
-    def __init__(self, name, data):
-        self.name = name
-        self.data = data
-        self._id_counter = len(data) + 1
-    
-    async def find_one(self, query):
-        """Find one document"""
-        if "_id" in query:
-            doc_id = str(query["_id"])
-            for doc in self.data:
-                if str(doc.get("_id")) == doc_id:
-                    return doc
-        elif "$or" in query:
-            # Handle $or queries (for login)
-            for doc in self.data:
-                for condition in query["$or"]:
-                    if all(doc.get(key) == value for key, value in condition.items()):
-                        return doc
-        else:
-            # Handle simple field queries
-            for doc in self.data:
-                if all(doc.get(key) == value for key, value in query.items()):
-                    return doc
-        return None
-    
-    def find(self, query=None):
-        """Find documents"""
-        return MockCursor(self.data, query)
+        # Collections are created on first use and kept for the process lifetime
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if name not in self.data:
+            self.data[name] = MockCollection(name, [], INDEX_REGISTRY.get(name, []))
+        return self.data[name]
     
-    async def insert_one(self, document):
-        """Insert one document"""
-        document["_id"] = str(self._id_counter)
-        self._id_counter += 1
-        self.data.append(document)
-        return MockInsertResult(document["_id"])
-    
-    async def update_one(self, filter_query, update_query):
-        """Update one document"""
-        # Simple implementation
-        return MockUpdateResult()
-
-class MockCursor:
-    """Mock MongoDB cursor"""
-    
-    def __init__(self, data, query=None):
-        self.data = data
-        self.query = query or {}
-    
-    def skip(self, n):
-        return self
-    
-    def limit(self, n):
-        return self
-    
-    async def to_list(self, length=None):
-        """Convert cursor to list"""
-        return self.data[:length] if length else self.data
-
-class MockInsertResult:
-    """Mock insert result"""
-    
-    def __init__(self, inserted_id):
-        self.inserted_id = inserted_id
-
-class MockUpdateResult:
-    """Mock update result"""
-    
-    def __init__(self):
-        self.modified_count = 1
+    def __getitem__(self, name):
+        return self.__getattr__(name)
@@ -0,0 +1,82 @@
+"""Declarative index registry.
+
+Each model module owns the indexes of its collection; this module collects
+them so that MongoDB (``ensure_indexes`` at startup) and the fallback
+engine (``MockCollection``) are built from the same declarations.
+"""
+from typing import Any, Dict, List
+import logging
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app.models.appointment import APPOINTMENT_INDEXES
+from app.models.doctor import DOCTOR_INDEXES
+from app.models.patient import PATIENT_INDEXES
+from app.models.report import BLOB_INDEXES, REPORT_INDEXES
+from app.models.user import USER_INDEXES
+from app.models.vital import VITAL_BUCKET_INDEXES, VITAL_INDEXES, VITAL_ROLLUP_INDEXES
+
+logger = logging.getLogger(__name__)
+
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "users": USER_INDEXES,
+    "patients": PATIENT_INDEXES,
+    "doctors": DOCTOR_INDEXES,
+    "vitals": VITAL_INDEXES,
+    "vitals_buckets": VITAL_BUCKET_INDEXES,
+    "vital_rollups": VITAL_ROLLUP_INDEXES,
+    "appointments": APPOINTMENT_INDEXES,
+    "reports": REPORT_INDEXES,
+    "blobs": BLOB_INDEXES,
+    # Collections without a model module yet
+    "prescriptions": [
+        IndexModel([("patientId", ASCENDING), ("prescribedDate", DESCENDING)]),
+        IndexModel([("doctorId", ASCENDING), ("prescribedDate", DESCENDING)]),
+        IndexModel([("status", ASCENDING)]),
+    ],
+}
+
+# Result of the last ensure_indexes run, exposed through /health
+index_report: Dict[str, Any] = {}
+
+def _spec(info: Dict[str, Any]) -> tuple:
+    """Comparable (key, unique) pair from an index document or index_information entry"""
+    key = info["key"]
+    return (tuple((field, int(direction)) for field, direction in (key.items() if hasattr(key, "items") else key)),
+            bool(info.get("unique", False)))
+
+async def ensure_indexes(database) -> Dict[str, Any]:
+    """Create missing declared indexes and report missing, extra and conflicting ones
+
+    Existing indexes are never dropped; extras and conflicts are only
+    reported so an operator can decide what to do with them.
+    """
+    report: Dict[str, Any] = {"created": {}, "extra": {}, "conflicts": {}}
+    for collection_name, declared in INDEX_REGISTRY.items():
+        collection = database[collection_name]
+        existing = await collection.index_information()
+        missing = []
+        for index in declared:
+            name = index.document["name"]
+            if name not in existing:
+                missing.append(index)
+            elif _spec(existing[name]) != _spec(index.document):
+                report["conflicts"].setdefault(collection_name, []).append(name)
+
+        if missing:
+            created = await collection.create_indexes(missing)
+            report["created"][collection_name] = created
+            logger.info(f"Created indexes on {collection_name}: {created}")
+
+        declared_names = {index.document["name"] for index in declared}
+        extra = sorted(name for name in existing if name != "_id_" and name not in declared_names)
+        if extra:
+            report["extra"][collection_name] = extra
+            logger.warning(f"Undeclared indexes on {collection_name}: {extra}")
+
+    for collection_name, names in report["conflicts"].items():
+        logger.warning(f"Indexes on {collection_name} differ from their declaration: {names}")
+
+    index_report.clear()
+    index_report.update(report)
+    return report
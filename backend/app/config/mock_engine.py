@@ -0,0 +1,946 @@
+"""In-process storage engine used when MongoDB is not available.
+
+Documents live in a dict keyed by ``_id`` (hash index). Every declared
+secondary index is kept as a sorted list of key tuples so equality and
+range predicates are answered with ``bisect`` instead of a collection scan.
+Queries are evaluated with a subset of MongoDB semantics: equality, dotted
+paths, ``$or``/``$and``/``$nor``, comparison operators, ``$in``/``$nin``,
+``$exists``, ``$regex``, ``$elemMatch`` and ``$not``; projections may
+``$slice`` arrays. Aggregation supports the ``$match``, ``$unwind`` and
+``$group`` (``$sum``) stages.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import heapq
+import re
+
+from bson import ObjectId
+from pymongo import DeleteOne, IndexModel, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, InvalidOperation
+
+from app.utils.dates import as_utc
+
+# Sentinel that sorts above every encoded key
+MAX_KEY = (99,)
+
+# Most distinct leading values an index scan will jump between before
+# falling back to walking the whole range
+SKIP_SCAN_LIMIT = 256
+
+_RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte"}
+
+_MISSING = object()
+
+def normalize(value: Any) -> Any:
+    """Normalize a value for equality comparison and hashing"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        # MongoDB stores instants in UTC; compare aware values with the naive UTC ones routes write
+        return as_utc(value)
+    return value
+
+
+def sort_key(value: Any) -> tuple:
+    """Encode a value so that mixed types order like BSON instead of raising"""
+    value = normalize(value)
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (7, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (8, value)
+    if isinstance(value, dict):
+        return (3, tuple((k, sort_key(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (4, tuple(sort_key(v) for v in value))
+    return (5, repr(value))
+
+
+@lru_cache(maxsize=1024)
+def split_path(path: str) -> Tuple[str, ...]:
+    return tuple(path.split("."))
+
+
+def resolve(doc: Dict[str, Any], path: str) -> List[Any]:
+    """Return every value reachable at a dotted path (arrays are expanded)"""
+    current = [doc]
+    for part in split_path(path):
+        found = []
+        for value in current:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    found.append(value[int(part)])
+                for item in value:
+                    if isinstance(item, dict) and part in item:
+                        found.append(item[part])
+        current = found
+        if not current:
+            return current
+
+    values = []
+    for value in current:
+        values.append(value)
+        if isinstance(value, list):
+            values.extend(value)
+    return values
+
+
+def first_value(doc: Dict[str, Any], path: str) -> Any:
+    """Return the scalar value at a dotted path, or None when missing"""
+    values = resolve(doc, path)
+    return values[0] if values else None
+
+
+@lru_cache(maxsize=256)
+def compile_regex(pattern: str, options: str = "") -> "re.Pattern":
+    flags = 0
+    for option in options:
+        flags |= {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}.get(option, 0)
+    return re.compile(pattern, flags)
+
+
+def _equals(values: List[Any], expected: Any) -> bool:
+    if expected is None and not values:
+        return True
+    if isinstance(expected, list):
+        return any(isinstance(v, list) and [normalize(x) for x in v] == [normalize(x) for x in expected]
+                   for v in values)
+    expected = normalize(expected)
+    return any(normalize(v) == expected for v in values)
+
+
+def _compare(values: List[Any], operator: str, operand: Any) -> bool:
+    bound = sort_key(operand)
+    for value in values:
+        key = sort_key(value)
+        if key[0] != bound[0]:
+            continue
+        if ((operator == "$gt" and key > bound) or (operator == "$gte" and key >= bound)
+                or (operator == "$lt" and key < bound) or (operator == "$lte" and key <= bound)):
+            return True
+    return False
+
+
+def _match_regex(values: List[Any], pattern: Any, options: str = "") -> bool:
+    regex = pattern if isinstance(pattern, re.Pattern) else compile_regex(pattern, options)
+    return any(isinstance(v, str) and regex.search(v) for v in values)
+
+
+def _match_operators(values: List[Any], condition: Dict[str, Any]) -> bool:
+    for operator, operand in condition.items():
+        if operator == "$eq":
+            matched = _equals(values, operand)
+        elif operator == "$ne":
+            matched = not _equals(values, operand)
+        elif operator in _RANGE_OPERATORS:
+            matched = _compare(values, operator, operand)
+        elif operator == "$in":
+            matched = any(_equals(values, item) for item in operand)
+        elif operator == "$nin":
+            matched = not any(_equals(values, item) for item in operand)
+        elif operator == "$exists":
+            matched = bool(values) == bool(operand)
+        elif operator == "$regex":
+            matched = _match_regex(values, operand, condition.get("$options", ""))
+        elif operator == "$options":
+            continue
+        elif operator == "$elemMatch":
+            elements = [item for value in values if isinstance(value, list) for item in value]
+            if is_operator_dict(operand):
+                matched = any(_match_operators([item], operand) for item in elements)
+            else:
+                matched = any(isinstance(item, dict) and match(item, operand) for item in elements)
+        elif operator == "$not":
+            matched = not (_match_regex(values, operand) if isinstance(operand, (str, re.Pattern))
+                           else _match_operators(values, operand))
+        else:
+            raise ValueError(f"Unsupported query operator: {operator}")
+        if not matched:
+            return False
+    return True
+
+
+def is_operator_dict(condition: Any) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(k.startswith("$") for k in condition)
+
+
+def match(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a MongoDB filter document against a document"""
+    if not query:
+        return True
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(match(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(match(doc, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(match(doc, sub) for sub in condition):
+                return False
+        else:
+            values = resolve(doc, key)
+            if is_operator_dict(condition):
+                if not _match_operators(values, condition):
+                    return False
+            elif isinstance(condition, re.Pattern):
+                if not _match_regex(values, condition):
+                    return False
+            elif not _equals(values, condition):
+                return False
+    return True
+
+
+def _equality_operands(condition: Any) -> Optional[List[Any]]:
+    """Return the values an index can seek to for an equality predicate"""
+    if isinstance(condition, re.Pattern):
+        return None
+    if not is_operator_dict(condition):
+        if isinstance(condition, (dict, list)):
+            return None
+        return [condition]
+    if set(condition) == {"$eq"}:
+        return [condition["$eq"]]
+    if set(condition) == {"$in"} and not any(isinstance(v, (dict, list, re.Pattern)) for v in condition["$in"]):
+        return list(condition["$in"])
+    return None
+
+
+def _copy_path(source: Dict[str, Any], target: Dict[str, Any], parts: Tuple[str, ...]):
+    value = source.get(parts[0], _MISSING)
+    if value is _MISSING:
+        return
+    if len(parts) == 1:
+        target[parts[0]] = value
+    elif isinstance(value, dict):
+        _copy_path(value, target.setdefault(parts[0], {}), parts[1:])
+
+
+def _drop_path(doc: Dict[str, Any], parts: Tuple[str, ...]):
+    if len(parts) == 1:
+        doc.pop(parts[0], None)
+    elif isinstance(doc.get(parts[0]), dict):
+        doc[parts[0]] = dict(doc[parts[0]])
+        _drop_path(doc[parts[0]], parts[1:])
+
+
+def _slice(values: Any, spec: Any) -> Any:
+    if not isinstance(values, list):
+        return values
+    if isinstance(spec, (list, tuple)):
+        skip, limit = spec
+        start = skip if skip >= 0 else max(len(values) + skip, 0)
+        return values[start:start + limit]
+    return values[:spec] if spec >= 0 else values[spec:]
+
+
+def project(doc: Dict[str, Any], projection: Optional[Any]) -> Dict[str, Any]:
+    """Apply an inclusion or exclusion projection (with ``$slice``), returning a new document"""
+    if not projection:
+        return dict(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get("_id", 1)
+    fields = {field: flag for field, flag in projection.items() if field != "_id" and not isinstance(flag, dict)}
+    slices = {field: spec["$slice"] for field, spec in projection.items() if isinstance(spec, dict)}
+
+    if any(fields.values()):
+        result = {"_id": doc["_id"]} if include_id and "_id" in doc else {}
+        for field, flag in fields.items():
+            if flag:
+                _copy_path(doc, result, split_path(field))
+        for field in slices:
+            _copy_path(doc, result, split_path(field))
+    else:
+        result = dict(doc)
+        for field in fields:
+            _drop_path(result, split_path(field))
+        if not include_id:
+            result.pop("_id", None)
+    for field, spec in slices.items():
+        parts = split_path(field)
+        value = result
+        for part in parts:
+            value = value.get(part, _MISSING) if isinstance(value, dict) else _MISSING
+        if value is not _MISSING:
+            _set_path(result, parts, _slice(value, spec))
+    return result
+
+
+def _set_path(doc: Dict[str, Any], parts: Tuple[str, ...], value: Any):
+    for part in parts[:-1]:
+        child = doc.get(part)
+        child = dict(child) if isinstance(child, dict) else {}
+        doc[part] = child
+        doc = child
+    doc[parts[-1]] = value
+
+
+def apply_update(doc: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of ``doc`` with ``$set``/``$unset``/``$inc``/``$min``/``$max``/``$push``/``$pull`` applied"""
+    updated = dict(doc)
+    for operator, fields in update.items():
+        for field, value in fields.items():
+            parts = split_path(field)
+            if operator == "$set":
+                _set_path(updated, parts, value)
+            elif operator == "$unset":
+                _drop_path(updated, parts)
+            elif operator == "$inc":
+                _set_path(updated, parts, (first_value(updated, field) or 0) + value)
+            elif operator == "$min":
+                current = first_value(updated, field)
+                if current is None or sort_key(value) < sort_key(current):
+                    _set_path(updated, parts, value)
+            elif operator == "$max":
+                current = first_value(updated, field)
+                if current is None or sort_key(value) > sort_key(current):
+                    _set_path(updated, parts, value)
+            elif operator == "$push":
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                _set_path(updated, parts, list(first_value(updated, field) or []) + list(items))
+            elif operator == "$pull":
+                current = first_value(updated, field)
+                if isinstance(current, list):
+                    _set_path(updated, parts, [
+                        item for item in current
+                        if not (match(item, value) if isinstance(value, dict) and isinstance(item, dict)
+                                else _equals([item], value))
+                    ])
+            elif operator == "$setOnInsert":
+                continue
+            else:
+                raise ValueError(f"Unsupported update operator: {operator}")
+    return updated
+
+
+def _group_key(doc: Dict[str, Any], expression: Any) -> Any:
+    if isinstance(expression, str) and expression.startswith("$"):
+        return first_value(doc, expression[1:])
+    if isinstance(expression, dict):
+        return {field: _group_key(doc, value) for field, value in expression.items()}
+    return expression
+
+
+def run_pipeline(documents: Iterable[Dict[str, Any]], pipeline: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Apply ``$match``/``$unwind``/``$group`` stages to a stream of documents"""
+    for stage in pipeline:
+        (operator, spec), = stage.items()
+        if operator == "$match":
+            documents = (doc for doc in documents if match(doc, spec))
+        elif operator == "$unwind":
+            documents = _unwind(documents, (spec["path"] if isinstance(spec, dict) else spec)[1:])
+        elif operator == "$group":
+            documents = _group(documents, spec)
+        else:
+            raise ValueError(f"Unsupported pipeline stage: {operator}")
+    return iter(documents)
+
+
+def _unwind(documents: Iterable[Dict[str, Any]], path: str) -> Iterator[Dict[str, Any]]:
+    parts = split_path(path)
+    for doc in documents:
+        value = first_value(doc, path)
+        for item in (value if isinstance(value, list) else [] if value is None else [value]):
+            unwound = dict(doc)
+            _set_path(unwound, parts, item)
+            yield unwound
+
+
+def _group(documents: Iterable[Dict[str, Any]], spec: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    accumulators = {field: expression for field, expression in spec.items() if field != "_id"}
+    for expression in accumulators.values():
+        if set(expression) != {"$sum"}:
+            raise ValueError(f"Unsupported accumulator: {expression}")
+    groups: Dict[Any, Dict[str, Any]] = {}
+    for doc in documents:
+        key = _group_key(doc, spec["_id"])
+        group = groups.setdefault(normalize(key) if not isinstance(key, dict) else repr(sorted(key.items())),
+                                  {"_id": key, **{field: 0 for field in accumulators}})
+        for field, expression in accumulators.items():
+            value = _group_key(doc, expression["$sum"])
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                group[field] += value
+    return iter(groups.values())
+
+
+class MockAggregateCursor:
+    """Result of ``aggregate``, consumed like a motor command cursor"""
+
+    def __init__(self, documents: Iterator[Dict[str, Any]]):
+        self._iterator = documents
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        return list(islice(self._iterator, length))
+
+
+class SortedIndex:
+    """Secondary index kept as a sorted list of ``(key..., _id)`` tuples"""
+
+    def __init__(self, keys: List[Tuple[str, int]], unique: bool = False, name: Optional[str] = None):
+        self.keys = list(keys)
+        self.fields = [field for field, _ in self.keys]
+        self.unique = unique
+        self.name = name or "_".join(f"{field}_{direction}" for field, direction in self.keys)
+        self.entries: List[tuple] = []
+        self.multikey = False
+        # Bumped on every change so open walks know to re-find their place by key
+        self.version = 0
+
+    def keys_for(self, doc: Dict[str, Any]) -> List[tuple]:
+        """Index keys for a document; array fields produce one key per element (multikey)"""
+        keys: List[tuple] = [()]
+        for field in self.fields:
+            values = [v for v in resolve(doc, field) if not isinstance(v, list)] or [None]
+            if len(values) > 1:
+                self.multikey = True
+                values = list(dict.fromkeys(sort_key(v) for v in values))
+            else:
+                values = [sort_key(values[0])]
+            keys = [key + (value,) for key in keys for value in values]
+        return keys
+
+    def build(self, docs: Dict[str, Dict[str, Any]]):
+        """Bulk-load the index from existing documents"""
+        self.entries = sorted(key + (sort_key(doc_id),) for doc_id, doc in docs.items()
+                              for key in self.keys_for(doc))
+        self.version += 1
+        if self.unique:
+            for previous, current in zip(self.entries, self.entries[1:]):
+                if previous[:-1] == current[:-1] and not self._is_null(current[:-1]):
+                    raise DuplicateKeyError(f"E11000 duplicate key error index: {self.name}")
+
+    def _is_null(self, key: tuple) -> bool:
+        return all(part == (0,) for part in key)
+
+    def check_unique(self, doc: Dict[str, Any], doc_id: str):
+        """Raise DuplicateKeyError if another document already holds this key"""
+        if not self.unique:
+            return
+        for key in self.keys_for(doc):
+            if self._is_null(key):
+                continue
+            position = bisect_left(self.entries, key)
+            while position < len(self.entries) and self.entries[position][:-1] == key:
+                if self.entries[position][-1] != sort_key(doc_id):
+                    raise DuplicateKeyError(f"E11000 duplicate key error index: {self.name} dup key: {key}")
+                position += 1
+
+    def add(self, doc_id: str, doc: Dict[str, Any]):
+        for key in self.keys_for(doc):
+            insort(self.entries, key + (sort_key(doc_id),))
+        self.version += 1
+
+    def remove(self, doc_id: str, doc: Dict[str, Any]):
+        for key in self.keys_for(doc):
+            entry = key + (sort_key(doc_id),)
+            position = bisect_left(self.entries, entry)
+            if position < len(self.entries) and self.entries[position] == entry:
+                del self.entries[position]
+        self.version += 1
+
+    @staticmethod
+    def _intervals(condition: Any) -> Optional[List[Tuple[tuple, tuple]]]:
+        """Key intervals ``[low, high)`` selected by a predicate on one field"""
+        if isinstance(condition, dict) and set(condition) == {"$elemMatch"} and is_operator_dict(condition["$elemMatch"]):
+            condition = condition["$elemMatch"]
+        operands = _equality_operands(condition)
+        if operands is not None:
+            keys = sorted({sort_key(v) for v in operands})
+            return [((key,), (key, MAX_KEY)) for key in keys]
+        if is_operator_dict(condition) and set(condition) & _RANGE_OPERATORS:
+            low, high = (), (MAX_KEY,)
+            for operator, operand in condition.items():
+                bound = sort_key(operand)
+                if operator == "$gte":
+                    low = (bound,)
+                elif operator == "$gt":
+                    low = (bound, MAX_KEY)
+                elif operator == "$lt":
+                    high = (bound,)
+                elif operator == "$lte":
+                    high = (bound, MAX_KEY)
+            return [(low, high)]
+        return None
+
+    def ranges(self, query: Dict[str, Any]) -> Optional[List[Tuple[int, int]]]:
+        """Translate a filter into ascending ``(lo, hi)`` slices of ``entries``, or None if unusable
+
+        After a range on one field the slice is split per distinct value
+        (skip scan) so predicates on the following fields still narrow it.
+        """
+        field_intervals = []
+        for field in self.fields:
+            intervals = self._intervals(query[field]) if field in query else None
+            if intervals is None:
+                break
+            field_intervals.append(intervals)
+        if not field_intervals:
+            return None
+
+        groups = [((), 0, len(self.entries))]
+        for depth, intervals in enumerate(field_intervals):
+            result = []
+            for prefix, lo, hi in groups:
+                for low, high in intervals:
+                    start = bisect_left(self.entries, prefix + low, lo, hi)
+                    end = bisect_left(self.entries, prefix + high, start, hi)
+                    if end > start:
+                        result.append((prefix, start, end))
+            if depth == len(field_intervals) - 1:
+                break
+            split = []
+            for prefix, lo, hi in result:
+                position = lo
+                while position < hi and len(split) <= SKIP_SCAN_LIMIT:
+                    value = self.entries[position][depth]
+                    end = bisect_left(self.entries, prefix + (value, MAX_KEY), position, hi)
+                    split.append((prefix + (value,), position, end))
+                    position = end
+            if len(split) > SKIP_SCAN_LIMIT:
+                break
+            groups = split
+        return [(lo, hi) for _, lo, hi in result]
+
+    def ids(self, ranges: List[Tuple[int, int]], reverse: bool = False) -> Iterator[str]:
+        """Document ids of ``ranges`` in key order
+
+        Positions shift when documents are written while a cursor is open
+        across an await, so the ranges are pinned to their first and last
+        entries and, after any change, the walk resumes just past the last
+        entry it returned.
+        """
+        bounds = [(self.entries[lo], self.entries[hi - 1]) for lo, hi in ranges if hi > lo]
+        return self._walk_bounds(bounds, reverse)
+
+    def _walk_bounds(self, bounds: List[Tuple[tuple, tuple]], reverse: bool) -> Iterator[str]:
+        seen = set()
+        for first, last in (reversed(bounds) if reverse else bounds):
+            version = self.version
+            if reverse:
+                position, stop = bisect_right(self.entries, last) - 1, bisect_left(self.entries, first) - 1
+            else:
+                position, stop = bisect_left(self.entries, first), bisect_right(self.entries, last)
+            while position != stop and 0 <= position < len(self.entries):
+                entry = self.entries[position]
+                doc_id = entry[-1][1]
+                if not self.multikey or doc_id not in seen:
+                    if self.multikey:
+                        seen.add(doc_id)
+                    yield doc_id
+                if self.version == version:
+                    position += -1 if reverse else 1
+                    continue
+                version = self.version
+                if reverse:
+                    position, stop = bisect_left(self.entries, entry) - 1, bisect_left(self.entries, first) - 1
+                else:
+                    position, stop = bisect_right(self.entries, entry), bisect_right(self.entries, last)
+
+
+class MockCollection:
+    """In-memory collection with a hash index on ``_id`` and sorted secondary indexes"""
+
+    def __init__(self, name: str, documents: Iterable[Dict[str, Any]] = (),
+                 indexes: Iterable[IndexModel] = ()):
+        self.name = name
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        for document in documents:
+            document = dict(document)
+            document.setdefault("_id", self._next_id())
+            self.docs[normalize(document["_id"])] = document
+        self.indexes: List[SortedIndex] = []
+        for index in indexes:
+            self._create_from_model(index)
+
+    def _next_id(self) -> str:
+        # Hex ObjectId strings, so routes can round-trip ids through ObjectId()
+        return str(ObjectId())
+
+    def create_index(self, keys: List[Tuple[str, int]], unique: bool = False, name: Optional[str] = None, **_):
+        """Create a secondary index (no-op if an index on the same keys exists)"""
+        for index in self.indexes:
+            if index.keys == list(keys):
+                return index.name
+        index = SortedIndex(keys, unique=unique, name=name)
+        index.build(self.docs)
+        self.indexes.append(index)
+        return index.name
+
+    def _create_from_model(self, index: IndexModel) -> str:
+        document = index.document
+        return self.create_index(list(document["key"].items()), unique=document.get("unique", False),
+                                 name=document["name"])
+
+    async def create_indexes(self, indexes: List[IndexModel]) -> List[str]:
+        """Create indexes from pymongo IndexModel declarations"""
+        return [self._create_from_model(index) for index in indexes]
+
+    async def index_information(self) -> Dict[str, Dict[str, Any]]:
+        """Describe indexes in the same shape as pymongo"""
+        information = {"_id_": {"key": [("_id", 1)]}}
+        for index in self.indexes:
+            information[index.name] = {"key": list(index.keys)}
+            if index.unique:
+                information[index.name]["unique"] = True
+        return information
+
+    def candidate_ids(self, query: Optional[Dict[str, Any]]) -> Optional[Iterable[str]]:
+        """Pick the narrowest index for a filter; None means a full scan is needed"""
+        if not query:
+            return None
+
+        if "_id" in query:
+            operands = _equality_operands(query["_id"])
+            if operands is not None:
+                return [normalize(v) for v in operands]
+
+        best_index, best_ranges, best_size = None, None, None
+        for index in self.indexes:
+            ranges = index.ranges(query)
+            if ranges is None:
+                continue
+            size = sum(hi - lo for lo, hi in ranges)
+            if best_size is None or size < best_size:
+                best_index, best_ranges, best_size = index, ranges, size
+        if best_index is not None:
+            return best_index.ids(best_ranges)
+
+        if "$or" in query:
+            branches = [self.candidate_ids(branch) for branch in query["$or"]]
+            if any(branch is None for branch in branches):
+                return None
+            return self._union(branches)
+        return None
+
+    @staticmethod
+    def _union(branches: List[Iterable[str]]) -> Iterator[str]:
+        seen = set()
+        for branch in branches:
+            for doc_id in branch:
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    yield doc_id
+
+    def iter_sorted(self, query: Optional[Dict[str, Any]],
+                    sort: List[Tuple[str, int]]) -> Optional[Iterator[Dict[str, Any]]]:
+        """Yield matches already in ``sort`` order by walking an index, or None if no index fits"""
+        query = query or {}
+        directions = {direction for _, direction in sort}
+        if len(directions) != 1:
+            return None
+        reverse = directions == {-1}
+        sort_fields = [field for field, _ in sort]
+
+        for index in self.indexes:
+            equality_prefix = 0
+            for field in index.fields:
+                operands = _equality_operands(query.get(field)) if field in query else None
+                if operands is None or len(operands) != 1:
+                    break
+                equality_prefix += 1
+            if index.fields[equality_prefix:equality_prefix + len(sort_fields)] != sort_fields:
+                continue
+            ranges = index.ranges(query)
+            if ranges is None:
+                ranges = [(0, len(index.entries))]
+            return self._walk(index, ranges, reverse, query)
+        return None
+
+    def _walk(self, index: SortedIndex, ranges: List[Tuple[int, int]], reverse: bool,
+              query: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for doc_id in index.ids(ranges, reverse):
+            doc = self.docs.get(doc_id)
+            if doc is not None and match(doc, query):
+                yield doc
+
+    def iter_matching(self, query: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield stored documents matching a filter, using an index when possible"""
+        candidates = self.candidate_ids(query)
+        if candidates is None:
+            # Snapshot the ids: callers may write to the collection between two documents
+            candidates = list(self.docs)
+        for doc_id in candidates:
+            doc = self.docs.get(doc_id)
+            if doc is not None and match(doc, query):
+                yield doc
+
+    async def find_one(self, query=None, projection=None):
+        """Find one document"""
+        for doc in self.iter_matching(query):
+            return project(doc, projection)
+        return None
+
+    def find(self, query=None, projection=None):
+        """Find documents"""
+        return MockCursor(self, query, projection)
+
+    async def count_documents(self, query=None):
+        """Count documents matching a filter"""
+        return sum(1 for _ in self.iter_matching(query))
+
+    def aggregate(self, pipeline):
+        """Run a pipeline; a leading ``$match`` is answered through the indexes"""
+        pipeline = list(pipeline)
+        query = pipeline.pop(0)["$match"] if pipeline and "$match" in pipeline[0] else None
+        return MockAggregateCursor(run_pipeline(self.iter_matching(query), pipeline))
+
+    def _insert(self, document):
+        if "_id" not in document:
+            document["_id"] = self._next_id()
+        doc_id = normalize(document["_id"])
+        if doc_id in self.docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error index: _id_ dup key: {doc_id}")
+        for index in self.indexes:
+            index.check_unique(document, doc_id)
+        stored = dict(document)
+        self.docs[doc_id] = stored
+        for index in self.indexes:
+            index.add(doc_id, stored)
+        return document["_id"]
+
+    async def insert_one(self, document):
+        """Insert one document"""
+        return MockInsertResult(self._insert(document))
+
+    async def insert_many(self, documents, ordered=True):
+        """Insert many documents; unordered inserts continue past duplicates"""
+        inserted_ids = []
+        write_errors = []
+        for position, document in enumerate(documents):
+            try:
+                inserted_ids.append(self._insert(document))
+            except DuplicateKeyError as e:
+                write_errors.append({"index": position, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": len(inserted_ids)})
+        return MockInsertManyResult(inserted_ids)
+
+    def _replace(self, doc_id: str, old: Dict[str, Any], new: Dict[str, Any]):
+        """Swap a stored document, keeping every index in step"""
+        for index in self.indexes:
+            index.check_unique(new, doc_id)
+        for index in self.indexes:
+            index.remove(doc_id, old)
+        self.docs[doc_id] = new
+        for index in self.indexes:
+            index.add(doc_id, new)
+
+    async def update_one(self, filter_query, update_query, upsert=False):
+        """Update one document"""
+        for doc in self.iter_matching(filter_query):
+            doc_id = normalize(doc["_id"])
+            updated = apply_update(doc, update_query)
+            if updated == doc:
+                return MockUpdateResult(matched_count=1, modified_count=0)
+            self._replace(doc_id, doc, updated)
+            return MockUpdateResult(matched_count=1, modified_count=1)
+
+        if not upsert:
+            return MockUpdateResult(matched_count=0, modified_count=0)
+        seed = {key: value for key, value in (filter_query or {}).items()
+                if not key.startswith("$") and not is_operator_dict(value)}
+        for key in list(seed):
+            if "." in key:
+                _set_path(seed, split_path(key), seed.pop(key))
+        document = apply_update(seed, {**update_query, "$set": {**update_query.get("$setOnInsert", {}),
+                                                                  **update_query.get("$set", {})}})
+        result = await self.insert_one(document)
+        return MockUpdateResult(matched_count=0, modified_count=0, upserted_id=result.inserted_id)
+
+    async def delete_one(self, filter_query):
+        """Delete one document"""
+        for doc in self.iter_matching(filter_query):
+            doc_id = normalize(doc["_id"])
+            for index in self.indexes:
+                index.remove(doc_id, doc)
+            del self.docs[doc_id]
+            return MockDeleteResult(1)
+        return MockDeleteResult(0)
+
+    async def bulk_write(self, requests, ordered=True):
+        """Apply pymongo InsertOne/UpdateOne/DeleteOne requests"""
+        result = MockBulkWriteResult()
+        write_errors = []
+        for position, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    await self.insert_one(request._doc)
+                    result.inserted_count += 1
+                elif isinstance(request, UpdateOne):
+                    outcome = await self.update_one(request._filter, request._doc, upsert=request._upsert)
+                    result.matched_count += outcome.matched_count
+                    result.modified_count += outcome.modified_count
+                    if outcome.upserted_id is not None:
+                        result.upserted_ids[position] = outcome.upserted_id
+                elif isinstance(request, DeleteOne):
+                    result.deleted_count += (await self.delete_one(request._filter)).deleted_count
+                else:
+                    raise TypeError(f"Unsupported bulk request: {request!r}")
+            except DuplicateKeyError as e:
+                write_errors.append({"index": position, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": result.inserted_count,
+                                  "nMatched": result.matched_count, "nModified": result.modified_count})
+        return result
+
+
+class _Descending:
+    """Sort key wrapper that inverts ordering for descending sort fields"""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+class MockCursor:
+    """Lazy cursor: filtering, sorting, skip and limit are applied while iterating"""
+
+    def __init__(self, collection: MockCollection, query=None, projection=None):
+        self.collection = collection
+        self.query = query or {}
+        self.projection = projection
+        self._sort: Optional[List[Tuple[str, int]]] = None
+        self._skip = 0
+        self._limit = 0
+        self._iterator: Optional[Iterator[Dict[str, Any]]] = None
+
+    def _check_unused(self):
+        if self._iterator is not None:
+            raise InvalidOperation("Cannot set cursor options after executing query")
+
+    def sort(self, key_or_list, direction=None):
+        self._check_unused()
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction or 1)]
+        else:
+            self._sort = [(key, int(value)) for key, value in key_or_list]
+        return self
+
+    def skip(self, n):
+        self._check_unused()
+        self._skip = max(int(n), 0)
+        return self
+
+    def limit(self, n):
+        self._check_unused()
+        self._limit = abs(int(n))
+        return self
+
+    def _sort_key(self, doc: Dict[str, Any]) -> tuple:
+        return tuple(sort_key(first_value(doc, field)) if direction >= 0
+                     else _Descending(sort_key(first_value(doc, field)))
+                     for field, direction in self._sort)
+
+    def _documents(self) -> Iterator[Dict[str, Any]]:
+        end = self._skip + self._limit if self._limit else None
+        if not self._sort:
+            matching = self.collection.iter_matching(self.query)
+        else:
+            matching = self.collection.iter_sorted(self.query, self._sort)
+            if matching is None:
+                candidates = self.collection.iter_matching(self.query)
+                if end is not None:
+                    # Bounded heap: memory scales with skip + limit, not the collection
+                    matching = iter(heapq.nsmallest(end, candidates, key=self._sort_key))
+                else:
+                    matching = iter(sorted(candidates, key=self._sort_key))
+        for doc in islice(matching, self._skip, end):
+            yield project(doc, self.projection)
+
+    def _ensure_iterator(self) -> Iterator[Dict[str, Any]]:
+        if self._iterator is None:
+            self._iterator = self._documents()
+        return self._iterator
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._ensure_iterator())
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        """Convert cursor to list"""
+        return list(islice(self._ensure_iterator(), length))
+
+
+class MockInsertResult:
+    """Mock insert result"""
+
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class MockInsertManyResult:
+    """Mock insert_many result"""
+
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+class MockDeleteResult:
+    """Mock delete result"""
+
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class MockBulkWriteResult:
+    """Mock bulk write result"""
+
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.deleted_count = 0
+        self.upserted_ids: Dict[int, Any] = {}
+
+    @property
+    def upserted_count(self):
+        return len(self.upserted_ids)
+
+
+class MockUpdateResult:
+    """Mock update result"""
+
+    def __init__(self, matched_count=1, modified_count=1, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
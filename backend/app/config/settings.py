@@ -4,19 +4,90 @@ from typing import List
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "mongodb://localhost:27017/meditrack"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 10
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 2000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 3000
+    MONGO_COMPRESSORS: str = "zstd,zlib"  # add snappy if python-snappy is installed
+    MONGO_RECONNECT_INTERVAL_SECONDS: float = 5.0
     
     # Security
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    TOKEN_CACHE_SIZE: int = 4096
+    
+    # Password hashing pool
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 500
+    
+    # Write coalescing (lastLogin / updatedAt touches)
+    WRITE_COALESCE_INTERVAL_MS: int = 200
+    WRITE_COALESCE_MAX_BATCH: int = 500
+    
+    # Patient IDs (0-999, unique per worker; -1 derives one from host and PID)
+    PATIENT_ID_NODE: int = -1
+    
+    # Vitals ingestion
+    VITALS_INSERT_BATCH_SIZE: int = 1000
+    VITALS_MAX_INFLIGHT_BATCHES: int = 4
+    VITALS_MAX_PENDING_READINGS: int = 50000
+    VITALS_BULK_MAX_READINGS: int = 5000
+    VITALS_STORAGE: str = "documents"  # "documents" (one per reading) or "buckets" (hourly per patient)
+    VITALS_BUCKET_MAX_READINGS: int = 720
+    VITALS_LATEST_CACHE_SIZE: int = 20000
+    VITALS_LATEST_CACHE_TTL_SECONDS: float = 10.0
+    VITALS_LATEST_MAX_PATIENTS: int = 500
+    
+    # Live vitals stream (Server-Sent Events)
+    VITALS_STREAM_MAX_SUBSCRIBERS: int = 5000
+    VITALS_STREAM_QUEUE_SIZE: int = 256
+    VITALS_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    VITALS_STREAM_TICKET_TTL_SECONDS: int = 30
+    
+    # Vitals trends (15m/1h/1d rollups maintained on ingest)
+    VITALS_TRENDS_MAX_BUCKETS: int = 5000
+    VITALS_TRENDS_MAX_RAW_MINUTES: int = 360  # 1m trends are read from raw readings
+    VITALS_ROLLUP_FLUSH_INTERVAL_MS: int = 500
+    VITALS_ROLLUP_MAX_BATCH: int = 10000  # queued readings that trigger an early flush
+    VITALS_ROLLUP_MAX_PENDING: int = 200000  # readings beyond this are left out of the rollups
+    
+    # Dashboard overview (materialized counters in the stats collection)
+    OVERVIEW_FLUSH_INTERVAL_MS: int = 1000
+    OVERVIEW_RECONCILE_INTERVAL_SECONDS: float = 300.0
+    OVERVIEW_CACHE_TTL_SECONDS: float = 5.0
+    OVERVIEW_APPOINTMENT_DAYS: int = 7  # upcoming days recounted on reconcile
+    
+    # Appointment availability (compiled schedules + booked-minute bitsets)
+    APPOINTMENT_SLOT_MINUTES: int = 15  # slot start grid
+    AVAILABILITY_CACHE_DAYS: int = 50000  # cached (doctor, day) entries
+    AVAILABILITY_CACHE_TTL_SECONDS: float = 60.0
+    AVAILABILITY_MAX_RANGE_DAYS: int = 31
+    
+    # Patient export (keyset-paged batches streamed to the client)
+    EXPORT_BATCH_SIZE: int = 1000
+    
+    # Vital-sign alert rules (per-patient bounds cache)
+    ALERT_RULE_CACHE_SIZE: int = 10000
+    ALERT_RULE_CACHE_TTL_SECONDS: float = 300.0
     
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:5173"
     
     # File Upload
     UPLOAD_DIR: str = "./uploads"
-    MAX_FILE_SIZE: int = 10485760  # 10MB
+    MAX_FILE_SIZE: int = 10485760  # 10MB, per file, enforced while streaming
+    UPLOAD_CHUNK_SIZE: int = 1048576  # bytes buffered per disk write
+    UPLOAD_MAX_FILES: int = 10  # files per upload request
+    BLOB_GC_INTERVAL_SECONDS: float = 3600.0  # recount blob references and delete unreferenced blobs
+    BLOB_GC_GRACE_SECONDS: float = 3600.0  # how long a blob stays unreferenced before it is deleted
+    PREVIEW_WORKERS: int = 2  # process pool rendering thumbnails / PDF previews
+    PREVIEW_MAX_QUEUE: int = 100  # uploads beyond this are stored without a preview
+    PREVIEW_SIZE: int = 256  # longest preview edge in pixels
+    DOWNLOAD_CHUNK_SIZE: int = 262144  # bytes per read when the server cannot sendfile
+    REPORT_CACHE_MAX_AGE_SECONDS: int = 3600  # browsers revalidate report files with If-None-Match after this
     
     # Email (Optional)
     EMAIL_HOST: str = "smtp.gmail.com"
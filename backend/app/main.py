@@ -1,12 +1,23 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import uvicorn
 import os
 from dotenv import load_dotenv
 
-from app.config.database import connect_to_mongo, close_mongo_connection
+from app.config.database import connect_to_mongo, close_mongo_connection, get_database, database_status
 from app.config.settings import settings
+from app.utils.auth import password_hasher, token_cache
+from app.services.write_coalescer import write_coalescer
+from app.services.vitals_ingest import vitals_ingestor
+from app.services.vital_alerts import alert_engine
+from app.services.latest_vitals import latest_vitals_cache
+from app.services.vitals_stream import vitals_broker
+from app.services.vital_trends import vital_rollups
+from app.services.overview_stats import overview_stats
+from app.services.availability import availability_index
+from app.services.appointment_booking import appointment_booker
+from app.services.blob_store import blob_store
+from app.services.report_files import report_files
 from app.routes import auth, patients, doctors, vitals, prescriptions, appointments, reports, analytics
 
 # Load environment variables
@@ -28,21 +39,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Content-Range", "Accept-Ranges"],
 )
 
-# Static files for uploads
-if not os.path.exists("uploads"):
-    os.makedirs("uploads")
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Uploaded files are only served through authenticated routes (GET /reports/{id}/download)
+if not os.path.exists(settings.UPLOAD_DIR):
+    os.makedirs(settings.UPLOAD_DIR)
 
 # Database events
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
+    write_coalescer.start(get_database)
+    vitals_broker.start(get_database)
+    overview_stats.start(get_database)
+    vital_rollups.start(get_database)
+    blob_store.start(get_database)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await vitals_broker.stop()
+    await overview_stats.stop()
+    await vital_rollups.stop()
+    await blob_store.stop()
     await close_mongo_connection()
+    password_hasher.shutdown()
+    report_files.shutdown()
 
 # Health check endpoint
 @app.get("/health")
@@ -50,9 +72,31 @@ async def health_check():
     return {
         "status": "healthy",
         "app": settings.APP_NAME,
-        "version": settings.APP_VERSION
+        "version": settings.APP_VERSION,
+        "database": await database_status(),
+        "passwordHashing": password_hasher.stats(),
+        "tokenCache": token_cache.stats(),
+        "writeCoalescer": write_coalescer.stats(),
+        "vitalsIngest": vitals_ingestor.stats(),
+        "vitalAlerts": alert_engine.stats(),
+        "latestVitalsCache": latest_vitals_cache.stats(),
+        "vitalsStream": vitals_broker.stats(),
+        "vitalRollups": vital_rollups.stats(),
+        "overviewStats": overview_stats.stats(),
+        "availability": availability_index.stats(),
+        "appointmentBooking": appointment_booker.stats(),
+        "reportFiles": report_files.stats(),
+        "blobStore": blob_store.stats()
     }
 
+# Readiness check (503 while the active database cannot serve requests)
+@app.get("/health/ready")
+async def readiness_check(response: Response):
+    database = await database_status()
+    if not database["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": database["ready"], "database": database}
+
 # API Routes
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
 app.include_router(patients.router, prefix="/api/v1/patients", tags=["patients"])
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class AlertCounts(BaseModel):
+    critical: int = 0
+    warning: int = 0
+    info: int = 0
+
+class DoctorWorkload(BaseModel):
+    doctorId: str
+    activePatients: int = 0
+    appointmentsToday: int = 0
+
+class OverviewResponse(BaseModel):
+    day: str  # UTC day the "today" figures refer to
+    activePatients: int
+    appointmentsToday: int
+    alertsToday: AlertCounts
+    doctorWorkload: List[DoctorWorkload] = []
+    updatedAt: Optional[datetime] = None
+    reconciledAt: Optional[datetime] = None
+    reconciling: bool = False  # no recount has finished yet; the figures are incomplete
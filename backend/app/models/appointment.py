@@ -0,0 +1,135 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+from enum import Enum
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+from .user import PyObjectId
+
+# Longest appointment the scheduler accepts (also bounds availability lookups)
+MAX_APPOINTMENT_MINUTES = 480
+
+class AppointmentType(str, Enum):
+    CONSULTATION = "consultation"
+    FOLLOW_UP = "follow_up"
+    EMERGENCY = "emergency"
+    CHECK_UP = "check_up"
+
+class AppointmentStatus(str, Enum):
+    SCHEDULED = "scheduled"
+    CONFIRMED = "confirmed"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+    NO_SHOW = "no_show"
+
+# Appointments in these states no longer occupy the doctor's time
+INACTIVE_APPOINTMENT_STATUSES = (AppointmentStatus.CANCELLED.value, AppointmentStatus.NO_SHOW.value)
+
+class AppointmentPriority(str, Enum):
+    NORMAL = "normal"
+    URGENT = "urgent"
+    EMERGENCY = "emergency"
+
+class CancelledBy(str, Enum):
+    PATIENT = "patient"
+    DOCTOR = "doctor"
+    SYSTEM = "system"
+
+class Appointment(BaseModel):
+    id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
+    appointmentId: str
+    patientId: PyObjectId
+    doctorId: PyObjectId
+    appointmentType: AppointmentType = AppointmentType.CONSULTATION
+    scheduledDate: datetime
+    duration: int = Field(30, ge=1, le=MAX_APPOINTMENT_MINUTES)  # minutes
+    status: AppointmentStatus = AppointmentStatus.SCHEDULED
+    reason: Optional[str] = None
+    symptoms: List[str] = []
+    notes: Optional[str] = None
+    priority: AppointmentPriority = AppointmentPriority.NORMAL
+    cancelledBy: Optional[CancelledBy] = None
+    cancellationReason: Optional[str] = None
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+    updatedAt: datetime = Field(default_factory=datetime.utcnow)
+    createdBy: Optional[PyObjectId] = None
+
+    class Config:
+        populate_by_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+class AppointmentCreate(BaseModel):
+    patientId: str
+    doctorId: str
+    appointmentType: AppointmentType = AppointmentType.CONSULTATION
+    scheduledDate: datetime
+    duration: int = Field(30, ge=1, le=MAX_APPOINTMENT_MINUTES)
+    reason: Optional[str] = None
+    symptoms: List[str] = []
+    notes: Optional[str] = None
+    priority: AppointmentPriority = AppointmentPriority.NORMAL
+
+class AppointmentCancel(BaseModel):
+    cancelledBy: CancelledBy = CancelledBy.PATIENT
+    cancellationReason: Optional[str] = None
+
+class AppointmentResponse(BaseModel):
+    id: str
+    appointmentId: str
+    patientId: str
+    doctorId: str
+    appointmentType: AppointmentType
+    scheduledDate: datetime
+    duration: int
+    status: AppointmentStatus
+    reason: Optional[str] = None
+    symptoms: List[str] = []
+    notes: Optional[str] = None
+    priority: AppointmentPriority
+    cancelledBy: Optional[CancelledBy] = None
+    cancellationReason: Optional[str] = None
+    createdAt: datetime
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "AppointmentResponse":
+        """Build a response from an appointments document"""
+        return cls(
+            id=str(doc["_id"]),
+            appointmentId=doc["appointmentId"],
+            patientId=str(doc["patientId"]),
+            doctorId=str(doc["doctorId"]),
+            appointmentType=doc.get("appointmentType", AppointmentType.CONSULTATION),
+            scheduledDate=doc["scheduledDate"],
+            duration=doc["duration"],
+            status=doc["status"],
+            reason=doc.get("reason"),
+            symptoms=doc.get("symptoms", []),
+            notes=doc.get("notes"),
+            priority=doc.get("priority", AppointmentPriority.NORMAL),
+            cancelledBy=doc.get("cancelledBy"),
+            cancellationReason=doc.get("cancellationReason"),
+            createdAt=doc["createdAt"]
+        )
+
+class AvailableSlot(BaseModel):
+    doctorId: str
+    department: Optional[str] = None
+    start: datetime
+    end: datetime
+
+class AvailabilityResponse(BaseModel):
+    start: datetime
+    end: datetime
+    duration: int  # minutes
+    slots: List[AvailableSlot] = []
+
+# Indexes for the appointments collection (provisioned at startup)
+APPOINTMENT_INDEXES = [
+    IndexModel([("appointmentId", ASCENDING)], unique=True),
+    IndexModel([("patientId", ASCENDING), ("scheduledDate", ASCENDING)]),
+    IndexModel([("doctorId", ASCENDING), ("scheduledDate", ASCENDING)]),
+    IndexModel([("scheduledDate", ASCENDING)]),
+    IndexModel([("status", ASCENDING)]),
+]
@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 from datetime import datetime, time
 from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
 from .user import PyObjectId
 
 class Qualification(BaseModel):
@@ -78,3 +79,9 @@ class DoctorResponse(BaseModel):
     rating: float
     totalPatients: int
     createdAt: datetime
+
+# Indexes for the doctors collection (provisioned at startup)
+DOCTOR_INDEXES = [
+    IndexModel([("licenseNumber", ASCENDING)], unique=True),
+    IndexModel([("userId", ASCENDING)]),
+]
@@ -1,8 +1,10 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
 from .user import PyObjectId, Gender, Address
+from .vital import AlertThresholds
 
 class EmergencyContact(BaseModel):
     name: str
@@ -32,6 +34,7 @@ class MedicalInfo(BaseModel):
     chronicConditions: List[str] = []
     medications: List[str] = []
     insuranceInfo: Optional[InsuranceInfo] = None
+    alertThresholds: Dict[str, AlertThresholds] = {}  # keyed by measurement, e.g. "heartRate"
 
 class Patient(BaseModel):
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
@@ -73,3 +76,31 @@ class PatientResponse(BaseModel):
     lastVisit: Optional[datetime] = None
     isActive: bool
     createdAt: datetime
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "PatientResponse":
+        """Build a response from a patients document"""
+        return cls(
+            id=str(doc["_id"]),
+            patientId=doc["patientId"],
+            personalInfo=doc["personalInfo"],
+            medicalInfo=doc["medicalInfo"],
+            assignedDoctor=str(doc["assignedDoctor"]) if doc.get("assignedDoctor") else None,
+            registrationDate=doc["registrationDate"],
+            lastVisit=doc.get("lastVisit"),
+            isActive=doc["isActive"],
+            createdAt=doc["createdAt"]
+        )
+
+# Indexes for the patients collection (provisioned at startup)
+PATIENT_INDEXES = [
+    IndexModel([("patientId", ASCENDING)], unique=True),
+    IndexModel([("personalInfo.email", ASCENDING)]),
+    IndexModel([("assignedDoctor", ASCENDING)]),
+    IndexModel([("personalInfo.firstName", ASCENDING), ("personalInfo.lastName", ASCENDING)]),
+    # Keyset pagination
+    IndexModel([("createdAt", ASCENDING), ("_id", ASCENDING)]),
+    # Normalized prefix search
+    IndexModel([("search.keys", ASCENDING)]),
+    IndexModel([("search.firstName", ASCENDING), ("search.lastName", ASCENDING)]),
+]
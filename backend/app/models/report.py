@@ -0,0 +1,114 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+from enum import Enum
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from .user import PyObjectId
+
+class ReportType(str, Enum):
+    LAB_TEST = "lab_test"
+    X_RAY = "x_ray"
+    MRI = "mri"
+    CT_SCAN = "ct_scan"
+    BLOOD_TEST = "blood_test"
+    OTHER = "other"
+
+class ReportStatus(str, Enum):
+    PENDING = "pending"
+    COMPLETED = "completed"
+    REVIEWED = "reviewed"
+
+class ReportPriority(str, Enum):
+    NORMAL = "normal"
+    URGENT = "urgent"
+    STAT = "stat"
+
+class ReportFile(BaseModel):
+    fileName: str
+    fileUrl: str
+    fileType: str  # pdf, png, jpeg, ... or the file extension
+    contentType: str
+    fileSize: int  # bytes
+    sha256: str
+    previewUrl: Optional[str] = None
+
+class Report(BaseModel):
+    id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
+    patientId: PyObjectId
+    doctorId: Optional[PyObjectId] = None
+    reportType: ReportType = ReportType.OTHER
+    title: str
+    description: Optional[str] = None
+    testDate: datetime = Field(default_factory=datetime.utcnow)
+    results: Dict[str, Any] = {}
+    normalRanges: Dict[str, str] = {}
+    interpretation: Optional[str] = None
+    files: List[ReportFile] = []
+    status: ReportStatus = ReportStatus.PENDING
+    priority: ReportPriority = ReportPriority.NORMAL
+    createdBy: Optional[PyObjectId] = None
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+    updatedAt: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        populate_by_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+class ReportCreate(BaseModel):
+    """Form fields sent alongside the files of an upload"""
+    patientId: str
+    doctorId: Optional[str] = None
+    reportType: ReportType = ReportType.OTHER
+    title: str = Field(..., min_length=1, max_length=200)
+    description: Optional[str] = None
+    testDate: Optional[datetime] = None
+    priority: ReportPriority = ReportPriority.NORMAL
+
+class ReportResponse(BaseModel):
+    id: str
+    patientId: str
+    doctorId: Optional[str] = None
+    reportType: ReportType
+    title: str
+    description: Optional[str] = None
+    testDate: datetime
+    results: Dict[str, Any] = {}
+    interpretation: Optional[str] = None
+    files: List[ReportFile] = []
+    status: ReportStatus
+    priority: ReportPriority
+    createdAt: datetime
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "ReportResponse":
+        """Build a response from a reports document"""
+        return cls(
+            id=str(doc["_id"]),
+            patientId=str(doc["patientId"]),
+            doctorId=str(doc["doctorId"]) if doc.get("doctorId") else None,
+            reportType=doc.get("reportType", ReportType.OTHER),
+            title=doc["title"],
+            description=doc.get("description"),
+            testDate=doc["testDate"],
+            results=doc.get("results", {}),
+            interpretation=doc.get("interpretation"),
+            files=doc.get("files", []),
+            status=doc.get("status", ReportStatus.PENDING),
+            priority=doc.get("priority", ReportPriority.NORMAL),
+            createdAt=doc["createdAt"]
+        )
+
+# Indexes for the reports collection (provisioned at startup)
+REPORT_INDEXES = [
+    IndexModel([("patientId", ASCENDING), ("testDate", DESCENDING)]),
+    IndexModel([("doctorId", ASCENDING), ("testDate", DESCENDING)]),
+    IndexModel([("reportType", ASCENDING)]),
+]
+
+# Indexes for the blobs collection behind report files (app.services.blob_store)
+BLOB_INDEXES = [
+    IndexModel([("head", ASCENDING)]),
+    IndexModel([("refCount", ASCENDING), ("updatedAt", ASCENDING)]),
+]
@@ -3,6 +3,8 @@ from typing import Optional, List
 from datetime import datetime
 from enum import Enum
 from bson import ObjectId
+from pydantic_core import core_schema
+from pymongo import ASCENDING, IndexModel
 
 class PyObjectId(ObjectId):
     @classmethod
@@ -16,8 +18,12 @@ class PyObjectId(ObjectId):
         return ObjectId(v)
 
     @classmethod
-    def __get_pydantic_json_schema__(cls, field_schema):
-        field_schema.update(type="string")
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        return core_schema.no_info_plain_validator_function(cls.validate)
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return {"type": "string"}
 
 class UserRole(str, Enum):
     ADMIN = "admin"
@@ -91,6 +97,20 @@ class UserResponse(BaseModel):
     lastLogin: Optional[datetime] = None
     createdAt: datetime
 
+    @classmethod
+    def from_document(cls, doc: dict) -> "UserResponse":
+        """Build a response from a users document"""
+        return cls(
+            id=str(doc["_id"]),
+            username=doc["username"],
+            email=doc["email"],
+            role=doc["role"],
+            profile=doc["profile"],
+            isActive=doc.get("isActive", True),
+            lastLogin=doc.get("lastLogin"),
+            createdAt=doc["createdAt"]
+        )
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -101,3 +121,11 @@ class TokenData(BaseModel):
     username: Optional[str] = None
     user_id: Optional[str] = None
     role: Optional[str] = None
+    scope: Optional[str] = None
+
+# Indexes for the users collection (provisioned at startup)
+USER_INDEXES = [
+    IndexModel([("email", ASCENDING)], unique=True),
+    IndexModel([("username", ASCENDING)], unique=True),
+    IndexModel([("role", ASCENDING)]),
+]
@@ -1,8 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from .user import PyObjectId
 
 class AlertSeverity(str, Enum):
@@ -10,6 +11,13 @@ class AlertSeverity(str, Enum):
     WARNING = "warning"
     CRITICAL = "critical"
 
+class AlertThresholds(BaseModel):
+    """Per-patient bounds for one measurement; unset bounds keep the default"""
+    criticalLow: Optional[float] = None
+    warningLow: Optional[float] = None
+    warningHigh: Optional[float] = None
+    criticalHigh: Optional[float] = None
+
 class VitalAlert(BaseModel):
     type: str
     message: str
@@ -48,6 +56,7 @@ class VitalCreate(BaseModel):
     patientId: str
     vitals: VitalsData
     notes: Optional[str] = None
+    recordedAt: Optional[datetime] = None  # device timestamp; defaults to receipt time
 
 class VitalUpdate(BaseModel):
     vitals: Optional[VitalsData] = None
@@ -63,5 +72,61 @@ class VitalResponse(BaseModel):
     recordedAt: datetime
     createdAt: datetime
 
+    @classmethod
+    def from_document(cls, doc: dict) -> "VitalResponse":
+        """Build a response from a vitals document"""
+        return cls(
+            id=str(doc["_id"]),
+            patientId=str(doc["patientId"]),
+            recordedBy=str(doc["recordedBy"]),
+            vitals=doc["vitals"],
+            notes=doc.get("notes"),
+            alerts=doc.get("alerts", []),
+            recordedAt=doc["recordedAt"],
+            createdAt=doc["createdAt"]
+        )
+
 class VitalsBulkCreate(BaseModel):
     vitals: List[VitalCreate]
+
+class VitalRejection(BaseModel):
+    index: int
+    reason: str
+
+class VitalsBulkResponse(BaseModel):
+    received: int
+    inserted: int
+    alerts: int
+    rejected: List[VitalRejection] = []
+
+class VitalTrendPoint(BaseModel):
+    t: datetime  # bucket start
+    count: int
+    min: float
+    max: float
+    mean: float
+    percentiles: Dict[str, float] = {}  # e.g. {"p50": 72.0}
+
+class VitalTrendsResponse(BaseModel):
+    patientId: str
+    resolution: str
+    start: datetime
+    end: datetime
+    series: Dict[str, List[VitalTrendPoint]]  # keyed by measurement, e.g. "bloodPressure.systolic"
+
+# Indexes for the vitals collection (provisioned at startup)
+VITAL_INDEXES = [
+    IndexModel([("patientId", ASCENDING), ("recordedAt", DESCENDING)]),
+    IndexModel([("recordedAt", DESCENDING)]),
+]
+
+# Indexes for hourly vitals buckets (VITALS_STORAGE=buckets)
+VITAL_BUCKET_INDEXES = [
+    IndexModel([("patientId", ASCENDING), ("bucketStart", DESCENDING)]),
+    IndexModel([("bucketStart", DESCENDING)]),
+]
+
+# Indexes for vitals trend rollups (one document per patient, resolution and bucket)
+VITAL_ROLLUP_INDEXES = [
+    IndexModel([("patientId", ASCENDING), ("resolution", ASCENDING), ("bucketStart", ASCENDING)], unique=True),
+]
@@ -1,7 +1,109 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Optional
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app.models.analytics import OverviewResponse
+from app.models.vital import VitalTrendsResponse
+from app.config.database import get_database
+from app.utils.auth import get_current_user_id, require_role
+from app.utils.dates import as_utc
+from app.services.overview_stats import overview_stats
+from app.services.vital_alerts import METRICS
+from app.services.vital_trends import RESOLUTIONS, vital_rollups
+import logging
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.get("/overview")
-async def get_analytics_overview():
-    return {"message": "Analytics endpoint - coming soon"}
+@router.get("/overview", response_model=OverviewResponse)
+async def get_analytics_overview(
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Get dashboard totals from the materialized stats document"""
+    try:
+        return await overview_stats.overview(db)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get analytics overview error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.get("/vitals/trends", response_model=VitalTrendsResponse)
+async def get_vitals_trends(
+    patientId: str = Query(..., description="Patient to chart"),
+    metrics: List[str] = Query([], description="Measurements to include, e.g. heartRate or bloodPressure.systolic (default: all)"),
+    start: Optional[datetime] = Query(None, description="Range start (inclusive); defaults to 7 days before end"),
+    end: Optional[datetime] = Query(None, description="Range end (exclusive); defaults to now"),
+    resolution: Optional[str] = Query(None, description="1m, 15m, 1h or 1d; defaults to the finest that fits the range"),
+    points: int = Query(500, ge=3, le=5000, description="Maximum points per series (LTTB downsampling)"),
+    percentiles: List[int] = Query([5, 50, 95], description="Percentiles to report per point"),
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Get downsampled min/max/mean/percentile trends of a patient's vitals"""
+    try:
+        if not ObjectId.is_valid(patientId):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid patient ID"
+            )
+        unknown = [metric for metric in metrics if metric not in METRICS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown measurement: {unknown[0]}"
+            )
+        if any(rank < 1 or rank > 99 for rank in percentiles):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Percentiles must be between 1 and 99"
+            )
+        if resolution is not None and resolution not in RESOLUTIONS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Resolution must be one of {', '.join(RESOLUTIONS)}"
+            )
+
+        end = as_utc(end) if end else datetime.utcnow()
+        start = as_utc(start) if start else end - timedelta(days=7)
+        if start >= end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="start must be before end"
+            )
+        if resolution is None:
+            resolution = vital_rollups.pick_resolution(start, end)
+            if resolution is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Range too long; trends cover at most {vital_rollups.max_buckets} days"
+                )
+        elif not vital_rollups.fits(resolution, start, end):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Range too long for {resolution} resolution; use a coarser one"
+            )
+
+        series = await vital_rollups.trends(
+            db, ObjectId(patientId), metrics or METRICS, resolution, start, end, points, sorted(set(percentiles))
+        )
+        if not metrics:
+            # Unrequested measurements the patient never had add nothing to the chart
+            series = {metric: values for metric, values in series.items() if values}
+        return VitalTrendsResponse(patientId=patientId, resolution=resolution, start=start, end=end, series=series)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get vitals trends error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
@@ -1,7 +1,254 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Optional
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app.models.appointment import (
+    Appointment, AppointmentCancel, AppointmentCreate, AppointmentResponse, AppointmentStatus,
+    AvailabilityResponse, INACTIVE_APPOINTMENT_STATUSES, MAX_APPOINTMENT_MINUTES
+)
+from app.config.database import get_database
+from app.config.settings import settings
+from app.utils.auth import get_current_user_id, require_role
+from app.utils.dates import as_utc
+from app.services.appointment_booking import SlotUnavailable, appointment_booker, claim_range
+from app.services.availability import availability_index, minute_mask
+from app.services.overview_stats import overview_stats
+from app.services.patient_ids import appointment_id_generator
+import logging
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/")
 async def get_appointments():
     return {"message": "Appointments endpoint - coming soon"}
+
+@router.post("/", response_model=AppointmentResponse, status_code=status.HTTP_201_CREATED)
+async def create_appointment(
+    appointment_data: AppointmentCreate,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Book an appointment; fails with 409 if the doctor is already booked then"""
+    try:
+        if not ObjectId.is_valid(appointment_data.patientId) or not ObjectId.is_valid(appointment_data.doctorId):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid patient or doctor ID"
+            )
+        scheduled = as_utc(appointment_data.scheduledDate)
+        if scheduled.second or scheduled.microsecond:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="scheduledDate must be on a whole minute"
+            )
+        if scheduled < datetime.utcnow():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="scheduledDate is in the past"
+            )
+
+        # Working hours come from the stored schedule, not the search roster cached for a minute
+        doctor = await availability_index.doctor(db, ObjectId(appointment_data.doctorId))
+        if doctor is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Doctor not found or not available"
+            )
+        try:
+            start, end = claim_range(scheduled, appointment_data.duration)[1:]
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        requested = minute_mask(start, end)
+        if doctor["hours"][scheduled.weekday()] & requested != requested:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Outside the doctor's working hours"
+            )
+        if not await db.patients.find_one({"_id": ObjectId(appointment_data.patientId)}, {"_id": 1}):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Patient not found"
+            )
+
+        appointment = Appointment(
+            appointmentId=appointment_id_generator.next_id(),
+            patientId=ObjectId(appointment_data.patientId),
+            doctorId=doctor["_id"],
+            appointmentType=appointment_data.appointmentType,
+            scheduledDate=scheduled,
+            duration=appointment_data.duration,
+            reason=appointment_data.reason,
+            symptoms=appointment_data.symptoms,
+            notes=appointment_data.notes,
+            priority=appointment_data.priority,
+            createdBy=ObjectId(current_user_id)
+        )
+        document = appointment.dict(by_alias=True)
+
+        # Reserve the doctor's time first; only the winner of a race writes an appointment
+        try:
+            await appointment_booker.claim(db, document)
+        except SlotUnavailable:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The doctor is already booked at that time"
+            )
+        try:
+            await db.appointments.insert_one(document)
+        except Exception:
+            await appointment_booker.release(db, document)
+            raise
+        overview_stats.appointment_changed(None, document)
+        availability_index.appointment_changed(None, document)
+
+        return AppointmentResponse.from_document(document)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Create appointment error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.get("/availability", response_model=AvailabilityResponse)
+async def get_availability(
+    specialization: Optional[str] = Query(None, description="e.g. cardiology"),
+    department: Optional[str] = None,
+    doctorId: List[str] = Query([], description="Only these doctors"),
+    start: Optional[datetime] = Query(None, description="Earliest slot start; defaults to now"),
+    end: Optional[datetime] = Query(None, description="Latest slot end; defaults to 7 days after start"),
+    duration: int = Query(30, ge=1, le=MAX_APPOINTMENT_MINUTES, description="Slot length in minutes"),
+    limit: int = Query(10, ge=1, le=500),
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Get the earliest free appointment slots across the matching doctors"""
+    try:
+        for doctor_id in doctorId:
+            if not ObjectId.is_valid(doctor_id):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid doctor ID"
+                )
+
+        now = datetime.utcnow()
+        # Slots in the past cannot be booked
+        start = max(as_utc(start), now) if start else now
+        end = as_utc(end) if end else start + timedelta(days=7)
+        if end <= start:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="end must be after start"
+            )
+        if end - start > timedelta(days=settings.AVAILABILITY_MAX_RANGE_DAYS):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Range cannot exceed {settings.AVAILABILITY_MAX_RANGE_DAYS} days"
+            )
+
+        slots = await availability_index.find_slots(
+            db, start, end, duration, limit,
+            specialization=specialization,
+            department=department,
+            doctor_ids=doctorId or None
+        )
+        return {"start": start, "end": end, "duration": duration, "slots": slots}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get availability error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.get("/{appointment_id}", response_model=AppointmentResponse)
+async def get_appointment(
+    appointment_id: str,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Get appointment by ID"""
+    try:
+        if not ObjectId.is_valid(appointment_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid appointment ID"
+            )
+        appointment = await db.appointments.find_one({"_id": ObjectId(appointment_id)})
+        if not appointment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Appointment not found"
+            )
+        return AppointmentResponse.from_document(appointment)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get appointment error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.post("/{appointment_id}/cancel", response_model=AppointmentResponse)
+async def cancel_appointment(
+    appointment_id: str,
+    cancellation: AppointmentCancel,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Cancel an appointment and free the doctor's time"""
+    try:
+        if not ObjectId.is_valid(appointment_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid appointment ID"
+            )
+        appointment = await db.appointments.find_one({"_id": ObjectId(appointment_id)})
+        if not appointment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Appointment not found"
+            )
+
+        updates = {
+            "status": AppointmentStatus.CANCELLED.value,
+            "cancelledBy": cancellation.cancelledBy.value,
+            "cancellationReason": cancellation.cancellationReason,
+            "updatedAt": datetime.utcnow(),
+        }
+        # Conditional on the status so two cancellations cannot both release the slot
+        result = await db.appointments.update_one(
+            {"_id": appointment["_id"], "status": {"$nin": list(INACTIVE_APPOINTMENT_STATUSES)}},
+            {"$set": updates}
+        )
+        if not result.matched_count:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Appointment is already cancelled"
+            )
+        await appointment_booker.release(db, appointment)
+        cancelled = {**appointment, **updates}
+        overview_stats.appointment_changed(appointment, cancelled)
+        availability_index.appointment_changed(appointment, cancelled)
+
+        return AppointmentResponse.from_document(cancelled)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Cancel appointment error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
@@ -1,36 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
-from app.models.user import User, UserCreate, UserLogin, Token, UserResponse
-from app.config.database import get_database
-from app.utils.auth import verify_password, get_password_hash, create_access_token, verify_token
+from app.models.user import User, UserCreate, UserLogin, Token, TokenData, UserResponse
+from app.config.database import get_database, insert_document
+from app.utils.auth import verify_password_async, get_password_hash_async, create_access_token, get_token_data
 from app.config.settings import settings
+from app.services.write_coalescer import write_coalescer
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 @router.get("/test")
 async def test_endpoint():
     """Simple test endpoint"""
     return {"message": "Auth router is working"}
 
+# Only the fields the login response and checks need
+LOGIN_PROJECTION = {
+    "username": 1,
+    "email": 1,
+    "password_hash": 1,
+    "role": 1,
+    "profile": 1,
+    "isActive": 1,
+    "lastLogin": 1,
+    "createdAt": 1
+}
+
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_database)):
     """User login endpoint"""
     try:
-        logger.info(f"Login attempt for username: {form_data.username}")
-        
-        # Find user by username or email
-        user_doc = await db.users.find_one({
-            "$or": [
-                {"username": form_data.username},
-                {"email": form_data.username}
-            ]
-        })
-        
-        logger.info(f"User found: {user_doc is not None}")
+        # Find user by username or email (served by the unique indexes)
+        user_doc = await db.users.find_one(
+            {"$or": [{"username": form_data.username}, {"email": form_data.username}]},
+            LOGIN_PROJECTION
+        )
         
         if not user_doc:
             raise HTTPException(
@@ -38,50 +44,32 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get
                 detail="Incorrect username or password"
             )
         
-        logger.info(f"Creating User object from doc")
-        user = User(**user_doc)
-        logger.info(f"User object created successfully")
-        
-        user = User(**user_doc)
-        
         # Verify password
-        if not verify_password(form_data.password, user.password_hash):
+        if not await verify_password_async(form_data.password, user_doc["password_hash"]):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password"
             )
         
         # Check if user is active
-        if not user.isActive:
+        if not user_doc.get("isActive", True):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Inactive user"
             )
         
+        user_response = UserResponse.from_document(user_doc)
+        
         # Create access token
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.username, "user_id": str(user.id), "role": user.role},
+            data={"sub": user_response.username, "user_id": user_response.id, "role": user_response.role},
             expires_delta=access_token_expires
         )
         
-        # Update last login
-        await db.users.update_one(
-            {"_id": user.id},
-            {"$set": {"lastLogin": datetime.utcnow()}}
-        )
-        
-        # Prepare user response
-        user_response = UserResponse(
-            id=str(user.id),
-            username=user.username,
-            email=user.email,
-            role=user.role,
-            profile=user.profile,
-            isActive=user.isActive,
-            lastLogin=user.lastLogin,
-            createdAt=user.createdAt
-        )
+        # Update last login in the next coalesced batch
+        write_coalescer.touch("users", user_doc["_id"], {"lastLogin": datetime.utcnow()})
+        logger.debug(f"Login succeeded for {user_response.username}")
         
         return Token(
             access_token=access_token,
@@ -99,7 +87,11 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get
         )
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db=Depends(get_database)):
+async def register(
+    user_data: UserCreate,
+    return_document: bool = Query(False, description="Re-read the stored document after inserting"),
+    db=Depends(get_database)
+):
     """User registration endpoint (Admin only in production)"""
     try:
         # Check if username or email already exists
@@ -117,7 +109,7 @@ async def register(user_data: UserCreate, db=Depends(get_database)):
             )
         
         # Hash password
-        password_hash = get_password_hash(user_data.password)
+        password_hash = await get_password_hash_async(user_data.password)
         
         # Create user document
         user = User(
@@ -128,22 +120,10 @@ async def register(user_data: UserCreate, db=Depends(get_database)):
             profile=user_data.profile
         )
         
-        # Insert user
-        result = await db.users.insert_one(user.dict(by_alias=True, exclude={"id"}))
-        
-        # Get created user
-        created_user = await db.users.find_one({"_id": result.inserted_id})
-        
-        return UserResponse(
-            id=str(created_user["_id"]),
-            username=created_user["username"],
-            email=created_user["email"],
-            role=created_user["role"],
-            profile=created_user["profile"],
-            isActive=created_user["isActive"],
-            lastLogin=created_user.get("lastLogin"),
-            createdAt=created_user["createdAt"]
-        )
+        # Insert user; the response is built from the document we just wrote
+        created_user = await insert_document(db.users, user.dict(by_alias=True, exclude={"id"}), return_document)
+        
+        return UserResponse.from_document(created_user)
         
     except HTTPException:
         raise
@@ -155,12 +135,10 @@ async def register(user_data: UserCreate, db=Depends(get_database)):
         )
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_database)):
+async def get_current_user(token_data: TokenData = Depends(get_token_data), db=Depends(get_database)):
     """Get current user information"""
     try:
-        # Verify token
-        payload = verify_token(token)
-        username = payload.get("sub")
+        username = token_data.username
         
         if username is None:
             raise HTTPException(
@@ -177,16 +155,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_d
                 detail="Could not validate credentials"
             )
         
-        return UserResponse(
-            id=str(user_doc["_id"]),
-            username=user_doc["username"],
-            email=user_doc["email"],
-            role=user_doc["role"],
-            profile=user_doc["profile"],
-            isActive=user_doc["isActive"],
-            lastLogin=user_doc.get("lastLogin"),
-            createdAt=user_doc["createdAt"]
-        )
+        return UserResponse.from_document(user_doc)
         
     except HTTPException:
         raise
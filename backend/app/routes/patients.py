@@ -1,62 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from app.models.patient import Patient, PatientCreate, PatientUpdate, PatientResponse
-from app.config.database import get_database
+from app.config.database import get_database, insert_document
+from app.config.settings import settings
 from app.utils.auth import get_current_user_id, require_role
+from app.utils.dates import as_utc
+from app.utils.pagination import KEYSET_SORT, encode_cursor, keyset_filter
+from app.services.patient_search import SEARCH_FIELD, build_search_document, build_search_filter
+from app.services.patient_ids import patient_id_generator
+from app.services.vital_alerts import alert_engine
+from app.services.overview_stats import overview_stats
+from app.services.patient_export import FORMATS, export_patients
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-def generate_patient_id() -> str:
-    """Generate unique patient ID"""
-    timestamp = int(datetime.utcnow().timestamp())
-    return f"P{timestamp}"
+# Inserts retried with a fresh patient ID after a unique-index clash
+PATIENT_ID_ATTEMPTS = 3
 
 @router.get("/", response_model=List[PatientResponse])
 async def get_patients(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, le=100),
     search: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Continuation token from X-Next-Cursor"),
     db=Depends(get_database),
     current_user_id: str = Depends(get_current_user_id),
     _: str = Depends(require_role(["admin", "doctor", "nurse"]))
 ):
-    """Get all patients with pagination and search"""
+    """Get all patients with pagination and search
+
+    Pages are ordered by (createdAt, _id). When a page is full the token for
+    the next one is returned in the ``X-Next-Cursor`` header; passing it back
+    as ``cursor`` seeks directly to that position instead of skipping.
+    """
     try:
         # Build query
         query = {"isActive": True}
         if search:
-            query["$or"] = [
-                {"personalInfo.firstName": {"$regex": search, "$options": "i"}},
-                {"personalInfo.lastName": {"$regex": search, "$options": "i"}},
-                {"patientId": {"$regex": search, "$options": "i"}},
-                {"personalInfo.email": {"$regex": search, "$options": "i"}}
-            ]
+            search_filter = build_search_filter(search)
+            if search_filter is None:
+                return []
+            query.update(search_filter)
+        
+        # Get patients (keyset seek when a cursor is given, offset otherwise)
+        if cursor:
+            db_cursor = db.patients.find(keyset_filter(query, cursor)).sort(KEYSET_SORT).limit(limit)
+        else:
+            db_cursor = db.patients.find(query).sort(KEYSET_SORT).skip(skip).limit(limit)
+        patients = await db_cursor.to_list(length=limit)
         
-        # Get patients
-        cursor = db.patients.find(query).skip(skip).limit(limit)
-        patients = await cursor.to_list(length=limit)
+        if patients and len(patients) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(patients[-1])
         
         # Convert to response format
-        response = []
+        page = []
         for patient in patients:
-            response.append(PatientResponse(
-                id=str(patient["_id"]),
-                patientId=patient["patientId"],
-                personalInfo=patient["personalInfo"],
-                medicalInfo=patient["medicalInfo"],
-                assignedDoctor=str(patient.get("assignedDoctor")) if patient.get("assignedDoctor") else None,
-                registrationDate=patient["registrationDate"],
-                lastVisit=patient.get("lastVisit"),
-                isActive=patient["isActive"],
-                createdAt=patient["createdAt"]
-            ))
-        
-        return response
+            page.append(PatientResponse.from_document(patient))
         
+        return page
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get patients error: {e}")
         raise HTTPException(
@@ -67,20 +78,15 @@ async def get_patients(
 @router.post("/", response_model=PatientResponse)
 async def create_patient(
     patient_data: PatientCreate,
+    return_document: bool = Query(False, description="Re-read the stored document after inserting"),
     db=Depends(get_database),
     current_user_id: str = Depends(get_current_user_id),
     _: str = Depends(require_role(["admin", "doctor", "nurse"]))
 ):
     """Create a new patient"""
     try:
-        # Generate patient ID
-        patient_id = generate_patient_id()
-        
-        # Check if patient ID already exists (unlikely but check anyway)
-        existing = await db.patients.find_one({"patientId": patient_id})
-        while existing:
-            patient_id = generate_patient_id()
-            existing = await db.patients.find_one({"patientId": patient_id})
+        # Generate patient ID locally (no database round trip)
+        patient_id = patient_id_generator.next_id()
         
         # Create patient document
         patient = Patient(
@@ -91,23 +97,23 @@ async def create_patient(
             createdBy=ObjectId(current_user_id)
         )
         
-        # Insert patient
-        result = await db.patients.insert_one(patient.dict(by_alias=True, exclude={"id"}))
-        
-        # Get created patient
-        created_patient = await db.patients.find_one({"_id": result.inserted_id})
-        
-        return PatientResponse(
-            id=str(created_patient["_id"]),
-            patientId=created_patient["patientId"],
-            personalInfo=created_patient["personalInfo"],
-            medicalInfo=created_patient["medicalInfo"],
-            assignedDoctor=str(created_patient.get("assignedDoctor")) if created_patient.get("assignedDoctor") else None,
-            registrationDate=created_patient["registrationDate"],
-            lastVisit=created_patient.get("lastVisit"),
-            isActive=created_patient["isActive"],
-            createdAt=created_patient["createdAt"]
-        )
+        # Insert patient with its normalized search keys
+        document = patient.dict(by_alias=True, exclude={"id"})
+        document[SEARCH_FIELD] = build_search_document(document["personalInfo"], patient_id)
+        for attempt in range(PATIENT_ID_ATTEMPTS):
+            try:
+                created_patient = await insert_document(db.patients, document, return_document)
+                break
+            except DuplicateKeyError:
+                # Two workers share a node number; the unique index caught it
+                if attempt == PATIENT_ID_ATTEMPTS - 1:
+                    raise
+                patient_id = patient_id_generator.next_id()
+                document["patientId"] = patient_id
+                document[SEARCH_FIELD] = build_search_document(document["personalInfo"], patient_id)
+        overview_stats.patient_changed(None, created_patient)
+        
+        return PatientResponse.from_document(created_patient)
         
     except HTTPException:
         raise
@@ -118,6 +124,85 @@ async def create_patient(
             detail="Internal server error"
         )
 
+@router.get("/export")
+async def export_patient_records(
+    format: str = Query("ndjson", description="ndjson, csv or parquet"),
+    active: Optional[bool] = Query(None, description="Only active (true) or inactive (false) patients; default all"),
+    doctorId: Optional[str] = Query(None, description="Only patients assigned to this doctor"),
+    createdFrom: Optional[datetime] = Query(None, description="Earliest createdAt (inclusive)"),
+    createdTo: Optional[datetime] = Query(None, description="Latest createdAt (exclusive)"),
+    search: Optional[str] = None,
+    includeVitals: bool = Query(False, description="Join each patient's latest vitals reading"),
+    after: Optional[str] = Query(None, description="Resume after this patient ID (the last one received)"),
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin"]))
+):
+    """Stream patient records in (createdAt, _id) order"""
+    try:
+        if format not in FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Format must be one of {', '.join(FORMATS)}"
+            )
+
+        query = {}
+        if active is not None:
+            query["isActive"] = active
+        if doctorId:
+            if not ObjectId.is_valid(doctorId):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid doctor ID"
+                )
+            query["assignedDoctor"] = ObjectId(doctorId)
+        if createdFrom or createdTo:
+            query["createdAt"] = {}
+            if createdFrom:
+                query["createdAt"]["$gte"] = as_utc(createdFrom)
+            if createdTo:
+                query["createdAt"]["$lt"] = as_utc(createdTo)
+        if search:
+            search_filter = build_search_filter(search)
+            # A search without usable terms matches nobody
+            query.update(search_filter if search_filter is not None else {"_id": {"$in": []}})
+
+        position = None
+        if after:
+            last = await db.patients.find_one({"_id": ObjectId(after)}, {"createdAt": 1}) if ObjectId.is_valid(after) else None
+            if not last:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Unknown patient ID in after"
+                )
+            position = encode_cursor(last)
+
+        async def body():
+            try:
+                async for chunk in export_patients(db, query, format, includeVitals, settings.EXPORT_BATCH_SIZE, position):
+                    yield chunk
+            except Exception as e:
+                # Headers are already sent; the client sees a truncated body
+                logger.error(f"Patient export error: {e}")
+                raise
+
+        media_type, extension = FORMATS[format]
+        filename = f"patients-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.{extension}"
+        return StreamingResponse(
+            body(),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Export patients error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
 @router.get("/{patient_id}", response_model=PatientResponse)
 async def get_patient(
     patient_id: str,
@@ -136,17 +221,7 @@ async def get_patient(
                 detail="Patient not found"
             )
         
-        return PatientResponse(
-            id=str(patient["_id"]),
-            patientId=patient["patientId"],
-            personalInfo=patient["personalInfo"],
-            medicalInfo=patient["medicalInfo"],
-            assignedDoctor=str(patient.get("assignedDoctor")) if patient.get("assignedDoctor") else None,
-            registrationDate=patient["registrationDate"],
-            lastVisit=patient.get("lastVisit"),
-            isActive=patient["isActive"],
-            createdAt=patient["createdAt"]
-        )
+        return PatientResponse.from_document(patient)
         
     except HTTPException:
         raise
@@ -156,3 +231,48 @@ async def get_patient(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
         )
+
+@router.put("/{patient_id}", response_model=PatientResponse)
+async def update_patient(
+    patient_id: str,
+    patient_data: PatientUpdate,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Update patient by ID"""
+    try:
+        patient = await db.patients.find_one({"_id": ObjectId(patient_id)})
+        
+        if not patient:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Patient not found"
+            )
+        
+        updates = patient_data.dict(exclude_unset=True)
+        if updates.get("assignedDoctor"):
+            updates["assignedDoctor"] = ObjectId(updates["assignedDoctor"])
+        
+        # Keep search keys in step with the fields they are derived from
+        if "personalInfo" in updates:
+            updates[SEARCH_FIELD] = build_search_document(updates["personalInfo"], patient["patientId"])
+        updates["updatedAt"] = datetime.utcnow()
+        
+        await db.patients.update_one({"_id": patient["_id"]}, {"$set": updates})
+        before = dict(patient)
+        patient.update(updates)
+        overview_stats.patient_changed(before, patient)
+        if "medicalInfo" in updates:
+            alert_engine.invalidate(patient["_id"])
+        
+        return PatientResponse.from_document(patient)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Update patient error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
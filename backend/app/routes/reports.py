@@ -1,7 +1,349 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from urllib.parse import quote
+from bson import ObjectId
+from pydantic import ValidationError
+from app.models.report import Report, ReportCreate, ReportResponse
+from app.config.database import get_database
+from app.config.settings import settings
+from app.utils.auth import get_current_user_id, require_role
+from app.utils.dates import as_utc
+from app.utils.multipart import iter_multipart
+from app.utils.file_response import FileRangeResponse, etag_matches, parse_range
+from app.services.blob_store import BlobGone, BlobWriter, FileTooLarge, blob_store
+from app.services.report_files import report_files, sniff
+import aiofiles.os
+import logging
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Total size of the non-file form fields of an upload
+MAX_FORM_FIELDS_BYTES = 65536
+
+def content_disposition(file_name: str) -> str:
+    fallback = "".join(c if 32 <= ord(c) < 127 and c not in '"\\' else "_" for c in file_name)
+    return f"inline; filename=\"{fallback}\"; filename*=UTF-8''{quote(file_name)}"
+
 @router.get("/")
 async def get_reports():
     return {"message": "Reports endpoint - coming soon"}
+
+@router.post("/upload", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
+async def upload_report(
+    request: Request,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Create a report from a multipart upload
+
+    Form fields follow ``ReportCreate``; every part named ``file`` is
+    streamed into the blob store and attached. Each file may be up to
+    MAX_FILE_SIZE.
+    """
+    # Reject bodies that cannot fit before reading any of them
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and \
+            int(content_length) > settings.MAX_FILE_SIZE * settings.UPLOAD_MAX_FILES + MAX_FORM_FIELDS_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Upload too large"
+        )
+
+    fields: Dict[str, str] = {}
+    field_bytes = 0
+    received: List[Dict[str, Any]] = []
+    acquired: List[str] = []
+    writer: Optional[BlobWriter] = None
+    part: Dict[str, Any] = {}
+    field_name = None
+    field_value = bytearray()
+    try:
+        async for event, value in iter_multipart(request):
+            if event == "part":
+                if value["filename"] is not None:
+                    if value["name"] != "file":
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Files must be sent as 'file' parts"
+                        )
+                    if len(received) >= settings.UPLOAD_MAX_FILES:
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {settings.UPLOAD_MAX_FILES} files per upload"
+                        )
+                    writer = blob_store.writer(db)
+                    part = value
+                else:
+                    field_name = value["name"]
+            elif event == "data":
+                if writer is not None:
+                    await writer.write(value)
+                else:
+                    field_bytes += len(value)
+                    if field_bytes > MAX_FORM_FIELDS_BYTES:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail="Form fields too large"
+                        )
+                    field_value += value
+            elif event == "end":
+                if writer is not None:
+                    item = await writer.close()
+                    writer = None
+                    item["fileName"] = part["filename"] or "upload"
+                    item["fileType"], item["contentType"] = sniff(item["prefix"], item["fileName"],
+                                                                  part["contentType"])
+                    received.append(item)
+                else:
+                    fields[field_name] = field_value.decode("utf-8", "replace")
+                    field_value = bytearray()
+
+        if not received:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No file uploaded"
+            )
+        try:
+            report_data = ReportCreate(**fields)
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=e.errors(include_url=False, include_context=False)
+            )
+        for value in (report_data.patientId, report_data.doctorId):
+            if value is not None and not ObjectId.is_valid(value):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid patient or doctor ID"
+                )
+        if not await db.patients.find_one({"_id": ObjectId(report_data.patientId)}, {"_id": 1}):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Patient not found"
+            )
+
+        # Reference the received blobs only now that the report is valid
+        report_id = ObjectId()
+        download_url = f"/api/v1/reports/{report_id}/download"
+        files = []
+        while received:
+            item = received.pop(0)
+            try:
+                await blob_store.acquire(db, item)
+            except BlobGone:
+                received.insert(0, item)
+                raise
+            acquired.append(item["sha256"])
+            preview = await report_files.preview(item["sha256"], item["fileType"])
+            files.append({
+                "fileName": item["fileName"],
+                "fileUrl": f"{download_url}?file={len(files)}",
+                "fileType": item["fileType"],
+                "contentType": item["contentType"],
+                "fileSize": item["size"],
+                "sha256": item["sha256"],
+                "previewUrl": f"{download_url}?file={len(files)}&preview=true" if preview else None,
+            })
+
+        report = Report(
+            id=report_id,
+            patientId=ObjectId(report_data.patientId),
+            doctorId=ObjectId(report_data.doctorId) if report_data.doctorId else None,
+            reportType=report_data.reportType,
+            title=report_data.title,
+            description=report_data.description,
+            testDate=as_utc(report_data.testDate) if report_data.testDate else datetime.utcnow(),
+            files=files,
+            priority=report_data.priority,
+            createdBy=ObjectId(current_user_id)
+        )
+        document = report.dict(by_alias=True)
+        await db.reports.insert_one(document)
+        acquired.clear()
+
+        return ReportResponse.from_document(document)
+
+    except FileTooLarge:
+        report_files.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Files cannot exceed {settings.MAX_FILE_SIZE} bytes"
+        )
+    except BlobGone:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A stored copy of an uploaded file was just deleted; please retry the upload"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Upload report error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+    finally:
+        # Partial or unused temporary files and references of a failed upload
+        if writer is not None:
+            await writer.abort()
+        for item in received:
+            if item["tempPath"] is not None:
+                await blob_store.discard(item["tempPath"])
+        for sha256 in acquired:
+            await blob_store.release(db, sha256)
+
+@router.get("/{report_id}", response_model=ReportResponse)
+async def get_report(
+    report_id: str,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Get report by ID"""
+    try:
+        if not ObjectId.is_valid(report_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid report ID"
+            )
+        report = await db.reports.find_one({"_id": ObjectId(report_id)})
+        if not report:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Report not found"
+            )
+        return ReportResponse.from_document(report)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get report error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.api_route("/{report_id}/download", methods=["GET", "HEAD"])
+async def download_report_file(
+    report_id: str,
+    request: Request,
+    file: int = Query(0, ge=0, description="Index into the report's files"),
+    preview: bool = False,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Download a report file or its preview
+
+    The ETag is the file's SHA-256, so If-None-Match gets a 304 without a
+    body. A single Range (honoured only if an If-Range matches) gets a 206.
+    """
+    try:
+        if not ObjectId.is_valid(report_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid report ID"
+            )
+        report = await db.reports.find_one({"_id": ObjectId(report_id)}, {"files": 1})
+        if not report:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Report not found"
+            )
+        files = report.get("files", [])
+        if file >= len(files) or (preview and not files[file].get("previewUrl")):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="File not found"
+            )
+        item = files[file]
+        if preview:
+            path = report_files.preview_path(item["sha256"])
+            etag = f'"{item["sha256"]}-preview"'
+            media_type = "image/jpeg"
+            file_name = f"{item['fileName'].rsplit('.', 1)[0]}-preview.jpg"
+        else:
+            path = blob_store.path(item["sha256"])
+            etag = f'"{item["sha256"]}"'
+            media_type = item["contentType"]
+            file_name = item["fileName"]
+        try:
+            size = (await aiofiles.os.stat(path)).st_size
+        except FileNotFoundError:
+            logger.error(f"Report {report_id} file {path} is missing")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="File not found"
+            )
+
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"private, max-age={settings.REPORT_CACHE_MAX_AGE_SECONDS}",
+            "Accept-Ranges": "bytes",
+        }
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            report_files.not_modified += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        # A Range is only for the representation the client already has part of
+        if_range = request.headers.get("if-range")
+        byte_range = parse_range(request.headers.get("range"), size) \
+            if if_range is None or if_range.strip() == etag else None
+        start, end = byte_range or (0, size)
+        send_body = request.method != "HEAD"
+        if send_body:
+            report_files.downloads += 1
+            report_files.partial_downloads += byte_range is not None
+            report_files.bytes_served += end - start
+        headers["Content-Disposition"] = content_disposition(file_name)
+        headers["X-Content-Type-Options"] = "nosniff"
+        return FileRangeResponse(
+            path, size, start, end,
+            status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+            headers, media_type, send_body=send_body, chunk_size=settings.DOWNLOAD_CHUNK_SIZE
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Download report file error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.delete("/{report_id}")
+async def delete_report(
+    report_id: str,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin"]))
+):
+    """Delete a report; its files are garbage collected once nothing else references them"""
+    try:
+        if not ObjectId.is_valid(report_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid report ID"
+            )
+        report = await db.reports.find_one({"_id": ObjectId(report_id)}, {"files": 1})
+        if not report or not (await db.reports.delete_one({"_id": report["_id"]})).deleted_count:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Report not found"
+            )
+        for item in report.get("files", []):
+            await blob_store.release(db, item["sha256"])
+        return {"message": "Report deleted successfully"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Delete report error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
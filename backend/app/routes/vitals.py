@@ -1,7 +1,332 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional
+from datetime import datetime
+from bson import ObjectId
+from app.models.vital import VitalCreate, VitalUpdate, VitalResponse, VitalsBulkCreate, VitalsBulkResponse
+from app.models.user import TokenData
+from app.config.database import get_database
+from app.config.settings import settings
+from app.utils.auth import create_stream_ticket, get_current_user_id, get_stream_token_data, get_token_data, require_role
+from app.utils.dates import as_utc
+from app.services.vitals_ingest import vitals_ingestor
+from app.services.vital_alerts import alert_engine
+from app.services.vitals_store import vitals_store
+from app.services.latest_vitals import latest_vitals_cache
+from app.services.vitals_stream import vitals_broker
+from app.services.vital_trends import vital_rollups
+import asyncio
+import logging
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/")
 async def get_vitals():
     return {"message": "Vitals endpoint - coming soon"}
+
+@router.post("/stream/ticket")
+async def create_vitals_stream_ticket(
+    token_data: TokenData = Depends(get_token_data),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Short-lived ticket for opening the stream from EventSource, which cannot send headers"""
+    return {"ticket": create_stream_ticket(token_data), "expiresIn": settings.VITALS_STREAM_TICKET_TTL_SECONDS}
+
+@router.get("/stream")
+async def stream_vitals(
+    patientIds: List[str] = Query([], description="Patients to follow"),
+    doctorId: Optional[str] = Query(None, description="Follow every active patient assigned to this doctor"),
+    alertsOnly: bool = Query(False, description="Only send readings that raised alerts"),
+    db=Depends(get_database),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"], get_stream_token_data))
+):
+    """Live readings as Server-Sent Events (``event: vital``)
+
+    Authenticated by the Authorization header or, for EventSource, by a
+    ``ticket`` from POST /vitals/stream/ticket; access tokens are never
+    accepted in the URL.
+    """
+    followed = set(patientIds)
+    if doctorId:
+        if not ObjectId.is_valid(doctorId):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid doctor ID"
+            )
+        cursor = db.patients.find({"assignedDoctor": ObjectId(doctorId), "isActive": True}, {"_id": 1})
+        followed.update([str(patient["_id"]) async for patient in cursor])
+    invalid = [patient_id for patient_id in followed if not ObjectId.is_valid(patient_id)]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid patient ID: {invalid[0]}"
+        )
+    if not followed or len(followed) > settings.VITALS_LATEST_MAX_PATIENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Follow between 1 and {settings.VITALS_LATEST_MAX_PATIENTS} patients"
+        )
+
+    subscriber = vitals_broker.subscribe({str(ObjectId(patient_id)) for patient_id in followed}, alertsOnly)
+
+    async def events():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), settings.VITALS_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if subscriber.dropped > subscriber.reported_dropped:
+                    # Tell the client it fell behind and missed readings
+                    yield f"event: dropped\ndata: {subscriber.dropped - subscriber.reported_dropped}\n\n".encode()
+                    subscriber.reported_dropped = subscriber.dropped
+                yield event
+        finally:
+            vitals_broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/latest", response_model=Dict[str, Optional[VitalResponse]])
+async def get_latest_vitals(
+    patientIds: List[str] = Query(..., description="Patients to fetch, e.g. every bed on a ward"),
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Get the latest reading of several patients in one call (null when none)"""
+    try:
+        if len(patientIds) > settings.VITALS_LATEST_MAX_PATIENTS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {settings.VITALS_LATEST_MAX_PATIENTS} patients per request"
+            )
+        invalid = [patient_id for patient_id in patientIds if not ObjectId.is_valid(patient_id)]
+        if invalid:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid patient ID: {invalid[0]}"
+            )
+
+        latest = await latest_vitals_cache.get_many(db, [ObjectId(patient_id) for patient_id in patientIds])
+        return {
+            patient_id: VitalResponse.from_document(reading) if reading else None
+            for patient_id, reading in latest.items()
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get latest vitals error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.get("/patient/{patient_id}/latest", response_model=VitalResponse)
+async def get_patient_latest_vitals(
+    patient_id: str,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Get a patient's most recent reading"""
+    try:
+        if not ObjectId.is_valid(patient_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid patient ID"
+            )
+
+        patient_oid = ObjectId(patient_id)
+        reading = (await latest_vitals_cache.get_many(db, [patient_oid]))[str(patient_oid)]
+        if not reading:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No vitals recorded for this patient"
+            )
+
+        return VitalResponse.from_document(reading)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get latest vitals error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.get("/patient/{patient_id}", response_model=List[VitalResponse])
+async def get_patient_vitals(
+    patient_id: str,
+    start: Optional[datetime] = Query(None, description="Earliest recordedAt (inclusive)"),
+    end: Optional[datetime] = Query(None, description="Latest recordedAt (exclusive); defaults to now"),
+    limit: int = Query(100, ge=1, le=1000),
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Get a patient's readings in a time range, newest first"""
+    try:
+        if not ObjectId.is_valid(patient_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid patient ID"
+            )
+
+        readings = await vitals_store.find_range(
+            db, ObjectId(patient_id), as_utc(start) if start else None,
+            as_utc(end) if end else datetime.utcnow(), limit
+        )
+        return [VitalResponse.from_document(reading) for reading in readings]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get patient vitals error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.post("/", response_model=VitalResponse)
+async def record_vital(
+    vital_data: VitalCreate,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Record a single vitals reading"""
+    try:
+        documents, positions, rejected = vitals_ingestor.prepare(
+            [vital_data.dict(exclude_none=True)], ObjectId(current_user_id)
+        )
+        if rejected:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=rejected[0]["reason"]
+            )
+        documents, positions = await vitals_ingestor.check_patients(db.patients, documents, positions, rejected)
+        if rejected:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=rejected[0]["reason"]
+            )
+
+        await alert_engine.annotate(db.patients, documents)
+        inserted, errors = await vitals_ingestor.write(db, documents)
+        if errors:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=errors[0]["reason"]
+            )
+
+        return VitalResponse.from_document(documents[0])
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Record vital error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.post("/bulk", response_model=VitalsBulkResponse)
+async def record_vitals_bulk(
+    bulk_data: VitalsBulkCreate,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Ingest a batch of monitor readings; invalid readings are reported, not fatal"""
+    try:
+        received = len(bulk_data.vitals)
+        if received > settings.VITALS_BULK_MAX_READINGS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {settings.VITALS_BULK_MAX_READINGS} readings per request"
+            )
+
+        # One dump for the whole payload instead of one per reading
+        readings = bulk_data.dict(exclude_none=True)["vitals"]
+        documents, positions, rejected = vitals_ingestor.prepare(readings, ObjectId(current_user_id))
+        documents, positions = await vitals_ingestor.check_patients(db.patients, documents, positions, rejected)
+        await alert_engine.annotate(db.patients, documents)
+
+        inserted, errors = await vitals_ingestor.write(db, documents)
+        rejected.extend({"index": positions[error["index"]], "reason": error["reason"]} for error in errors)
+
+        return VitalsBulkResponse(
+            received=received,
+            inserted=inserted,
+            alerts=sum(len(document["alerts"]) for document in documents),
+            rejected=sorted(rejected, key=lambda rejection: rejection["index"])
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Bulk vitals error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.put("/{vital_id}", response_model=VitalResponse)
+async def update_vital(
+    vital_id: str,
+    vital_data: VitalUpdate,
+    db=Depends(get_database),
+    current_user_id: str = Depends(get_current_user_id),
+    _: str = Depends(require_role(["admin", "doctor", "nurse"]))
+):
+    """Correct a recorded reading"""
+    try:
+        if not ObjectId.is_valid(vital_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid vital ID"
+            )
+
+        reading = await vitals_store.get_reading(db, ObjectId(vital_id))
+        if not reading:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Vital record not found"
+            )
+
+        updates = vital_data.dict(exclude_unset=True, exclude_none=True)
+        if "vitals" in updates:
+            # Alerts follow the corrected measurements
+            reading["vitals"] = updates["vitals"]
+            await alert_engine.annotate(db.patients, [reading])
+            updates["alerts"] = reading["alerts"]
+
+        updated = await vitals_store.update_reading(db, ObjectId(vital_id), updates)
+        if not updated:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Vital record not found"
+            )
+        latest_vitals_cache.invalidate(updated["patientId"])
+        if "vitals" in updates:
+            await vital_rollups.rebuild(db, updated["patientId"], updated["recordedAt"])
+
+        return VitalResponse.from_document(updated)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Update vital error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
@@ -0,0 +1,93 @@
+"""Conflict-free appointment booking.
+
+Each (doctor, UTC day) has an ``appointment_days`` document listing the
+minute ranges claimed that day. A booking claims its range with a single
+conditional upsert: the filter only matches while no claimed range
+overlaps it, and the update pushes the new range. Two clerks racing for
+the same slot therefore cannot both succeed. Nothing is read first and
+nothing is locked beyond the one document MongoDB updates atomically, so
+bookings for different doctors or days never wait on each other.
+
+The appointment document is written after its claim, and the claim is
+released if that write fails. Cancelling releases the claim after the
+status change. A crash between the two steps can only leave a slot
+blocked, never double-booked.
+"""
+from datetime import datetime, time as day_time
+from typing import Any, Dict, Tuple
+import logging
+
+from pymongo.errors import DuplicateKeyError
+
+from app.services.availability import MINUTES_PER_DAY
+
+logger = logging.getLogger(__name__)
+
+class SlotUnavailable(Exception):
+    """The requested range overlaps an existing booking"""
+
+def claim_range(scheduled: datetime, duration: int) -> Tuple[datetime, int, int]:
+    """(day, first minute, end minute) of a booking; it must not cross midnight"""
+    day = datetime.combine(scheduled.date(), day_time())
+    start = scheduled.hour * 60 + scheduled.minute
+    end = start + duration
+    if end > MINUTES_PER_DAY:
+        raise ValueError("Appointments cannot run past midnight")
+    return day, start, end
+
+def day_document_id(doctor_id: Any, day: datetime) -> str:
+    return f"{doctor_id}:{day:%Y-%m-%d}"
+
+class AppointmentBooker:
+    """Claims and releases doctor time in ``appointment_days``"""
+
+    collection = "appointment_days"
+
+    def __init__(self):
+        self.claims = 0
+        self.conflicts = 0
+        self.releases = 0
+
+    async def claim(self, db, appointment: Dict[str, Any]):
+        """Reserve the appointment's range or raise ``SlotUnavailable``"""
+        day, start, end = claim_range(appointment["scheduledDate"], appointment["duration"])
+        day_id = day_document_id(appointment["doctorId"], day)
+        query = {
+            "_id": day_id,
+            "slots": {"$not": {"$elemMatch": {"start": {"$lt": end}, "end": {"$gt": start}}}},
+        }
+        update = {
+            "$push": {"slots": {"start": start, "end": end, "appointmentId": appointment["_id"]}},
+            "$setOnInsert": {"doctorId": appointment["doctorId"], "day": day},
+        }
+        try:
+            result = await db[self.collection].update_one(query, update, upsert=True)
+        except DuplicateKeyError:
+            # The day document exists but the filter did not match. Either the range
+            # is taken or the document was created concurrently; retry as an update.
+            result = await db[self.collection].update_one(query, update)
+        if result.modified_count or result.upserted_id is not None:
+            self.claims += 1
+            return
+        self.conflicts += 1
+        raise SlotUnavailable(f"{day_id} {start}-{end}")
+
+    async def release(self, db, appointment: Dict[str, Any]):
+        """Free the appointment's range (no-op if it was never claimed)"""
+        day, _, _ = claim_range(appointment["scheduledDate"], appointment["duration"])
+        await db[self.collection].update_one(
+            {"_id": day_document_id(appointment["doctorId"], day)},
+            {"$pull": {"slots": {"appointmentId": appointment["_id"]}}}
+        )
+        self.releases += 1
+
+    def stats(self) -> Dict[str, Any]:
+        attempts = self.claims + self.conflicts
+        return {
+            "claims": self.claims,
+            "conflicts": self.conflicts,
+            "releases": self.releases,
+            "conflictRate": round(self.conflicts / attempts, 4) if attempts else 0.0,
+        }
+
+appointment_booker = AppointmentBooker()
@@ -0,0 +1,286 @@
+"""Free appointment slots from compiled doctor schedules.
+
+Each doctor's ``WeeklySchedule`` is compiled once into one bitset per
+weekday, where bit ``m`` is set when the doctor works minute ``m`` of the
+day (UTC). The booked appointments of a (doctor, day) come from one ranged
+query on the ``(doctorId, scheduledDate)`` index and are kept as a second
+bitset. A slot of ``d`` minutes starting at minute ``m`` is free when the
+``d`` bits of ``hours & ~booked`` from ``m`` are all set, so a search over
+every doctor of a specialization for a week stays in memory.
+
+Booking and cancellation call ``appointment_changed``, which drops the
+days the appointment covers. Roster and day entries also expire after
+``ttl_seconds`` so bookings made by other workers, and schedule changes
+(written outside the API), show up. Results are a hint: booking reads the
+doctor's schedule fresh with ``doctor`` and still has to check for
+conflicts when it writes.
+"""
+from collections import OrderedDict
+from datetime import date, datetime, time as day_time, timedelta
+from heapq import merge
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+import time
+
+from bson import ObjectId
+
+from app.config.settings import settings
+from app.models.appointment import INACTIVE_APPOINTMENT_STATUSES, MAX_APPOINTMENT_MINUTES
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 1440
+
+# WeeklySchedule fields in datetime.weekday() order
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Days of booked bitsets loaded per query
+LOAD_DAYS = 7
+
+# Doctor fields a roster entry is built from
+ROSTER_FIELDS = {"specialization": 1, "department": 1, "schedule": 1}
+
+def parse_minute(value: str) -> int:
+    """Minute of the day for an ``"HH:MM"`` schedule time (``"24:00"`` is the end of the day)"""
+    hours, _, minutes = value.partition(":")
+    minute = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= minute <= MINUTES_PER_DAY:
+        raise ValueError(f"Time out of range: {value}")
+    return minute
+
+def minute_mask(start: int, end: int) -> int:
+    """Bitset with minutes ``[start, end)`` set"""
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+def compile_schedule(schedule: Optional[Dict[str, Any]]) -> Tuple[int, ...]:
+    """Working-minute bitset per weekday for a stored ``WeeklySchedule``"""
+    hours = []
+    for name in WEEKDAYS:
+        day = (schedule or {}).get(name)
+        if not day or not day.get("available", True):
+            hours.append(0)
+            continue
+        try:
+            hours.append(minute_mask(parse_minute(day["startTime"]), parse_minute(day["endTime"])))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring invalid {name} schedule {day}: {e}")
+            hours.append(0)
+    return tuple(hours)
+
+def free_starts(free: int, duration: int, step: int, first: int = 0) -> Iterator[int]:
+    """Start minutes, on multiples of ``step``, of ``duration``-minute runs of set bits"""
+    mask = (1 << duration) - 1
+    minute = -(-first // step) * step
+    while minute + duration <= MINUTES_PER_DAY:
+        rest = free >> minute
+        if not rest:
+            return
+        # Jump to the next working minute, rounded up to the slot grid
+        skip = (rest & -rest).bit_length() - 1
+        if skip:
+            minute += -(-skip // step) * step
+            continue
+        if rest & mask == mask:
+            yield minute
+        minute += step
+
+def appointment_days(appointment: Dict[str, Any]) -> Iterator[Tuple[date, int, int]]:
+    """(day, first minute, end minute) pieces of an appointment, split at midnight"""
+    moment = appointment["scheduledDate"]
+    start = moment.hour * 60 + moment.minute
+    remaining = max(int(appointment.get("duration") or 0), 1)
+    day = moment.date()
+    while remaining > 0:
+        end = min(start + remaining, MINUTES_PER_DAY)
+        yield day, start, end
+        remaining -= end - start
+        day, start = day + timedelta(days=1), 0
+
+def roster_entry(doctor: Dict[str, Any]) -> Dict[str, Any]:
+    """A doctor document reduced to what slot searches need"""
+    return {
+        "_id": doctor["_id"],
+        "id": str(doctor["_id"]),
+        "specialization": {value.lower() for value in doctor.get("specialization") or []},
+        "department": doctor.get("department"),
+        "hours": compile_schedule(doctor.get("schedule")),
+    }
+
+class AvailabilityIndex:
+    """Compiled schedules per doctor and an LRU of booked-minute bitsets per (doctor, day)"""
+
+    def __init__(self, slot_minutes: int, max_days: int, ttl_seconds: float):
+        self.slot_minutes = slot_minutes
+        self.max_days = max_days
+        self.ttl = ttl_seconds
+        self._roster: Optional[List[Dict[str, Any]]] = None
+        self._roster_until = 0.0
+        self._booked: "OrderedDict[Tuple[str, date], Tuple[int, float]]" = OrderedDict()
+        # Bumped on every invalidation so loads that raced one are not cached
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.searches = 0
+        self.last_search_ms = 0.0
+
+    async def roster(self, db) -> List[Dict[str, Any]]:
+        """Available doctors with their compiled schedules"""
+        now = time.monotonic()
+        if self._roster is not None and now < self._roster_until:
+            return self._roster
+        generation = self._generation
+        cursor = db.doctors.find({"isAvailable": True}, ROSTER_FIELDS)
+        roster = [roster_entry(doctor) async for doctor in cursor]
+        if generation == self._generation:
+            self._roster, self._roster_until = roster, now + self.ttl
+        return roster
+
+    async def doctor(self, db, doctor_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """One available doctor's roster entry, read from the database rather than the cache"""
+        doctor = await db.doctors.find_one({"_id": doctor_id, "isAvailable": True}, ROSTER_FIELDS)
+        return roster_entry(doctor) if doctor else None
+
+    def appointment_changed(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Drop the days an appointment occupied before and after a write"""
+        for appointment in (before, after):
+            if not appointment or not appointment.get("doctorId") or not appointment.get("scheduledDate"):
+                continue
+            for day, _, _ in appointment_days(appointment):
+                self._booked.pop((str(appointment["doctorId"]), day), None)
+        self._generation += 1
+        self.invalidations += 1
+
+    def _put(self, key: Tuple[str, date], booked: int, now: float):
+        if self.max_days <= 0:
+            return
+        self._booked[key] = (booked, now + self.ttl)
+        self._booked.move_to_end(key)
+        while len(self._booked) > self.max_days:
+            self._booked.popitem(last=False)
+
+    async def booked(self, db, doctors: List[Dict[str, Any]], days: List[date]) -> Dict[Tuple[str, date], int]:
+        """Booked-minute bitset per (doctor, day); misses are loaded with one query"""
+        now = time.monotonic()
+        found: Dict[Tuple[str, date], int] = {}
+        missing: Dict[Tuple[str, date], int] = {}
+        missing_doctors = {}
+        for doctor in doctors:
+            for day in days:
+                key = (doctor["id"], day)
+                entry = self._booked.get(key)
+                if entry is not None and entry[1] > now:
+                    self._booked.move_to_end(key)
+                    found[key] = entry[0]
+                    self.hits += 1
+                else:
+                    missing[key] = 0
+                    missing_doctors[doctor["id"]] = doctor["_id"]
+                    self.misses += 1
+        if not missing:
+            return found
+
+        generation = self._generation
+        first = datetime.combine(min(day for _, day in missing), day_time())
+        last = datetime.combine(max(day for _, day in missing), day_time()) + timedelta(days=1)
+        cursor = db.appointments.find(
+            {
+                "doctorId": {"$in": list(missing_doctors.values())},
+                # Appointments from the previous evening can run past midnight
+                "scheduledDate": {"$gte": first - timedelta(minutes=MAX_APPOINTMENT_MINUTES), "$lt": last},
+                "status": {"$nin": list(INACTIVE_APPOINTMENT_STATUSES)},
+            },
+            {"doctorId": 1, "scheduledDate": 1, "duration": 1}
+        )
+        async for appointment in cursor:
+            doctor_id = str(appointment["doctorId"])
+            for day, start, end in appointment_days(appointment):
+                key = (doctor_id, day)
+                if key in missing:
+                    missing[key] |= minute_mask(start, end)
+        self.loads += 1
+        for key, booked in missing.items():
+            if generation == self._generation:
+                self._put(key, booked, now)
+            found[key] = booked
+        return found
+
+    def _doctor_slots(self, doctor: Dict[str, Any], free: int, duration: int, first: int):
+        for minute in free_starts(free, duration, self.slot_minutes, first):
+            yield (minute, doctor["id"]), doctor
+
+    async def find_slots(self, db, start: datetime, end: datetime, duration: int, limit: int,
+                         specialization: Optional[str] = None, department: Optional[str] = None,
+                         doctor_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """First ``limit`` free slots in ``[start, end)``, earliest first, across the matching doctors"""
+        started = time.perf_counter()
+        doctors = await self.roster(db)
+        if specialization:
+            doctors = [doctor for doctor in doctors if specialization.lower() in doctor["specialization"]]
+        if department:
+            doctors = [doctor for doctor in doctors if (doctor["department"] or "").lower() == department.lower()]
+        if doctor_ids is not None:
+            wanted = set(doctor_ids)
+            doctors = [doctor for doctor in doctors if doctor["id"] in wanted]
+
+        days = []
+        day = start.date()
+        while datetime.combine(day, day_time()) < end:
+            days.append(day)
+            day += timedelta(days=1)
+
+        slots: List[Dict[str, Any]] = []
+        for offset in range(0, len(days), LOAD_DAYS):
+            chunk = days[offset:offset + LOAD_DAYS]
+            working = [doctor for doctor in doctors if any(doctor["hours"][day.weekday()] for day in chunk)]
+            booked = await self.booked(db, working, chunk)
+            for day in chunk:
+                midnight = datetime.combine(day, day_time())
+                first = max(0, int((start - midnight).total_seconds() + 59) // 60)
+                last = min(MINUTES_PER_DAY, int((end - midnight).total_seconds()) // 60)
+                window = minute_mask(first, last)
+                streams = [
+                    self._doctor_slots(doctor, doctor["hours"][day.weekday()] & window & ~booked[(doctor["id"], day)],
+                                       duration, first)
+                    for doctor in working
+                ]
+                # Each doctor's stream is ordered; merge them lazily by (minute, doctorId)
+                for (minute, doctor_id), doctor in merge(*streams, key=lambda item: item[0]):
+                    slot_start = midnight + timedelta(minutes=minute)
+                    slots.append({
+                        "doctorId": doctor_id,
+                        "department": doctor["department"],
+                        "start": slot_start,
+                        "end": slot_start + timedelta(minutes=duration),
+                    })
+                    if len(slots) >= limit:
+                        break
+                if len(slots) >= limit:
+                    break
+            if len(slots) >= limit:
+                break
+
+        self.searches += 1
+        self.last_search_ms = (time.perf_counter() - started) * 1000
+        return slots
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "doctors": len(self._roster) if self._roster is not None else 0,
+            "cachedDays": len(self._booked),
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "searches": self.searches,
+            "lastSearchMs": round(self.last_search_ms, 2),
+        }
+
+availability_index = AvailabilityIndex(
+    settings.APPOINTMENT_SLOT_MINUTES,
+    settings.AVAILABILITY_CACHE_DAYS,
+    settings.AVAILABILITY_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,452 @@
+"""Content-addressed, reference-counted blob storage.
+
+Every stored file is a blob at ``UPLOAD_DIR/blobs/<sha[:2]>/<sha[2:4]>/<sha>``
+with a ``blobs`` document ``{_id: sha256, size, head, refCount, updatedAt}``.
+``refCount`` is the number of ``reports.files[]`` entries naming the blob:
+``acquire`` adds one before a report is written and ``release`` drops one
+when a report is deleted or its write failed.
+
+Duplicates are caught while the upload streams. ``head`` is the SHA-256 of
+a blob's first HEAD_BYTES; once an upload's first chunk is in, blobs with
+the same head become candidates and the rest of the upload is compared
+with them as it arrives instead of being written. Only if every candidate
+diverges does the writer create its temporary file, copying the prefix it
+already verified from a candidate. A duplicate therefore costs no disk
+writes, and a new file no more than it would have anyway.
+
+``collect`` runs every BLOB_GC_INTERVAL_SECONDS. It recounts references
+from ``reports.files[]``, then deletes blobs that have had no references
+for BLOB_GC_GRACE_SECONDS, along with files that have no document and
+leftover temporary files. A blob being collected is first marked
+``collecting`` (with ``collectingAt``) so a concurrent upload cannot take a
+reference to it in the middle of its deletion. A new upload of that content
+waits for the deletion to finish and then stores its own copy; only a
+duplicate, which has nothing on disk to fall back on, fails with BlobGone.
+A mark older than COLLECT_STALE_SECONDS was left by a collection that died
+part way, and is taken over and finished by the next run or upload.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+
+import aiofiles
+import aiofiles.os
+from pymongo.errors import DuplicateKeyError
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Bytes hashed into a blob's ``head`` to find duplicate candidates
+HEAD_BYTES = 65536
+# Blobs compared with an upload at once (uploads sharing a head are rare)
+MAX_CANDIDATES = 4
+# Leading bytes kept for file type sniffing
+PREFIX_BYTES = 64
+GC_BATCH_SIZE = 500
+# A ``collecting`` mark this old belongs to a collection that will not finish on its own
+COLLECT_STALE_SECONDS = 30
+# Attempts at storing a new upload whose blob keeps being collected
+ACQUIRE_ATTEMPTS = 3
+
+class FileTooLarge(Exception):
+    """An uploaded file went over the size limit"""
+
+class BlobGone(Exception):
+    """The blob an upload duplicates was garbage collected before it could be referenced"""
+
+def copy_prefix(source: str, target: str, length: int):
+    """Create ``target`` holding the first ``length`` bytes of ``source``"""
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        copied = 0
+        while copied < length:
+            sent = os.sendfile(dst.fileno(), src.fileno(), copied, length - copied)
+            if sent == 0:
+                raise IOError(f"{source} is shorter than {length} bytes")
+            copied += sent
+
+class BlobWriter:
+    """Streams one upload, either matching it against existing blobs or writing it to a temporary file"""
+
+    def __init__(self, store: "BlobStore", db):
+        self.store = store
+        self.db = db
+        self.size = 0
+        self.prefix = b""
+        self.head: Optional[str] = None
+        self.temp_path: Optional[str] = None
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._file = None
+        # None until the first chunk is in; then open candidate files still equal to the upload
+        self._candidates: Optional[List[Dict[str, Any]]] = None
+        # Bytes verified against the candidates and not written anywhere
+        self._matched = 0
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.store.max_size:
+            raise FileTooLarge()
+        if len(self.prefix) < PREFIX_BYTES:
+            self.prefix += data[:PREFIX_BYTES - len(self.prefix)]
+        self._hash.update(data)
+        self._buffer += data
+        if len(self._buffer) >= self.store.chunk_size and \
+                (self._candidates is not None or len(self._buffer) >= HEAD_BYTES):
+            await self._flush(final=False)
+
+    async def _flush(self, final: bool):
+        if self._candidates is None:
+            self.head = hashlib.sha256(self._buffer[:HEAD_BYTES]).hexdigest()
+            self._candidates = await self.store.open_candidates(self.db, self.head)
+        if self._candidates:
+            await self._compare(final)
+        if self._candidates:
+            self._matched += len(self._buffer)
+        elif self._buffer:
+            if self._file is None:
+                await self._open()
+            await self._file.write(self._buffer)
+        self._buffer.clear()
+
+    async def _compare(self, final: bool):
+        """Drop the candidates that differ from the buffered bytes"""
+        remaining = []
+        diverged = None
+        for candidate in self._candidates:
+            existing = await candidate["file"].read(len(self._buffer))
+            if existing == self._buffer and (not final or candidate["size"] == self._matched + len(existing)):
+                remaining.append(candidate)
+            else:
+                diverged = candidate
+                await candidate["file"].close()
+        self._candidates = remaining
+        if not remaining and self._matched:
+            # Every candidate so far matched the first ``_matched`` bytes; start the file from one
+            await self._open(copy_from=self.store.path(diverged["sha256"]))
+
+    async def _open(self, copy_from: Optional[str] = None):
+        await aiofiles.os.makedirs(self.store.temp_dir, exist_ok=True)
+        self.temp_path = self.store.temp_path()
+        if copy_from is None:
+            self._file = await aiofiles.open(self.temp_path, "wb")
+            return
+        await asyncio.get_running_loop().run_in_executor(
+            None, copy_prefix, copy_from, self.temp_path, self._matched
+        )
+        self.store.prefix_bytes_copied += self._matched
+        self._file = await aiofiles.open(self.temp_path, "ab")
+
+    async def close(self) -> Dict[str, Any]:
+        """Finish the upload and describe it; ``tempPath`` is None for a duplicate"""
+        await self._flush(final=True)
+        duplicate = bool(self._candidates)
+        if duplicate:
+            self.store.bytes_not_written += self.size
+        await self._close_files()
+        if self.temp_path is None and not duplicate:
+            # Empty upload of a new blob
+            await self._open()
+            await self._close_files()
+        return {
+            "sha256": self._hash.hexdigest(),
+            "size": self.size,
+            "head": self.head,
+            "prefix": self.prefix,
+            "tempPath": None if duplicate else self.temp_path,
+        }
+
+    async def _close_files(self):
+        for candidate in self._candidates or []:
+            await candidate["file"].close()
+        self._candidates = []
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+
+    async def abort(self):
+        """Drop a partial upload"""
+        await self._close_files()
+        if self.temp_path is not None:
+            await self.store.discard(self.temp_path)
+
+class BlobStore:
+    """Blobs under ``UPLOAD_DIR/blobs`` and their ``blobs`` documents"""
+
+    collection = "blobs"
+
+    def __init__(self, upload_dir: str, max_size: int, chunk_size: int,
+                 gc_interval: float, gc_grace: float):
+        self.root = os.path.join(upload_dir, "blobs")
+        self.temp_dir = os.path.join(self.root, "tmp")
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.gc_interval = gc_interval
+        self.gc_grace = gc_grace
+        self.on_collect: List[Callable[[str], Awaitable[None]]] = []
+        self._get_database: Optional[Callable[[], Awaitable[Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+        # Counters
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_received = 0
+        self.bytes_not_written = 0
+        self.prefix_bytes_copied = 0
+        self.released = 0
+        self.collected = 0
+        self.orphans_removed = 0
+        self.refcounts_fixed = 0
+        self.gc_runs = 0
+        self.gc_errors = 0
+        self.last_gc_ms = 0.0
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def temp_path(self) -> str:
+        return os.path.join(self.temp_dir, f"{uuid.uuid4().hex}.part")
+
+    def writer(self, db) -> BlobWriter:
+        return BlobWriter(self, db)
+
+    async def discard(self, path: str):
+        try:
+            await aiofiles.os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def open_candidates(self, db, head: str) -> List[Dict[str, Any]]:
+        """Open the stored blobs whose first HEAD_BYTES hash to ``head``"""
+        candidates = []
+        documents = await db[self.collection].find(
+            {"head": head, "collecting": {"$ne": True}}, {"size": 1}
+        ).limit(MAX_CANDIDATES).to_list(MAX_CANDIDATES)
+        for document in documents:
+            try:
+                file = await aiofiles.open(self.path(document["_id"]), "rb")
+            except FileNotFoundError:
+                continue
+            candidates.append({"sha256": document["_id"], "size": document["size"], "file": file})
+        return candidates
+
+    async def acquire(self, db, received: Dict[str, Any]):
+        """Take a reference to the blob of a finished upload, storing its file if it is new"""
+        sha256 = received["sha256"]
+        blobs = db[self.collection]
+        self.bytes_received += received["size"]
+        update = {"$inc": {"refCount": 1}, "$set": {"updatedAt": datetime.utcnow()}}
+        if received["tempPath"] is None:
+            result = await blobs.update_one({"_id": sha256, "collecting": {"$ne": True}}, update)
+            if not result.matched_count:
+                raise BlobGone(sha256)
+            self.deduplicated += 1
+            return
+        for attempt in range(ACQUIRE_ATTEMPTS):
+            try:
+                await blobs.update_one(
+                    {"_id": sha256, "collecting": {"$ne": True}},
+                    {**update, "$setOnInsert": {"size": received["size"], "head": received["head"],
+                                                "createdAt": datetime.utcnow()}},
+                    upsert=True
+                )
+                break
+            except DuplicateKeyError:
+                # The blob is being collected; our temp file replaces it once the deletion is done
+                if attempt == ACQUIRE_ATTEMPTS - 1:
+                    raise BlobGone(sha256)
+                await self._await_collection(blobs, sha256)
+
+        # The reference keeps the garbage collector away from the path from here on
+        target = self.path(sha256)
+        if await aiofiles.os.path.exists(target):
+            # A concurrent identical upload finished first
+            await self.discard(received["tempPath"])
+            self.deduplicated += 1
+        else:
+            await aiofiles.os.makedirs(os.path.dirname(target), exist_ok=True)
+            await aiofiles.os.replace(received["tempPath"], target)
+            self.stored += 1
+
+    async def _await_collection(self, blobs, sha256: str):
+        """Wait until the blob's document is deleted, finishing a collection that stalled"""
+        delay = 0.05
+        deadline = time.monotonic() + 2 * COLLECT_STALE_SECONDS
+        while time.monotonic() < deadline:
+            blob = await blobs.find_one({"_id": sha256}, {"collecting": 1, "collectingAt": 1})
+            if blob is None or not blob.get("collecting"):
+                return
+            if not await self._resume(blobs, blob):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+
+    async def _resume(self, blobs, blob: Dict[str, Any]) -> bool:
+        """Take over and finish the collection of a blob whose ``collecting`` mark is stale"""
+        marked_at = blob.get("collectingAt")
+        if marked_at is not None and marked_at >= datetime.utcnow() - timedelta(seconds=COLLECT_STALE_SECONDS):
+            return False
+        taken = await blobs.update_one(
+            {"_id": blob["_id"], "collecting": True, "collectingAt": marked_at},
+            {"$set": {"collectingAt": datetime.utcnow()}}
+        )
+        if not taken.modified_count:
+            return False
+        await self._delete(blobs, blob["_id"])
+        return True
+
+    async def _delete(self, blobs, sha256: str):
+        """Delete a blob marked ``collecting``: its file, then the callbacks, then its document"""
+        try:
+            await self.discard(self.path(sha256))
+            for callback in self.on_collect:
+                try:
+                    await callback(sha256)
+                except Exception as e:
+                    logger.warning(f"Blob {sha256} collect callback failed: {e}")
+        finally:
+            # Without a document, a file the discard missed is an orphan for _sweep
+            await blobs.delete_one({"_id": sha256, "collecting": True})
+
+    async def release(self, db, sha256: str):
+        """Drop one reference; the blob is collected once unreferenced for the grace period"""
+        await db[self.collection].update_one(
+            {"_id": sha256}, {"$inc": {"refCount": -1}, "$set": {"updatedAt": datetime.utcnow()}}
+        )
+        self.released += 1
+
+    def start(self, get_database: Callable[[], Awaitable[Any]]):
+        """Start the garbage collection loop on the running event loop"""
+        self._get_database = get_database
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.gc_interval)
+            try:
+                await self.collect(await self._get_database())
+            except Exception as e:
+                self.gc_errors += 1
+                logger.warning(f"Blob garbage collection failed: {e}")
+
+    async def collect(self, db) -> Dict[str, int]:
+        """Recount references, then delete unreferenced blobs, orphaned files and stale temp files"""
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.gc_grace)
+        blobs = db[self.collection]
+
+        # References from reports.files[]; blobs touched since ``now`` are left to the next run
+        counts = {
+            group["_id"]: group["count"]
+            async for group in db.reports.aggregate([
+                {"$unwind": "$files"},
+                {"$group": {"_id": "$files.sha256", "count": {"$sum": 1}}},
+            ])
+        }
+        fixed = 0
+        async for blob in blobs.find({"updatedAt": {"$lt": now}}, {"refCount": 1}):
+            count = counts.get(blob["_id"], 0)
+            if blob.get("refCount") != count:
+                result = await blobs.update_one(
+                    {"_id": blob["_id"], "updatedAt": {"$lt": now}},
+                    {"$set": {"refCount": count, "updatedAt": datetime.utcnow()}}
+                )
+                fixed += result.modified_count
+        self.refcounts_fixed += fixed
+
+        collected = 0
+        # Collections that died part way (a failed unlink, a restart) are finished first
+        async for blob in blobs.find({"collecting": True}, {"collectingAt": 1}):
+            if await self._resume(blobs, blob):
+                collected += 1
+        unreferenced = await blobs.find(
+            {"refCount": {"$lte": 0}, "updatedAt": {"$lt": cutoff}}, {"_id": 1}
+        ).to_list(None)
+        for blob in unreferenced:
+            marked = await blobs.update_one(
+                {"_id": blob["_id"], "refCount": {"$lte": 0}, "updatedAt": {"$lt": cutoff},
+                 "collecting": {"$ne": True}},
+                {"$set": {"collecting": True, "collectingAt": datetime.utcnow()}}
+            )
+            if not marked.modified_count:
+                continue
+            await self._delete(blobs, blob["_id"])
+            collected += 1
+        self.collected += collected
+
+        orphans = await self._sweep(blobs, cutoff.timestamp())
+        self.gc_runs += 1
+        self.last_gc_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(f"Blob GC: {fixed} refcounts fixed, {collected} blobs and {orphans} orphaned files removed")
+        return {"refcountsFixed": fixed, "collected": collected, "orphansRemoved": orphans}
+
+    def _scan(self, cutoff: float):
+        """(temp files, blob names) last modified before ``cutoff``; runs in a thread"""
+        temp_files, names = [], []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if os.stat(path).st_mtime >= cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                if directory == self.temp_dir:
+                    temp_files.append(path)
+                elif len(name) == 64:
+                    names.append(name)
+        return temp_files, names
+
+    async def _sweep(self, blobs, cutoff: float) -> int:
+        """Remove old files without a blob document (a crash mid-upload) and old temp files"""
+        temp_files, names = await asyncio.get_running_loop().run_in_executor(None, self._scan, cutoff)
+        for path in temp_files:
+            await self.discard(path)
+        removed = len(temp_files)
+        for start in range(0, len(names), GC_BATCH_SIZE):
+            batch = names[start:start + GC_BATCH_SIZE]
+            known = {blob["_id"] for blob in await blobs.find({"_id": {"$in": batch}}, {"_id": 1}).to_list(None)}
+            for sha256 in batch:
+                if sha256 not in known:
+                    await self.discard(self.path(sha256))
+                    removed += 1
+        self.orphans_removed += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "bytesReceived": self.bytes_received,
+            "bytesNotWritten": self.bytes_not_written,
+            "prefixBytesCopied": self.prefix_bytes_copied,
+            "released": self.released,
+            "collected": self.collected,
+            "orphansRemoved": self.orphans_removed,
+            "refcountsFixed": self.refcounts_fixed,
+            "gcRuns": self.gc_runs,
+            "gcErrors": self.gc_errors,
+            "lastGcMs": self.last_gc_ms,
+        }
+
+blob_store = BlobStore(
+    settings.UPLOAD_DIR,
+    settings.MAX_FILE_SIZE,
+    settings.UPLOAD_CHUNK_SIZE,
+    settings.BLOB_GC_INTERVAL_SECONDS,
+    settings.BLOB_GC_GRACE_SECONDS,
+)
@@ -0,0 +1,108 @@
+"""In-process cache of each patient's most recent vitals reading.
+
+Ward dashboards poll the latest reading of every bed every few seconds. The
+ingest path pushes new readings into the cache (``record``) and
+``VitalUpdate`` drops the patient's entry (``invalidate``), so with one
+worker the cache is exact and polling never reaches the database. Entries
+also expire after ``ttl_seconds``, which bounds staleness when several
+workers ingest independently. Patients without readings are cached as
+``None`` so empty beds do not cost a query per poll.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import time
+
+from app.config.settings import settings
+from app.services.vitals_store import vitals_store
+
+class LatestVitalsCache:
+    """Bounded LRU of ``patientId -> latest reading`` with per-entry TTL"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.invalidations = 0
+
+    def _put(self, key: str, reading: Optional[Dict[str, Any]], now: float):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (reading, now + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def record(self, documents: Iterable[Dict[str, Any]]):
+        """Write path: keep the newest of the cached and the just-written readings"""
+        now = time.monotonic()
+        newest: Dict[str, Dict[str, Any]] = {}
+        for document in documents:
+            key = str(document["patientId"])
+            if key not in newest or document["recordedAt"] > newest[key]["recordedAt"]:
+                newest[key] = document
+        for key, document in newest.items():
+            entry = self._entries.get(key)
+            # Only a live entry is authoritative; otherwise the next read reloads it
+            if entry is None or entry[1] <= now:
+                continue
+            cached = entry[0]
+            if cached is None or document["recordedAt"] >= cached["recordedAt"]:
+                self._put(key, document, now)
+                self.updates += 1
+
+    def invalidate(self, patient_id: Any):
+        """Drop a patient's entry after one of their readings changed"""
+        if self._entries.pop(str(patient_id), None) is not None:
+            self.invalidations += 1
+
+    async def get_many(self, db, patient_ids: List[Any], populate: bool = True) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Latest reading per patient; misses are loaded concurrently from the vitals store
+
+        Bulk readers (exports) pass ``populate=False`` so a sweep over every
+        patient neither stores its misses nor reorders the LRU.
+        """
+        now = time.monotonic()
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        missing: Dict[str, Any] = {}
+        for patient_id in patient_ids:
+            key = str(patient_id)
+            if key in found or key in missing:
+                continue
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                if populate:
+                    self._entries.move_to_end(key)
+                found[key] = entry[0]
+                self.hits += 1
+            else:
+                missing[key] = patient_id
+                self.misses += 1
+        if missing:
+            loaded = await asyncio.gather(*(vitals_store.latest(db, patient_id) for patient_id in missing.values()))
+            for key, reading in zip(missing, loaded):
+                # A reading ingested while the query ran may already be newer
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] is not None and (
+                        reading is None or entry[0]["recordedAt"] >= reading["recordedAt"]):
+                    reading = entry[0]
+                if populate:
+                    self._put(key, reading, now)
+                found[key] = reading
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "writeUpdates": self.updates,
+            "invalidations": self.invalidations,
+        }
+
+latest_vitals_cache = LatestVitalsCache(settings.VITALS_LATEST_CACHE_SIZE, settings.VITALS_LATEST_CACHE_TTL_SECONDS)
@@ -0,0 +1,296 @@
+"""Materialized counters behind the dashboard overview.
+
+All totals live in one ``stats`` document (``_id: "overview"``). Write
+paths report each change as the difference between a document's
+contribution before and after the write (``patient_changed``,
+``appointment_changed``, ``vitals_recorded``). Deltas are summed in memory
+and applied with a single ``$inc`` every ``flush_interval_ms``, so a burst
+of writes costs one update.
+
+Day-keyed counters (appointments by scheduled day, alerts by recorded day)
+are UTC. Every ``reconcile_interval`` seconds the document is replaced with
+a full recount. That repairs drift from failed flushes, crashes or writes
+that bypass the API, and prunes days that are no longer shown. The
+endpoint reads the document through a short TTL cache. Before the first
+reconcile has written the document, it answers with zeros marked
+``reconciling`` and starts the recount in the background rather than
+scanning every collection inside the request.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+import asyncio
+import logging
+import time
+
+from app.config.settings import settings
+from app.models.appointment import INACTIVE_APPOINTMENT_STATUSES
+from app.services.vitals_store import vitals_store
+
+logger = logging.getLogger(__name__)
+
+def day_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%d")
+
+def patient_counters(patient: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """Counters one patient document contributes to"""
+    if not patient or not patient.get("isActive", True):
+        return {}
+    counters = {"activePatients": 1}
+    if patient.get("assignedDoctor"):
+        counters[f"doctorPatients.{patient['assignedDoctor']}"] = 1
+    return counters
+
+def appointment_counters(appointment: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """Counters one appointment document contributes to"""
+    if not appointment or appointment.get("status") in INACTIVE_APPOINTMENT_STATUSES:
+        return {}
+    day = day_key(appointment["scheduledDate"])
+    counters = {f"appointments.{day}.total": 1}
+    if appointment.get("doctorId"):
+        counters[f"appointments.{day}.doctors.{appointment['doctorId']}"] = 1
+    return counters
+
+class OverviewStats:
+    """Buffers counter deltas, flushes them to the stats document and reconciles it"""
+
+    collection = "stats"
+    document_id = "overview"
+
+    def __init__(self, flush_interval_ms: int, reconcile_interval: float, cache_ttl: float, appointment_days: int):
+        self.flush_interval = flush_interval_ms / 1000
+        self.reconcile_interval = reconcile_interval
+        self.cache_ttl = cache_ttl
+        self.appointment_days = appointment_days
+        self._pending: Counter = Counter()
+        self._get_database: Optional[Callable[[], Awaitable[Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._reconcile_task: Optional[asyncio.Task] = None
+        # Created on first use so it binds to the running loop
+        self._lock: Optional[asyncio.Lock] = None
+        self._cached: Optional[Dict[str, Any]] = None
+        self._cached_until = 0.0
+        self._last_reconcile = 0.0
+        # Counters
+        self.recorded = 0
+        self.flushes = 0
+        self.reconciles = 0
+        self.errors = 0
+        self.hits = 0
+        self.misses = 0
+        self.last_reconcile_ms = 0.0
+
+    def record(self, deltas: Dict[str, int]):
+        """Queue counter increments; never blocks"""
+        for key, delta in deltas.items():
+            if delta:
+                self._pending[key] += delta
+        self.recorded += 1
+
+    def _changed(self, before: Dict[str, int], after: Dict[str, int]):
+        deltas = Counter(after)
+        deltas.subtract(before)
+        self.record(deltas)
+
+    def patient_changed(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        self._changed(patient_counters(before), patient_counters(after))
+
+    def appointment_changed(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        self._changed(appointment_counters(before), appointment_counters(after))
+
+    def vitals_recorded(self, documents: Iterable[Dict[str, Any]]):
+        """Count the alerts raised by stored readings, by recorded day and severity"""
+        deltas: Counter = Counter()
+        for document in documents:
+            if document.get("alerts"):
+                day = day_key(document["recordedAt"])
+                for alert in document["alerts"]:
+                    deltas[f"alerts.{day}.{alert['severity']}"] += 1
+        if deltas:
+            self.record(deltas)
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def start(self, get_database: Callable[[], Awaitable[Any]]):
+        """Start the flush/reconcile loop on the running event loop"""
+        self._get_database = get_database
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the loop and write out pending deltas"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                if time.monotonic() - self._last_reconcile >= self.reconcile_interval:
+                    await self.reconcile(await self._get_database())
+                else:
+                    await self.flush()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Overview stats update failed: {e}")
+            await asyncio.sleep(self.flush_interval)
+
+    async def flush(self):
+        """Apply pending deltas with one ``$inc``"""
+        if not self._pending or self._get_database is None:
+            return
+        async with self._get_lock():
+            pending, self._pending = self._pending, Counter()
+            try:
+                db = await self._get_database()
+                await db[self.collection].update_one(
+                    {"_id": self.document_id},
+                    {"$inc": dict(pending), "$set": {"updatedAt": datetime.utcnow()}},
+                    upsert=True
+                )
+                self.flushes += 1
+            except Exception:
+                # Keep the deltas for the next flush
+                pending.update(self._pending)
+                self._pending = pending
+                raise
+
+    async def _recount(self, db) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        doctor_patients = {
+            str(group["_id"]): group["count"]
+            async for group in db.patients.aggregate([
+                {"$match": {"isActive": True, "assignedDoctor": {"$ne": None}}},
+                {"$group": {"_id": "$assignedDoctor", "count": {"$sum": 1}}},
+            ])
+        }
+
+        appointments: Dict[str, Any] = {}
+        cursor = db.appointments.find(
+            {"scheduledDate": {"$gte": today, "$lt": today + timedelta(days=self.appointment_days)},
+             "status": {"$nin": list(INACTIVE_APPOINTMENT_STATUSES)}},
+            {"scheduledDate": 1, "doctorId": 1}
+        )
+        async for appointment in cursor:
+            counters = appointments.setdefault(day_key(appointment["scheduledDate"]), {"total": 0, "doctors": {}})
+            counters["total"] += 1
+            if appointment.get("doctorId"):
+                doctor_id = str(appointment["doctorId"])
+                counters["doctors"][doctor_id] = counters["doctors"].get(doctor_id, 0) + 1
+
+        return {
+            "activePatients": await db.patients.count_documents({"isActive": True}),
+            "doctorPatients": doctor_patients,
+            "appointments": appointments,
+            "alerts": {day_key(today): await vitals_store.alert_counts(db, today, today + timedelta(days=1))},
+            "reconciledAt": now,
+            "updatedAt": now,
+        }
+
+    async def reconcile(self, db):
+        """Replace the stats document with a full recount
+
+        Deltas queued before the recount starts are dropped, since the
+        recount reflects those writes. Deltas recorded while it runs are kept
+        for the next flush: the recount may or may not have seen their
+        writes, and counting one twice until the next reconcile is better
+        than losing it.
+        """
+        async with self._get_lock():
+            started = time.perf_counter()
+            # record() takes no lock, so swap the counter rather than clearing it after the awaits
+            superseded, self._pending = self._pending, Counter()
+            try:
+                counts = await self._recount(db)
+                await db[self.collection].update_one({"_id": self.document_id}, {"$set": counts}, upsert=True)
+            except Exception:
+                superseded.update(self._pending)
+                self._pending = superseded
+                raise
+            self._last_reconcile = time.monotonic()
+            self._cached = None
+            self.reconciles += 1
+            self.last_reconcile_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"Overview stats reconciled in {self.last_reconcile_ms:.0f} ms")
+
+    def _reconcile_in_background(self, db):
+        if self._reconcile_task is None or self._reconcile_task.done():
+            self._reconcile_task = asyncio.create_task(self._background_reconcile(db))
+
+    async def _background_reconcile(self, db):
+        try:
+            await self.reconcile(db)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Overview stats reconcile failed: {e}")
+
+    async def overview(self, db) -> Dict[str, Any]:
+        """Today's totals from the stats document (cached for ``cache_ttl`` seconds)"""
+        now = time.monotonic()
+        if self._cached is not None and now < self._cached_until:
+            self.hits += 1
+            return self._cached
+        self.misses += 1
+        document = await db[self.collection].find_one({"_id": self.document_id})
+        reconciling = document is None or "reconciledAt" not in document
+        if reconciling:
+            # First read before any reconcile; a recount scans every collection, so not in the request
+            self._reconcile_in_background(db)
+            document = document or {}
+
+        today = day_key(datetime.utcnow())
+        appointments = (document.get("appointments") or {}).get(today) or {}
+        doctor_patients = document.get("doctorPatients") or {}
+        doctor_appointments = appointments.get("doctors") or {}
+        workload: List[Dict[str, Any]] = [
+            {
+                "doctorId": doctor_id,
+                "activePatients": doctor_patients.get(doctor_id, 0),
+                "appointmentsToday": doctor_appointments.get(doctor_id, 0),
+            }
+            for doctor_id in set(doctor_patients) | set(doctor_appointments)
+        ]
+        workload.sort(key=lambda doctor: (-doctor["activePatients"], -doctor["appointmentsToday"], doctor["doctorId"]))
+        result = {
+            "day": today,
+            "activePatients": document.get("activePatients", 0),
+            "appointmentsToday": appointments.get("total", 0),
+            "alertsToday": (document.get("alerts") or {}).get(today) or {},
+            "doctorWorkload": workload,
+            "updatedAt": document.get("updatedAt"),
+            "reconciledAt": document.get("reconciledAt"),
+            "reconciling": reconciling,
+        }
+        if not reconciling:
+            self._cached = result
+            self._cached_until = now + self.cache_ttl
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "pendingCounters": len(self._pending),
+            "recorded": self.recorded,
+            "flushes": self.flushes,
+            "reconciles": self.reconciles,
+            "lastReconcileMs": round(self.last_reconcile_ms, 2),
+            "errors": self.errors,
+            "cacheHitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+overview_stats = OverviewStats(
+    settings.OVERVIEW_FLUSH_INTERVAL_MS,
+    settings.OVERVIEW_RECONCILE_INTERVAL_SECONDS,
+    settings.OVERVIEW_CACHE_TTL_SECONDS,
+    settings.OVERVIEW_APPOINTMENT_DAYS,
+)
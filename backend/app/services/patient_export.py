@@ -0,0 +1,251 @@
+"""Streaming export of patient records as NDJSON, CSV or Parquet.
+
+Patients are read in keyset-paged batches of ``EXPORT_BATCH_SIZE`` on the
+``(createdAt, _id)`` index, the same order as the paginated listing. Each
+batch is a short query, so a slow client never pins a server-side cursor,
+and only one batch is held in memory at a time. An interrupted export is
+resumed by passing the id of the last patient received as ``after``.
+
+With ``include_vitals`` each batch is joined with the patients' latest
+readings through ``LatestVitalsCache`` without populating it, so a full
+export does not evict the hot entries ward dashboards rely on.
+
+NDJSON rows have the ``PatientResponse`` shape (plus ``latestVitals``).
+CSV and Parquet flatten them into ``COLUMNS``. Parquet is written one row
+group per batch.
+"""
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import csv
+import io
+import json
+
+from bson import ObjectId
+
+from app.services.latest_vitals import latest_vitals_cache
+from app.utils.pagination import KEYSET_SORT, encode_cursor, keyset_filter
+
+# Media type and file extension per format
+FORMATS: Dict[str, Tuple[str, str]] = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Stored fields that are exported; search keys and audit fields stay internal
+EXPORT_PROJECTION = {
+    "patientId": 1, "personalInfo": 1, "medicalInfo": 1, "assignedDoctor": 1,
+    "registrationDate": 1, "lastVisit": 1, "isActive": 1, "createdAt": 1,
+}
+
+# Flat columns for CSV and Parquet: (name, path into the NDJSON row, kind)
+PATIENT_COLUMNS = [
+    ("id", ("id",), "string"),
+    ("patientId", ("patientId",), "string"),
+    ("firstName", ("personalInfo", "firstName"), "string"),
+    ("lastName", ("personalInfo", "lastName"), "string"),
+    ("dateOfBirth", ("personalInfo", "dateOfBirth"), "timestamp"),
+    ("gender", ("personalInfo", "gender"), "string"),
+    ("phone", ("personalInfo", "phone"), "string"),
+    ("email", ("personalInfo", "email"), "string"),
+    ("street", ("personalInfo", "address", "street"), "string"),
+    ("city", ("personalInfo", "address", "city"), "string"),
+    ("state", ("personalInfo", "address", "state"), "string"),
+    ("zipCode", ("personalInfo", "address", "zipCode"), "string"),
+    ("country", ("personalInfo", "address", "country"), "string"),
+    ("emergencyContactName", ("personalInfo", "emergencyContact", "name"), "string"),
+    ("emergencyContactRelationship", ("personalInfo", "emergencyContact", "relationship"), "string"),
+    ("emergencyContactPhone", ("personalInfo", "emergencyContact", "phone"), "string"),
+    ("bloodType", ("medicalInfo", "bloodType"), "string"),
+    ("height", ("medicalInfo", "height"), "float"),
+    ("weight", ("medicalInfo", "weight"), "float"),
+    ("allergies", ("medicalInfo", "allergies"), "list"),
+    ("chronicConditions", ("medicalInfo", "chronicConditions"), "list"),
+    ("medications", ("medicalInfo", "medications"), "list"),
+    ("insuranceProvider", ("medicalInfo", "insuranceInfo", "provider"), "string"),
+    ("insurancePolicyNumber", ("medicalInfo", "insuranceInfo", "policyNumber"), "string"),
+    ("assignedDoctor", ("assignedDoctor",), "string"),
+    ("registrationDate", ("registrationDate",), "timestamp"),
+    ("lastVisit", ("lastVisit",), "timestamp"),
+    ("isActive", ("isActive",), "bool"),
+    ("createdAt", ("createdAt",), "timestamp"),
+]
+VITALS_COLUMNS = [
+    ("latestVitalsAt", ("latestVitals", "recordedAt"), "timestamp"),
+    ("heartRate", ("latestVitals", "vitals", "heartRate"), "float"),
+    ("systolic", ("latestVitals", "vitals", "bloodPressure", "systolic"), "float"),
+    ("diastolic", ("latestVitals", "vitals", "bloodPressure", "diastolic"), "float"),
+    ("temperature", ("latestVitals", "vitals", "temperature"), "float"),
+    ("respiratoryRate", ("latestVitals", "vitals", "respiratoryRate"), "float"),
+    ("oxygenSaturation", ("latestVitals", "vitals", "oxygenSaturation"), "float"),
+    ("bloodSugar", ("latestVitals", "vitals", "bloodSugar"), "float"),
+    ("latestAlerts", ("latestVitals", "alerts"), "count"),
+]
+
+# Separator for list fields in flat formats
+LIST_SEPARATOR = "; "
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+def vitals_row(reading: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not reading:
+        return None
+    return {
+        "id": str(reading["_id"]),
+        "recordedBy": str(reading["recordedBy"]),
+        "vitals": reading["vitals"],
+        "notes": reading.get("notes"),
+        "alerts": reading.get("alerts", []),
+        "recordedAt": reading["recordedAt"],
+        "createdAt": reading["createdAt"],
+    }
+
+def export_row(document: Dict[str, Any]) -> Dict[str, Any]:
+    """NDJSON row for a patients document, in ``PatientResponse`` shape"""
+    return {
+        "id": str(document["_id"]),
+        "patientId": document["patientId"],
+        "personalInfo": document.get("personalInfo"),
+        "medicalInfo": document.get("medicalInfo"),
+        "assignedDoctor": str(document["assignedDoctor"]) if document.get("assignedDoctor") else None,
+        "registrationDate": document.get("registrationDate"),
+        "lastVisit": document.get("lastVisit"),
+        "isActive": document.get("isActive", True),
+        "createdAt": document["createdAt"],
+    }
+
+def column_value(row: Dict[str, Any], path: Tuple[str, ...], kind: str) -> Any:
+    value: Any = row
+    for name in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(name)
+    if kind == "list":
+        return LIST_SEPARATOR.join(value) if value else None
+    if kind == "count":
+        return None if value is None else len(value)
+    if kind == "float" and value is not None:
+        return float(value)
+    return value
+
+class NdjsonEncoder:
+    def __init__(self, columns: List[Tuple[str, Tuple[str, ...], str]]):
+        self.columns = columns
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        return "".join(
+            json.dumps(row, default=_json_default, separators=(",", ":")) + "\n" for row in rows
+        ).encode()
+
+    def footer(self) -> bytes:
+        return b""
+
+class CsvEncoder(NdjsonEncoder):
+    def _write(self, rows: List[List[Any]]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
+
+    def header(self) -> bytes:
+        return self._write([[name for name, _, _ in self.columns]])
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        return self._write([
+            [
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in (column_value(row, path, kind) for _, path, kind in self.columns)
+            ]
+            for row in rows
+        ])
+
+class _Drain:
+    """Write-only file for pyarrow that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+class ParquetEncoder(NdjsonEncoder):
+    def __init__(self, columns: List[Tuple[str, Tuple[str, ...], str]]):
+        # Only loaded when a Parquet export is requested
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        super().__init__(columns)
+        self._pa = pa
+        kinds = {"string": pa.string(), "timestamp": pa.timestamp("ms"), "float": pa.float64(),
+                 "bool": pa.bool_(), "list": pa.string(), "count": pa.int32()}
+        self.schema = pa.schema([(name, kinds[kind]) for name, _, kind in columns])
+        self._sink = _Drain()
+        self._writer = pq.ParquetWriter(pa.PythonFile(self._sink, mode="w"), self.schema, compression="zstd")
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        arrays = [
+            self._pa.array([column_value(row, path, kind) for row in rows], type=field.type)
+            for (_, path, kind), field in zip(self.columns, self.schema)
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self.schema))
+        return self._sink.drain()
+
+    def footer(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+ENCODERS: Dict[str, Callable[[List[Tuple[str, Tuple[str, ...], str]]], NdjsonEncoder]] = {
+    "ndjson": NdjsonEncoder,
+    "csv": CsvEncoder,
+    "parquet": ParquetEncoder,
+}
+
+async def export_patients(db, query: Dict[str, Any], export_format: str, include_vitals: bool,
+                          batch_size: int, after: Optional[str] = None) -> AsyncIterator[bytes]:
+    """Encoded export of every patient matching ``query``, one chunk per batch
+
+    ``after`` is an encoded keyset position (see ``encode_cursor``).
+    """
+    columns = PATIENT_COLUMNS + (VITALS_COLUMNS if include_vitals else [])
+    encoder = ENCODERS[export_format](columns)
+    yield encoder.header()
+    while True:
+        cursor = db.patients.find(keyset_filter(query, after), EXPORT_PROJECTION).sort(KEYSET_SORT).limit(batch_size)
+        batch = await cursor.to_list(length=batch_size)
+        if not batch:
+            break
+        rows = [export_row(document) for document in batch]
+        if include_vitals:
+            latest = await latest_vitals_cache.get_many(db, [document["_id"] for document in batch], populate=False)
+            for row in rows:
+                row["latestVitals"] = vitals_row(latest.get(row["id"]))
+        yield encoder.encode(rows)
+        if len(batch) < batch_size:
+            break
+        after = encode_cursor(batch[-1])
+    yield encoder.footer()
@@ -0,0 +1,56 @@
+"""Local, collision-free patient ID generation.
+
+IDs look like ``P1760791234042007``: ``P``, the Unix time in seconds
+(10 digits), a node number (3 digits) and a per-second sequence (3 digits).
+They are fixed width, so they sort by creation time, and IDs minted by the
+old ``P{unix_seconds}`` scheme sort before any new ID from the same second.
+
+Each process owns a node number, so IDs are unique without a database
+round trip. Set ``PATIENT_ID_NODE`` per worker for a hard guarantee. When
+it is unset, a number is derived from the host name and PID, and the
+unique index on ``patientId`` catches the rare clash. Appointment IDs
+(``APT...``) use the same scheme with another prefix.
+"""
+import os
+import socket
+import threading
+import time
+import zlib
+
+from app.config.settings import settings
+
+NODE_COUNT = 1000
+SEQUENCE_SIZE = 1000
+
+def default_node_id() -> int:
+    """Node number derived from host name and process ID"""
+    return zlib.crc32(f"{socket.gethostname()}:{os.getpid()}".encode()) % NODE_COUNT
+
+class PatientIdGenerator:
+    """Time + node + sequence ID generator; thread-safe and never blocks on the clock"""
+
+    def __init__(self, node_id: int, prefix: str = "P"):
+        self.node_id = node_id % NODE_COUNT
+        self.prefix = prefix
+        self._second = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> str:
+        """Return the next patient ID"""
+        with self._lock:
+            now = int(time.time())
+            if now > self._second:
+                self._second, self._sequence = now, 0
+            else:
+                # Same second, or the clock went backwards: keep counting
+                self._sequence += 1
+                if self._sequence >= SEQUENCE_SIZE:
+                    # Sequence exhausted; borrow the next second instead of waiting for it
+                    self._second += 1
+                    self._sequence = 0
+            return f"{self.prefix}{self._second:010d}{self.node_id:03d}{self._sequence:03d}"
+
+node_id = settings.PATIENT_ID_NODE if settings.PATIENT_ID_NODE >= 0 else default_node_id()
+patient_id_generator = PatientIdGenerator(node_id)
+appointment_id_generator = PatientIdGenerator(node_id, prefix="APT")
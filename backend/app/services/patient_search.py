@@ -0,0 +1,99 @@
+"""Prefix search over patients backed by normalized, indexed search keys.
+
+Every patient document carries a ``search`` sub-document holding casefolded,
+accent-stripped copies of the searchable fields::
+
+    "search": {
+        "firstName": "jose",
+        "lastName": "garcia lopez",
+        "keys": ["jose", "garcia lopez", "garcia", "lopez", "p000123", "jg@x.org", "jg"]
+    }
+
+``search.keys`` is a multikey index and ``(search.firstName, search.lastName)``
+mirrors the ``personalInfo`` name index, so a search term becomes an index
+range (``$gte`` term, ``$lt`` term + U+FFFF, inside ``$elemMatch`` for the
+array) instead of an unanchored regex.
+"""
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+SEARCH_FIELD = "search"
+
+# Highest code point in the BMP; appended to a prefix to get its upper bound
+_PREFIX_END = "\uffff"
+
+# Longest term and number of terms accepted from the search box
+MAX_TERM_LENGTH = 64
+MAX_TERMS = 4
+
+def normalize_text(value: Optional[str]) -> str:
+    """Casefold and strip accents so "José" and "jose" share a key"""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+def build_search_document(personal_info: Dict[str, Any], patient_id: str) -> Dict[str, Any]:
+    """Build the ``search`` sub-document stored alongside a patient"""
+    first_name = normalize_text(personal_info.get("firstName"))
+    last_name = normalize_text(personal_info.get("lastName"))
+    email = normalize_text(personal_info.get("email"))
+
+    keys = [first_name, last_name, normalize_text(patient_id)]
+    keys += first_name.split() + last_name.split()
+    if email:
+        keys += [email, email.split("@", 1)[0]]
+
+    return {
+        "firstName": first_name,
+        "lastName": last_name,
+        "keys": sorted({key for key in keys if key}),
+    }
+
+def _prefix_range(term: str) -> Dict[str, str]:
+    return {"$gte": term, "$lt": term + _PREFIX_END}
+
+def _key_prefix(term: str) -> Dict[str, Any]:
+    # $elemMatch makes one array element satisfy both bounds (and keeps the
+    # multikey index bounds tight); a bare range could match two different keys
+    return {"$elemMatch": _prefix_range(term)}
+
+def build_search_filter(search: str) -> Optional[Dict[str, Any]]:
+    """Translate free text from the search box into an index-served filter
+
+    A single term is a prefix match on any search key. Two or more terms are
+    treated as a name: the first against ``firstName`` and the rest against
+    ``lastName`` (or the other way round), which the compound name index
+    answers with a range on its leading field.
+    Returns None when nothing searchable is left after normalization.
+    """
+    terms = normalize_text(search[:MAX_TERM_LENGTH * MAX_TERMS]).split()[:MAX_TERMS]
+    terms = [term[:MAX_TERM_LENGTH] for term in terms]
+    if not terms:
+        return None
+    if len(terms) == 1:
+        return {f"{SEARCH_FIELD}.keys": _key_prefix(terms[0])}
+
+    first, rest = terms[0], " ".join(terms[1:])
+    last, others = terms[-1], " ".join(terms[:-1])
+    return {"$or": [
+        {f"{SEARCH_FIELD}.firstName": _prefix_range(first), f"{SEARCH_FIELD}.lastName": _prefix_range(rest)},
+        {f"{SEARCH_FIELD}.firstName": _prefix_range(last), f"{SEARCH_FIELD}.lastName": _prefix_range(others)},
+    ]}
+
+async def backfill_search_documents(db, batch_size: int = 1000) -> int:
+    """Add ``search`` to patients created before it existed; returns the count"""
+    updated = 0
+    cursor = db.patients.find({SEARCH_FIELD: {"$exists": False}})
+    while True:
+        batch: List[Dict[str, Any]] = await cursor.to_list(length=batch_size)
+        if not batch:
+            return updated
+        for patient in batch:
+            await db.patients.update_one(
+                {"_id": patient["_id"]},
+                {"$set": {SEARCH_FIELD: build_search_document(patient.get("personalInfo", {}),
+                                                              patient.get("patientId", ""))}}
+            )
+            updated += 1
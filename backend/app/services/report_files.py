@@ -0,0 +1,186 @@
+"""Report file previews and download accounting.
+
+The files themselves live in the blob store (``app.services.blob_store``),
+which streams, deduplicates and reference-counts them. They are downloaded
+through ``GET /reports/{id}/download`` (see ``app.utils.file_response``),
+never a public static mount.
+
+Previews (a JPEG of at most ``PREVIEW_SIZE`` pixels) are rendered by a
+bounded process pool: images with Pillow, the first page of PDFs with
+``pdftoppm`` (poppler-utils) when it is installed. They are stored at
+``UPLOAD_DIR/previews/<sha[:2]>/<sha[2:4]>/<sha>.jpg``, so duplicates
+reuse them, and are deleted with their blob. A preview is best effort:
+when the pool's queue is full or rendering fails the file simply has none.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+import aiofiles
+import aiofiles.os
+
+from app.config.settings import settings
+from app.services.blob_store import blob_store
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the formats we recognise, checked before trusting the client's type
+SIGNATURES = [
+    (b"%PDF-", "pdf", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"\xff\xd8\xff", "jpeg", "image/jpeg"),
+    (b"GIF87a", "gif", "image/gif"),
+    (b"GIF89a", "gif", "image/gif"),
+    (b"II*\x00", "tiff", "image/tiff"),
+    (b"MM\x00*", "tiff", "image/tiff"),
+    (b"BM", "bmp", "image/bmp"),
+]
+IMAGE_TYPES = {"png", "jpeg", "gif", "tiff", "bmp", "webp"}
+
+def sniff(head: bytes, file_name: str, content_type: Optional[str]):
+    """(fileType, contentType) from the first bytes, falling back to the client's claims"""
+    for signature, file_type, media_type in SIGNATURES:
+        if head.startswith(signature):
+            return file_type, media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    extension = os.path.splitext(file_name)[1].lstrip(".").lower()
+    return extension or "bin", content_type or "application/octet-stream"
+
+def render_preview(source: str, target: str, file_type: str, size: int) -> bool:
+    """Write a JPEG preview of ``source`` to ``target``; runs in a worker process"""
+    partial = f"{target}.{os.getpid()}.part"
+    try:
+        if file_type in IMAGE_TYPES:
+            from PIL import Image
+
+            with Image.open(source) as image:
+                # Lets the JPEG decoder scale down while decoding instead of afterwards
+                image.draft("RGB", (size, size))
+                image.thumbnail((size, size))
+                image.convert("RGB").save(partial, "JPEG", quality=80)
+        elif file_type == "pdf":
+            if shutil.which("pdftoppm") is None:
+                return False
+            subprocess.run(
+                ["pdftoppm", "-jpeg", "-singlefile", "-f", "1", "-l", "1", "-scale-to", str(size),
+                 source, partial],
+                check=True, timeout=60, capture_output=True
+            )
+            os.replace(f"{partial}.jpg", partial)
+        else:
+            return False
+        os.replace(partial, target)
+        return True
+    finally:
+        for leftover in (partial, f"{partial}.jpg"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+class ReportFileStore:
+    """Previews of report blobs under ``UPLOAD_DIR/previews``, plus upload and download counters"""
+
+    def __init__(self, upload_dir: str, preview_workers: int, preview_max_queue: int, preview_size: int):
+        self.preview_root = os.path.join(upload_dir, "previews")
+        self.preview_workers = preview_workers
+        self.preview_max_queue = preview_max_queue
+        self.preview_size = preview_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._queued = 0
+        # Counters
+        self.rejected = 0
+        self.previews = 0
+        self.previews_skipped = 0
+        self.preview_errors = 0
+        self.total_preview_seconds = 0.0
+        self.downloads = 0
+        self.partial_downloads = 0
+        self.not_modified = 0
+        self.bytes_served = 0
+
+    def preview_path(self, sha256: str) -> str:
+        return os.path.join(self.preview_root, sha256[:2], sha256[2:4], f"{sha256}.jpg")
+
+    async def remove_preview(self, sha256: str):
+        """Blob store hook: a collected blob takes its preview with it"""
+        try:
+            await aiofiles.os.remove(self.preview_path(sha256))
+        except FileNotFoundError:
+            pass
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.preview_workers)
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created on first use, inside the event loop that serves requests
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.preview_workers)
+        return self._semaphore
+
+    async def preview(self, sha256: str, file_type: str) -> bool:
+        """Render the preview of a stored blob unless it exists; whether there is one"""
+        if file_type not in IMAGE_TYPES and file_type != "pdf":
+            return False
+        target = self.preview_path(sha256)
+        if await aiofiles.os.path.exists(target):
+            return True
+        if self._queued >= self.preview_max_queue:
+            self.previews_skipped += 1
+            return False
+
+        self._queued += 1
+        try:
+            async with self._get_semaphore():
+                started = time.perf_counter()
+                await aiofiles.os.makedirs(os.path.dirname(target), exist_ok=True)
+                loop = asyncio.get_running_loop()
+                rendered = await loop.run_in_executor(
+                    self._get_executor(), render_preview,
+                    blob_store.path(sha256), target, file_type, self.preview_size
+                )
+                self.total_preview_seconds += time.perf_counter() - started
+        except Exception as e:
+            self.preview_errors += 1
+            logger.warning(f"Preview of {sha256} failed: {e}")
+            return False
+        finally:
+            self._queued -= 1
+        if rendered:
+            self.previews += 1
+        return rendered
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rejected": self.rejected,
+            "previews": self.previews,
+            "previewsQueued": self._queued,
+            "previewsSkipped": self.previews_skipped,
+            "previewErrors": self.preview_errors,
+            "avgPreviewMs": round(self.total_preview_seconds / self.previews * 1000, 2) if self.previews else 0.0,
+            "downloads": self.downloads,
+            "partialDownloads": self.partial_downloads,
+            "notModified": self.not_modified,
+            "bytesServed": self.bytes_served,
+        }
+
+report_files = ReportFileStore(
+    settings.UPLOAD_DIR,
+    settings.PREVIEW_WORKERS,
+    settings.PREVIEW_MAX_QUEUE,
+    settings.PREVIEW_SIZE,
+)
+blob_store.on_collect.append(report_files.remove_preview)
@@ -0,0 +1,207 @@
+"""Threshold alerts for vital-sign readings.
+
+Each measurement has four bounds: values outside the warning band raise a
+``warning`` alert and values outside the critical band a ``critical`` one.
+A batch is evaluated column-wise with NumPy: measurements are gathered into
+an ``(readings, measurements)`` matrix and compared against the bounds of
+each reading's patient in one pass, so Python only touches the readings
+that actually raised an alert.
+
+Bounds start from adult reference ranges and are adjusted per patient from
+``medicalInfo.chronicConditions`` and explicit ``medicalInfo.alertThresholds``.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import time
+
+import numpy as np
+
+from app.config.settings import settings
+from app.models.vital import AlertSeverity
+
+class Threshold(NamedTuple):
+    label: str
+    unit: str
+    critical_low: Optional[float]
+    warning_low: Optional[float]
+    warning_high: Optional[float]
+    critical_high: Optional[float]
+
+# Keyed by the measurement's path inside ``vitals``
+VITAL_THRESHOLDS: Dict[str, Threshold] = {
+    "heartRate": Threshold("Heart rate", "bpm", 40, 50, 100, 130),
+    "bloodPressure.systolic": Threshold("Systolic blood pressure", "mmHg", 80, 90, 140, 180),
+    "bloodPressure.diastolic": Threshold("Diastolic blood pressure", "mmHg", 40, 60, 90, 120),
+    "temperature": Threshold("Temperature", "°F", 95.0, 96.8, 100.4, 103.0),
+    "respiratoryRate": Threshold("Respiratory rate", "breaths/min", 8, 12, 20, 30),
+    "oxygenSaturation": Threshold("Oxygen saturation", "%", 90, 94, None, None),
+    "bloodSugar": Threshold("Blood sugar", "mg/dL", 54, 70, 180, 300),
+}
+
+# Bound overrides applied when a chronic condition contains the key (case-insensitive)
+CONDITION_RULES: Dict[str, Dict[str, Dict[str, float]]] = {
+    "copd": {"oxygenSaturation": {"criticalLow": 85, "warningLow": 88}},
+    "chronic obstructive": {"oxygenSaturation": {"criticalLow": 85, "warningLow": 88}},
+    "hypertension": {"bloodPressure.systolic": {"warningHigh": 160, "criticalHigh": 190},
+                     "bloodPressure.diastolic": {"warningHigh": 100, "criticalHigh": 125}},
+    "diabetes": {"bloodSugar": {"warningHigh": 250, "criticalHigh": 400}},
+    "atrial fibrillation": {"heartRate": {"warningHigh": 110, "criticalHigh": 150}},
+    "heart failure": {"bloodPressure.systolic": {"criticalLow": 75, "warningLow": 85}},
+}
+
+METRICS = list(VITAL_THRESHOLDS)
+BOUNDS = ["criticalLow", "warningLow", "warningHigh", "criticalHigh"]
+
+# (parent key or None, field) per metric column
+_COLUMNS = [tuple(path.split(".")) if "." in path else (None, path) for path in METRICS]
+
+# Alert codes, in the order the bounds are checked
+_DIRECTIONS = [
+    None,
+    ("critically low", AlertSeverity.CRITICAL.value),
+    ("critically high", AlertSeverity.CRITICAL.value),
+    ("low", AlertSeverity.WARNING.value),
+    ("high", AlertSeverity.WARNING.value),
+]
+# Message prefix and severity per (measurement, code), built once
+_TEMPLATES = [
+    [None] + [(f"{threshold.label} {direction}: ", f" {threshold.unit}", severity)
+              for direction, severity in _DIRECTIONS[1:]]
+    for threshold in VITAL_THRESHOLDS.values()
+]
+
+DEFAULT_RULES = np.array(
+    [[np.nan if bound is None else bound for bound in threshold[2:]] for threshold in VITAL_THRESHOLDS.values()],
+    dtype=float,
+)
+
+def build_rules(medical_info: Optional[Dict[str, Any]]) -> np.ndarray:
+    """Per-patient ``(measurements, 4)`` bounds matrix from a ``medicalInfo`` document"""
+    rules = DEFAULT_RULES.copy()
+    if not medical_info:
+        return rules
+    overrides: List[Dict[str, Dict[str, float]]] = []
+    for condition in medical_info.get("chronicConditions") or []:
+        condition = condition.lower()
+        overrides.extend(rule for key, rule in CONDITION_RULES.items() if key in condition)
+    # Explicit per-patient thresholds win over condition defaults
+    overrides.append(medical_info.get("alertThresholds") or {})
+    for override in overrides:
+        for metric, bounds in override.items():
+            if metric not in VITAL_THRESHOLDS:
+                continue
+            row = METRICS.index(metric)
+            for column, bound in enumerate(BOUNDS):
+                if bounds.get(bound) is not None:
+                    rules[row, column] = bounds[bound]
+    return rules
+
+def measurement_matrix(vitals_list: List[Dict[str, Any]]) -> np.ndarray:
+    """``(readings, measurements)`` float matrix; missing values are NaN"""
+    values = np.empty((len(vitals_list), len(METRICS)), dtype=float)
+    for column, (parent, field) in enumerate(_COLUMNS):
+        if parent is None:
+            cells = [vitals.get(field) for vitals in vitals_list]
+        else:
+            cells = [(vitals.get(parent) or {}).get(field) for vitals in vitals_list]
+        values[:, column] = np.array(cells, dtype=float)
+    return values
+
+def evaluate(vitals_list: List[Dict[str, Any]], rules: np.ndarray) -> List[List[Dict[str, Any]]]:
+    """Alerts for each reading; ``rules`` is ``(readings, measurements, 4)`` or one shared matrix"""
+    values = measurement_matrix(vitals_list)
+    # NaN (missing value or unset bound) compares False, so it never alerts
+    with np.errstate(invalid="ignore"):
+        codes = np.select(
+            [values < rules[..., 0], values > rules[..., 3], values < rules[..., 1], values > rules[..., 2]],
+            [1, 2, 3, 4],
+            default=0,
+        )
+    rows, columns = np.nonzero(codes)
+
+    alerts: List[List[Dict[str, Any]]] = [[] for _ in vitals_list]
+    for row, column, code in zip(rows.tolist(), columns.tolist(), codes[rows, columns].tolist()):
+        prefix, unit, severity = _TEMPLATES[column][code]
+        parent, field = _COLUMNS[column]
+        vitals = vitals_list[row]
+        value = (vitals[parent] if parent else vitals)[field]
+        alerts[row].append({"type": METRICS[column], "message": f"{prefix}{value}{unit}", "severity": severity})
+    return alerts
+
+class AlertEngine:
+    """Evaluates batches against per-patient rules kept in a bounded TTL cache"""
+
+    def __init__(self, cache_size: int, ttl_seconds: float):
+        self.cache_size = cache_size
+        self.ttl = ttl_seconds
+        self._rules: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evaluated = 0
+        self.raised = 0
+
+    def invalidate(self, patient_id: Any):
+        """Drop cached rules after a patient's medical info changes"""
+        self._rules.pop(str(patient_id), None)
+
+    async def rules_for(self, patients, patient_ids: Iterable[Any]) -> Dict[str, np.ndarray]:
+        """Rules for each distinct patient, loading cache misses with one query"""
+        now = time.monotonic()
+        rules: Dict[str, np.ndarray] = {}
+        missing: Dict[str, Any] = {}
+        for patient_id in patient_ids:
+            key = str(patient_id)
+            if key in rules or key in missing:
+                continue
+            entry = self._rules.get(key)
+            if entry is not None and entry[1] > now:
+                self._rules.move_to_end(key)
+                rules[key] = entry[0]
+                self.hits += 1
+            else:
+                missing[key] = patient_id
+                self.misses += 1
+        if missing:
+            loaded = {key: DEFAULT_RULES for key in missing}
+            cursor = patients.find({"_id": {"$in": list(missing.values())}},
+                                   {"medicalInfo.chronicConditions": 1, "medicalInfo.alertThresholds": 1})
+            async for patient in cursor:
+                loaded[str(patient["_id"])] = build_rules(patient.get("medicalInfo"))
+            for key, patient_rules in loaded.items():
+                self._put(key, patient_rules, now + self.ttl)
+            rules.update(loaded)
+        return rules
+
+    def _put(self, key: str, rules: np.ndarray, expires_at: float):
+        if self.cache_size <= 0:
+            return
+        self._rules[key] = (rules, expires_at)
+        self._rules.move_to_end(key)
+        while len(self._rules) > self.cache_size:
+            self._rules.popitem(last=False)
+
+    async def annotate(self, patients, documents: List[Dict[str, Any]]):
+        """Set ``alerts`` on vitals documents using their patients' rules"""
+        if not documents:
+            return
+        rules = await self.rules_for(patients, (document["patientId"] for document in documents))
+        keys = list(rules)
+        stacked = np.stack([rules[key] for key in keys])
+        positions = {key: index for index, key in enumerate(keys)}
+        per_reading = stacked[[positions[str(document["patientId"])] for document in documents]]
+        alerts = evaluate([document["vitals"] for document in documents], per_reading)
+        for document, document_alerts in zip(documents, alerts):
+            document["alerts"] = document_alerts
+            self.raised += len(document_alerts)
+        self.evaluated += len(documents)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "evaluated": self.evaluated,
+            "alertsRaised": self.raised,
+            "cachedPatients": len(self._rules),
+            "ruleCacheHitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+alert_engine = AlertEngine(settings.ALERT_RULE_CACHE_SIZE, settings.ALERT_RULE_CACHE_TTL_SECONDS)
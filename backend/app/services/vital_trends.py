@@ -0,0 +1,439 @@
+"""Rolled-up vitals trends for long-range charts.
+
+Ingestion maintains ``vital_rollups``: one document per patient, resolution
+(15m, 1h, 1d) and bucket. Stored readings are queued in memory and folded
+in by a background task every ``flush_interval_ms``, or as soon as
+``max_batch`` readings are waiting, so the ingest request never waits for
+rollup writes. Past ``max_pending`` queued readings new ones are left out
+of the rollups (and counted) rather than growing the worker's memory. For every measurement a bucket holds the count,
+sum, min, max and a histogram of values quantized to ``HISTOGRAM_STEPS``.
+All of these merge with ``$inc``/``$min``/``$max``, so each ingest batch
+adds to its buckets in place and percentiles come from the histogram
+without revisiting raw readings. Each flush is aggregated with pandas into
+one upsert per (patient, resolution, bucket).
+
+1m trends are aggregated from the raw readings on request: monitors report
+about once a minute, so a stored 1m rollup would repeat the reading. Each
+request reads every raw reading in its range, so 1m ranges are capped at
+``max_raw_buckets`` minutes, far below the rollup bucket limit.
+
+Charts ask for a point budget; series longer than that are reduced with
+Largest-Triangle-Three-Buckets on the bucket means, which keeps spikes that
+plain striding would skip.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config.settings import settings
+from app.services.vital_alerts import METRICS, measurement_matrix
+from app.services.vitals_store import vitals_store
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS: Dict[str, timedelta] = {
+    "1m": timedelta(minutes=1),
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+# Kept up to date on ingest; finer resolutions are aggregated from raw readings
+MATERIALIZED = ["15m", "1h", "1d"]
+
+# Histogram bin width per measurement (default 1 unit)
+HISTOGRAM_STEPS: Dict[str, float] = {"temperature": 0.1}
+_STEPS = np.array([HISTOGRAM_STEPS.get(metric, 1.0) for metric in METRICS])
+_DECIMALS = [max(0, -int(math.floor(math.log10(step)))) for step in _STEPS.tolist()]
+
+# Raw readings read per 1m bucket at most (monitors report every 5 s or slower)
+RAW_READINGS_PER_MINUTE = 12
+
+EPOCH = datetime(1970, 1, 1)
+
+def floor_time(moment: datetime, resolution: str) -> datetime:
+    """Start of the bucket holding ``moment``; buckets are aligned to the epoch (UTC)"""
+    span = int(RESOLUTIONS[resolution].total_seconds())
+    seconds = int((moment - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % span)
+
+def epoch_seconds(moments: Sequence[datetime]) -> np.ndarray:
+    """Whole seconds since the epoch for naive UTC datetimes (faster than a datetime64 cast)"""
+    second = timedelta(seconds=1)
+    return np.array([(moment - EPOCH) // second for moment in moments], dtype=np.int64)
+
+def measurements(documents: List[Dict[str, Any]]) -> Optional[Tuple[pd.DataFrame, pd.Index]]:
+    """Long frame of ``(patient code, epoch seconds, metric column, value, histogram bin)``
+
+    Returns None when no reading has a tracked measurement. Built once per
+    batch and shared by every resolution.
+    """
+    if not documents:
+        return None
+    values = measurement_matrix([document["vitals"] for document in documents])
+    rows, columns = np.nonzero(~np.isnan(values))
+    if not len(rows):
+        return None
+    patient_codes, patients = pd.factorize(np.array([document["patientId"] for document in documents], dtype=object))
+    seconds = epoch_seconds([document["recordedAt"] for document in documents])
+    measured = values[rows, columns]
+    frame = pd.DataFrame({
+        "patient": patient_codes[rows],
+        "seconds": seconds[rows],
+        "metric": columns,
+        "value": measured,
+        "bin": np.rint(measured / _STEPS[columns]).astype(np.int64),
+    })
+    return frame, patients
+
+def aggregate(measured: Optional[Tuple[pd.DataFrame, pd.Index]], resolution: str
+              ) -> Iterator[Tuple[Any, datetime, int, Dict[str, Any]]]:
+    """``(patientId, bucketStart, metric column, rollup)`` for every non-empty group of readings"""
+    if measured is None:
+        return
+    frame, patients = measured
+    span = int(RESOLUTIONS[resolution].total_seconds())
+    frame = frame.assign(bucket=frame["seconds"] - frame["seconds"] % span)
+    keys = ["patient", "bucket", "metric"]
+    stats = frame.groupby(keys, sort=True)["value"].agg(["count", "sum", "min", "max"])
+    histogram = frame.groupby(keys + ["bin"], sort=True).size()
+
+    # Both groupings are sorted on the same keys, so each group's bins are one contiguous run
+    bins = histogram.index.get_level_values("bin").astype(str).tolist()
+    counts = histogram.tolist()
+    ends = np.cumsum(histogram.groupby(level=keys, sort=True).size().to_numpy()).tolist()
+    begin = 0
+    for (patient, bucket, metric), count, total, low, high, end in zip(
+            stats.index.tolist(), *(stats[column].tolist() for column in ("count", "sum", "min", "max")), ends):
+        yield patients[patient], EPOCH + timedelta(seconds=bucket), metric, {
+            "n": count, "sum": total, "min": low, "max": high, "h": dict(zip(bins[begin:end], counts[begin:end])),
+        }
+        begin = end
+
+def rollup_documents(documents: List[Dict[str, Any]], resolution: str) -> List[Dict[str, Any]]:
+    """Rollup documents for ``documents``, in ``vital_rollups`` shape"""
+    rollups: Dict[Tuple[Any, datetime], Dict[str, Any]] = {}
+    for patient_id, bucket, metric, rollup in aggregate(measurements(documents), resolution):
+        document = rollups.setdefault((patient_id, bucket), {
+            "patientId": patient_id, "resolution": resolution, "bucketStart": bucket, "metrics": {},
+        })
+        parent = document["metrics"]
+        *parents, field = METRICS[metric].split(".")
+        for name in parents:
+            parent = parent.setdefault(name, {})
+        parent[field] = rollup
+    return list(rollups.values())
+
+def metric_rollup(document: Dict[str, Any], metric: str) -> Optional[Dict[str, Any]]:
+    """One measurement's rollup inside a ``vital_rollups`` document"""
+    value: Any = document.get("metrics")
+    for name in metric.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(name)
+    return value
+
+def percentiles(rollup: Dict[str, Any], metric: str, ranks: Sequence[int]) -> Dict[str, float]:
+    """Nearest-rank percentiles from a rollup's histogram, to the histogram step"""
+    column = METRICS.index(metric)
+    step, decimals = _STEPS[column], _DECIMALS[column]
+    bins = sorted((int(key), count) for key, count in rollup["h"].items() if count > 0)
+    cumulative = np.cumsum([count for _, count in bins])
+    total = int(cumulative[-1])
+    result = {}
+    for rank in ranks:
+        position = int(np.searchsorted(cumulative, max(1, math.ceil(rank / 100 * total))))
+        result[f"p{rank}"] = round(bins[position][0] * step, decimals)
+    return result
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of ``len(x)``"""
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+    every = (count - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    anchor = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, count)
+        average_x = x[end:next_end].mean()
+        average_y = y[end:next_end].mean()
+        # Twice the triangle area between the anchor, each candidate and the next bucket's average
+        areas = np.abs((x[anchor] - average_x) * (y[start:end] - y[anchor])
+                       - (x[anchor] - x[start:end]) * (average_y - y[anchor]))
+        anchor = start + int(areas.argmax())
+        selected[bucket + 1] = anchor
+    return selected
+
+class VitalRollups:
+    """Maintains ``vital_rollups`` on ingest and serves downsampled trend series"""
+
+    collection = "vital_rollups"
+
+    def __init__(self, max_buckets: int, max_raw_buckets: int, flush_interval_ms: int = 500,
+                 max_batch: int = 10000, max_pending: int = 200000):
+        self.max_buckets = max_buckets
+        self.max_raw_buckets = max_raw_buckets
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending: List[Dict[str, Any]] = []
+        self._get_database: Optional[Callable[[], Awaitable[Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # Created on first use so it binds to the running loop
+        self._lock: Optional[asyncio.Lock] = None
+        # Counters
+        self.queued = 0
+        self.dropped = 0
+        self.errors = 0
+        self.recorded = 0
+        self.upserts = 0
+        self.failed = 0
+        self.rebuilds = 0
+        self.max_record_ms = 0.0
+        self.total_record_ms = 0.0
+        self.batches = 0
+
+    def updates(self, documents: List[Dict[str, Any]]) -> List[UpdateOne]:
+        """One upsert per (patient, resolution, bucket) folding the readings into its rollup"""
+        operations = []
+        measured = measurements(documents)
+        for resolution in MATERIALIZED:
+            grouped: Dict[Tuple[Any, datetime], Dict[str, Dict[str, Any]]] = {}
+            for patient_id, bucket, metric, rollup in aggregate(measured, resolution):
+                update = grouped.setdefault((patient_id, bucket), {"$inc": {}, "$min": {}, "$max": {}})
+                prefix = f"metrics.{METRICS[metric]}"
+                update["$inc"][f"{prefix}.n"] = rollup["n"]
+                update["$inc"][f"{prefix}.sum"] = rollup["sum"]
+                update["$min"][f"{prefix}.min"] = rollup["min"]
+                update["$max"][f"{prefix}.max"] = rollup["max"]
+                increments = update["$inc"]
+                for key, count in rollup["h"].items():
+                    increments[f"{prefix}.h.{key}"] = count
+            operations.extend(
+                UpdateOne({"patientId": patient_id, "resolution": resolution, "bucketStart": bucket}, update, upsert=True)
+                for (patient_id, bucket), update in grouped.items()
+            )
+        return operations
+
+    def queue(self, documents: List[Dict[str, Any]]):
+        """Queue freshly stored readings for the next flush; never blocks
+
+        Raw readings stay the source of truth, so readings that do not fit
+        in the queue are logged and counted rather than failing the ingest
+        request; ``rebuild`` recomputes a day from them.
+        """
+        if not documents:
+            return
+        if len(self._pending) + len(documents) > self.max_pending:
+            self.dropped += len(documents)
+            logger.warning(f"Vitals rollups backlogged: {len(documents)} readings left out of the rollups")
+            return
+        self._pending.extend(documents)
+        self.queued += len(documents)
+        if len(self._pending) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self, get_database: Callable[[], Awaitable[Any]]):
+        """Start the flush loop on the running event loop"""
+        self._get_database = get_database
+        self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and fold in everything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Vitals rollups final flush failed: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Vitals rollups flush failed: {e}")
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def flush(self, db=None):
+        """Fold the queued readings into their rollups"""
+        if not self._pending:
+            return
+        if db is None:
+            if self._get_database is None:
+                return
+            db = await self._get_database()
+        async with self._get_lock():
+            pending, self._pending = self._pending, []
+            await self.record(db, pending)
+
+    async def record(self, db, documents: List[Dict[str, Any]]):
+        """Fold stored readings into their rollups; failed writes are logged and counted"""
+        if not documents:
+            return
+        started = time.perf_counter()
+        operations: List[UpdateOne] = []
+        try:
+            operations = self.updates(documents)
+            if operations:
+                await db[self.collection].bulk_write(operations, ordered=False)
+            self.recorded += len(documents)
+            self.upserts += len(operations)
+        except BulkWriteError as e:
+            failed = len(e.details.get("writeErrors", []))
+            self.failed += failed
+            logger.warning(f"Vitals rollups: {failed} of {len(operations)} bucket updates failed")
+        except Exception as e:
+            self.failed += len(operations) or len(documents)
+            logger.error(f"Vitals rollups update error: {e}")
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.batches += 1
+            self.max_record_ms = max(self.max_record_ms, elapsed_ms)
+            self.total_record_ms += elapsed_ms
+
+    async def rebuild(self, db, patient_id: ObjectId, day: datetime):
+        """Recompute a patient's rollups for the day holding ``day`` from raw readings
+
+        Used after a reading is corrected: min, max and the histogram cannot
+        be un-merged, so the day's buckets are rewritten instead. Queued
+        readings are folded in first, so none land on top of the rewrite.
+        """
+        await self.flush(db)
+        async with self._get_lock():
+            await self._rebuild(db, patient_id, day)
+
+    async def _rebuild(self, db, patient_id: ObjectId, day: datetime):
+        start = floor_time(day, "1d")
+        end = start + RESOLUTIONS["1d"]
+        limit = int(RESOLUTIONS["1d"].total_seconds() // 60) * RAW_READINGS_PER_MINUTE
+        readings = await vitals_store.find_range(db, patient_id, start, end, limit)
+        collection = db[self.collection]
+        bounds = {"patientId": patient_id, "resolution": {"$in": MATERIALIZED}, "bucketStart": {"$gte": start, "$lt": end}}
+        existing = {
+            (rollup["resolution"], rollup["bucketStart"]): rollup["_id"]
+            async for rollup in collection.find(bounds, {"resolution": 1, "bucketStart": 1})
+        }
+        operations = []
+        for resolution in MATERIALIZED:
+            for rollup in rollup_documents(readings, resolution):
+                existing.pop((resolution, rollup["bucketStart"]), None)
+                operations.append(UpdateOne(
+                    {"patientId": patient_id, "resolution": resolution, "bucketStart": rollup["bucketStart"]},
+                    {"$set": {"metrics": rollup["metrics"]}},
+                    upsert=True
+                ))
+        operations.extend(DeleteOne({"_id": rollup_id}) for rollup_id in existing.values())
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+        self.rebuilds += 1
+
+    def bucket_limit(self, resolution: str) -> int:
+        """Most buckets one request may span at ``resolution``"""
+        return self.max_buckets if resolution in MATERIALIZED else self.max_raw_buckets
+
+    def fits(self, resolution: str, start: datetime, end: datetime) -> bool:
+        return (end - start) / RESOLUTIONS[resolution] <= self.bucket_limit(resolution)
+
+    def pick_resolution(self, start: datetime, end: datetime) -> Optional[str]:
+        """Finest resolution whose bucket count over ``[start, end)`` fits its limit; None if none does"""
+        for resolution in RESOLUTIONS:
+            if self.fits(resolution, start, end):
+                return resolution
+        return None
+
+    async def load(self, db, patient_id: ObjectId, resolution: str,
+                   start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """Rollup documents for ``[start, end)``, oldest first, at most one bucket over the limit
+
+        Callers check ``fits`` first; the cap only keeps memory bounded if one does not.
+        """
+        if resolution in MATERIALIZED:
+            cursor = db[self.collection].find({
+                "patientId": patient_id,
+                "resolution": resolution,
+                "bucketStart": {"$gte": floor_time(start, resolution), "$lt": end},
+            }).sort("bucketStart", 1).limit(self.bucket_limit(resolution) + 1)
+            return await cursor.to_list(length=None)
+        minutes = math.ceil((end - start) / RESOLUTIONS[resolution])
+        readings = await vitals_store.find_range(db, patient_id, start, end, minutes * RAW_READINGS_PER_MINUTE)
+        return sorted(rollup_documents(readings, resolution), key=lambda rollup: rollup["bucketStart"])
+
+    async def trends(self, db, patient_id: ObjectId, metrics: List[str], resolution: str,
+                     start: datetime, end: datetime, points: int, ranks: Sequence[int]) -> Dict[str, List[Dict[str, Any]]]:
+        """Per-metric series of at most ``points`` buckets with count/min/max/mean/percentiles"""
+        rollups = await self.load(db, patient_id, resolution, start, end)
+        series: Dict[str, List[Dict[str, Any]]] = {}
+        for metric in metrics:
+            present = [(document["bucketStart"], rollup) for document in rollups
+                       if (rollup := metric_rollup(document, metric)) and rollup.get("n")]
+            if not present:
+                series[metric] = []
+                continue
+            means = np.array([rollup["sum"] / rollup["n"] for _, rollup in present])
+            x = epoch_seconds([bucket for bucket, _ in present]).astype(float)
+            series[metric] = [
+                {
+                    "t": present[index][0],
+                    "count": present[index][1]["n"],
+                    "min": present[index][1]["min"],
+                    "max": present[index][1]["max"],
+                    "mean": round(float(means[index]), 2),
+                    "percentiles": percentiles(present[index][1], metric, ranks),
+                }
+                for index in lttb(x, means, points).tolist()
+            ]
+        return series
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "resolutions": MATERIALIZED,
+            "queueDepth": len(self._pending),
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "recorded": self.recorded,
+            "upserts": self.upserts,
+            "failed": self.failed,
+            "rebuilds": self.rebuilds,
+            "avgRecordMs": round(self.total_record_ms / self.batches, 2) if self.batches else 0.0,
+            "maxRecordMs": round(self.max_record_ms, 2),
+        }
+
+vital_rollups = VitalRollups(
+    settings.VITALS_TRENDS_MAX_BUCKETS,
+    settings.VITALS_TRENDS_MAX_RAW_MINUTES,
+    settings.VITALS_ROLLUP_FLUSH_INTERVAL_MS,
+    settings.VITALS_ROLLUP_MAX_BATCH,
+    settings.VITALS_ROLLUP_MAX_PENDING,
+)
@@ -0,0 +1,185 @@
+"""Ingestion pipeline for bedside monitor readings.
+
+Readings are validated and turned into ``vitals`` documents in one pass,
+checked against the patients collection with one ``$in`` query per batch,
+annotated with alerts for the whole batch (see ``vital_alerts``), then
+written through the configured ``vitals_store`` in batches of at most
+``batch_size`` readings. At most ``max_inflight`` batches are written concurrently; a
+request that would push the number of buffered readings past
+``max_pending`` is rejected with 503 so a slow MongoDB sheds load instead of
+growing the worker's memory.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+from app.config.settings import settings
+from app.services.latest_vitals import latest_vitals_cache
+from app.services.overview_stats import overview_stats
+from app.services.vital_trends import vital_rollups
+from app.services.vitals_stream import vitals_broker
+from app.services.vitals_store import vitals_store
+from app.utils.dates import as_utc
+
+logger = logging.getLogger(__name__)
+
+class VitalsIngestor:
+    """Validates readings and writes them in bounded, concurrent batches"""
+
+    def __init__(self, batch_size: int, max_inflight: int, max_pending: int):
+        self.batch_size = batch_size
+        self.max_inflight = max_inflight
+        self.max_pending = max_pending
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.in_flight = 0
+        # Counters
+        self.received = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.shed = 0
+        self.batches = 0
+        self.max_pending_seen = 0
+        self.max_batch_ms = 0.0
+        self.total_batch_ms = 0.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created on first use, inside the event loop that serves requests
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_inflight)
+        return self._semaphore
+
+    def prepare(self, readings: List[Dict[str, Any]], recorded_by: ObjectId
+                ) -> Tuple[List[Dict[str, Any]], List[int], List[Dict[str, Any]]]:
+        """Build documents from ``VitalCreate`` dicts
+
+        Returns the documents, the request index each came from, and the
+        readings rejected during validation. ``alerts`` is left empty for
+        ``AlertEngine.annotate`` to fill in for the whole batch.
+        """
+        now = datetime.utcnow()
+        documents, positions, rejected = [], [], []
+        for index, reading in enumerate(readings):
+            patient_id = reading["patientId"]
+            vitals = reading["vitals"]
+            if not ObjectId.is_valid(patient_id):
+                rejected.append({"index": index, "reason": "Invalid patient ID"})
+                continue
+            if not vitals:
+                rejected.append({"index": index, "reason": "No measurements in reading"})
+                continue
+            recorded_at = reading.get("recordedAt")
+            document = {
+                "patientId": ObjectId(patient_id),
+                "recordedBy": recorded_by,
+                "vitals": vitals,
+                "alerts": [],
+                "recordedAt": as_utc(recorded_at) if recorded_at else now,
+                "createdAt": now,
+            }
+            if reading.get("notes"):
+                document["notes"] = reading["notes"]
+            documents.append(document)
+            positions.append(index)
+        self.received += len(readings)
+        self.rejected += len(rejected)
+        return documents, positions, rejected
+
+    async def check_patients(self, patients, documents: List[Dict[str, Any]], positions: List[int],
+                             rejected: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Drop documents for patients that do not exist, looking the batch up in one query
+
+        Returns the remaining documents and positions; the dropped readings
+        are appended to ``rejected``.
+        """
+        distinct = list({document["patientId"] for document in documents})
+        if not distinct:
+            return documents, positions
+        known = {str(patient["_id"]) async for patient in patients.find({"_id": {"$in": distinct}}, {"_id": 1})}
+        if len(known) == len(distinct):
+            return documents, positions
+        kept_documents, kept_positions = [], []
+        for document, position in zip(documents, positions):
+            if str(document["patientId"]) in known:
+                kept_documents.append(document)
+                kept_positions.append(position)
+            else:
+                rejected.append({"index": position, "reason": "Patient not found"})
+        self.rejected += len(documents) - len(kept_documents)
+        return kept_documents, kept_positions
+
+    async def write(self, db, documents: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """Insert documents in batches; returns the inserted count and per-document errors"""
+        count = len(documents)
+        if self.pending + count > self.max_pending:
+            self.shed += count
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Vitals ingestion is backlogged, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += count
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        try:
+            results = await asyncio.gather(*(
+                self._write_batch(db, documents[offset:offset + self.batch_size], offset)
+                for offset in range(0, count, self.batch_size)
+            ))
+        finally:
+            self.pending -= count
+        inserted = sum(batch_inserted for batch_inserted, _ in results)
+        errors = [error for _, batch_errors in results for error in batch_errors]
+        failed = {error["index"] for error in errors}
+        stored = [document for index, document in enumerate(documents) if index not in failed]
+        latest_vitals_cache.record(stored)
+        vitals_broker.publish_local(stored)
+        overview_stats.vitals_recorded(stored)
+        vital_rollups.queue(stored)
+        self.inserted += inserted
+        self.rejected += len(errors)
+        return inserted, errors
+
+    async def _write_batch(self, db, batch: List[Dict[str, Any]], offset: int):
+        async with self._get_semaphore():
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                inserted, errors = await vitals_store.insert_batch(db, batch)
+                if errors:
+                    logger.warning(f"Vitals batch at offset {offset}: {len(errors)} of {len(batch)} writes failed")
+                return inserted, [{"index": offset + error["index"], "reason": error["reason"]} for error in errors]
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.in_flight -= 1
+                self.batches += 1
+                self.max_batch_ms = max(self.max_batch_ms, elapsed_ms)
+                self.total_batch_ms += elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput, backlog and batch-latency counters"""
+        return {
+            "storage": vitals_store.name,
+            "batchSize": self.batch_size,
+            "maxInflightBatches": self.max_inflight,
+            "inFlightBatches": self.in_flight,
+            "pending": self.pending,
+            "maxPending": self.max_pending_seen,
+            "received": self.received,
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "shed": self.shed,
+            "batches": self.batches,
+            "avgBatchMs": round(self.total_batch_ms / self.batches, 2) if self.batches else 0.0,
+            "maxBatchMs": round(self.max_batch_ms, 2),
+        }
+
+vitals_ingestor = VitalsIngestor(
+    settings.VITALS_INSERT_BATCH_SIZE,
+    settings.VITALS_MAX_INFLIGHT_BATCHES,
+    settings.VITALS_MAX_PENDING_READINGS,
+)
@@ -0,0 +1,279 @@
+"""Storage backends for vitals readings.
+
+``documents`` keeps one ``vitals`` document per reading, as described in
+``database-schema.md``. ``buckets`` packs each patient's readings for one
+hour into a single ``vitals_buckets`` document, which cuts the document and
+index-entry count by the readings-per-hour factor. A range read then
+touches one bucket per hour instead of one document per reading.
+
+Both stores take and return reading documents in the ``vitals`` shape, so
+callers do not depend on the layout. ``VITALS_STORAGE`` picks the store.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import calendar
+import logging
+import struct
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config.settings import settings
+from app.utils.dates import as_utc
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SPAN = timedelta(hours=1)
+
+# Attempts at rewriting a bucket's readings before giving up on concurrent appends
+BUCKET_UPDATE_ATTEMPTS = 3
+
+def bucket_start(moment: datetime) -> datetime:
+    """Start of the hourly bucket holding ``moment``"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def reading_id(recorded_at: datetime) -> ObjectId:
+    """ObjectId whose timestamp is the reading's ``recordedAt`` (to the second)
+
+    The bucket holding a reading can then be found from its id alone.
+    """
+    seconds = calendar.timegm(recorded_at.utctimetuple())
+    return ObjectId(struct.pack(">I", seconds) + ObjectId().binary[4:])
+
+class DocumentVitalsStore:
+    """One ``vitals`` document per reading"""
+
+    name = "documents"
+    collection = "vitals"
+
+    async def insert_batch(self, db, documents: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """Insert readings; returns the inserted count and per-reading errors"""
+        try:
+            result = await db[self.collection].insert_many(documents, ordered=False)
+            return len(result.inserted_ids), []
+        except BulkWriteError as e:
+            return e.details.get("nInserted", 0), [
+                {"index": error["index"], "reason": error.get("errmsg", "Write failed")}
+                for error in e.details.get("writeErrors", [])
+            ]
+
+    async def find_range(self, db, patient_id: ObjectId, start: Optional[datetime],
+                         end: datetime, limit: int) -> List[Dict[str, Any]]:
+        """A patient's readings in ``[start, end)``, newest first"""
+        recorded_at = {"$lt": end}
+        if start is not None:
+            recorded_at["$gte"] = start
+        cursor = db[self.collection].find({"patientId": patient_id, "recordedAt": recorded_at})
+        return await cursor.sort("recordedAt", -1).limit(limit).to_list(length=limit)
+
+    async def latest(self, db, patient_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """A patient's most recent reading"""
+        readings = await self.find_range(db, patient_id, None, datetime.max, 1)
+        return readings[0] if readings else None
+
+    async def get_reading(self, db, vital_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """One reading by id"""
+        return await db[self.collection].find_one({"_id": vital_id})
+
+    async def update_reading(self, db, vital_id: ObjectId, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply ``$set``-style updates to one reading; returns it updated, or None if missing"""
+        reading = await db[self.collection].find_one({"_id": vital_id})
+        if reading is None:
+            return None
+        await db[self.collection].update_one({"_id": vital_id}, {"$set": updates})
+        reading.update(updates)
+        return reading
+
+    async def alert_counts(self, db, start: datetime, end: datetime) -> Dict[str, int]:
+        """Alerts raised by readings recorded in ``[start, end)``, by severity"""
+        cursor = db[self.collection].aggregate([
+            {"$match": {"recordedAt": {"$gte": start, "$lt": end}, "alerts.0": {"$exists": True}}},
+            {"$unwind": "$alerts"},
+            {"$group": {"_id": "$alerts.severity", "count": {"$sum": 1}}},
+        ])
+        return {group["_id"]: group["count"] async for group in cursor}
+
+class BucketedVitalsStore:
+    """Hourly per-patient ``vitals_buckets`` documents with a packed ``readings`` array
+
+    A bucket holds at most ``max_readings`` readings; once full, the next
+    write for that patient and hour upserts an overflow bucket.
+    """
+
+    name = "buckets"
+    collection = "vitals_buckets"
+
+    def __init__(self, max_readings: int):
+        self.max_readings = max_readings
+
+    @staticmethod
+    def pack(document: Dict[str, Any]) -> Dict[str, Any]:
+        """Compact in-bucket form of a reading; patient and hour live on the bucket"""
+        packed = {
+            "_id": document["_id"],
+            "t": document["recordedAt"],
+            "c": document["createdAt"],
+            "by": document["recordedBy"],
+            "v": document["vitals"],
+        }
+        if document.get("alerts"):
+            packed["a"] = document["alerts"]
+        if document.get("notes"):
+            packed["n"] = document["notes"]
+        return packed
+
+    @staticmethod
+    def unpack(bucket: Dict[str, Any], packed: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "_id": packed["_id"],
+            "patientId": bucket["patientId"],
+            "recordedBy": packed["by"],
+            "vitals": packed["v"],
+            "notes": packed.get("n"),
+            "alerts": packed.get("a", []),
+            "recordedAt": packed["t"],
+            "createdAt": packed["c"],
+        }
+
+    async def insert_batch(self, db, documents: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """Append readings to their buckets with one upsert per (patient, hour) chunk"""
+        groups: Dict[Tuple[Any, datetime], List[int]] = defaultdict(list)
+        for index, document in enumerate(documents):
+            document.setdefault("_id", reading_id(document["recordedAt"]))
+            groups[(document["patientId"], bucket_start(document["recordedAt"]))].append(index)
+
+        operations, operation_members = [], []
+        for (patient_id, start), indexes in groups.items():
+            # Chunked so one request cannot push a bucket far past the cap
+            for offset in range(0, len(indexes), self.max_readings):
+                chunk = indexes[offset:offset + self.max_readings]
+                operations.append(self._append(patient_id, start, [documents[index] for index in chunk]))
+                operation_members.append(chunk)
+        try:
+            await db[self.collection].bulk_write(operations, ordered=False)
+            return len(documents), []
+        except BulkWriteError as e:
+            errors = []
+            for error in e.details.get("writeErrors", []):
+                reason = error.get("errmsg", "Write failed")
+                errors.extend({"index": index, "reason": reason} for index in operation_members[error["index"]])
+            return len(documents) - len(errors), errors
+
+    def _append(self, patient_id: Any, start: datetime, members: List[Dict[str, Any]]) -> UpdateOne:
+        """Upsert that appends readings to the patient's open bucket for the hour"""
+        recorded = [member["recordedAt"] for member in members]
+        return UpdateOne(
+            {"patientId": patient_id, "bucketStart": start, "count": {"$lt": self.max_readings}},
+            {
+                "$push": {"readings": {"$each": [self.pack(member) for member in members]}},
+                "$inc": {"count": len(members)},
+                "$min": {"firstRecordedAt": min(recorded)},
+                "$max": {"lastRecordedAt": max(recorded)},
+                "$setOnInsert": {"bucketEnd": start + BUCKET_SPAN},
+            },
+            upsert=True,
+        )
+
+    async def find_range(self, db, patient_id: ObjectId, start: Optional[datetime],
+                         end: datetime, limit: int) -> List[Dict[str, Any]]:
+        """A patient's readings in ``[start, end)``, newest first, reading whole buckets"""
+        bounds = {"$lt": end}
+        if start is not None:
+            bounds["$gte"] = bucket_start(start)
+        cursor = db[self.collection].find({"patientId": patient_id, "bucketStart": bounds}).sort("bucketStart", -1)
+        readings: List[Dict[str, Any]] = []
+        current_hour = None
+        async for bucket in cursor:
+            # Overflow buckets share an hour; finish the hour before stopping
+            if bucket["bucketStart"] != current_hour and len(readings) >= limit:
+                break
+            current_hour = bucket["bucketStart"]
+            readings.extend(
+                self.unpack(bucket, packed) for packed in bucket["readings"]
+                if packed["t"] < end and (start is None or packed["t"] >= start)
+            )
+        readings.sort(key=lambda reading: reading["recordedAt"], reverse=True)
+        return readings[:limit]
+
+    async def latest(self, db, patient_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """A patient's most recent reading, reading one element of the newest bucket
+
+        Readings are appended in arrival order, so the last one in the bucket
+        is the newest unless a device sent readings out of order; only then
+        is the whole bucket read.
+        """
+        collection = db[self.collection]
+        cursor = collection.find(
+            {"patientId": patient_id},
+            {"patientId": 1, "bucketStart": 1, "lastRecordedAt": 1, "readings": {"$slice": -1}}
+        ).sort("bucketStart", -1)
+        newest = None
+        async for bucket in cursor:
+            # Overflow buckets share an hour; any of them may hold the newest reading
+            if newest is not None and bucket["bucketStart"] != newest["bucketStart"]:
+                break
+            if newest is None or bucket["lastRecordedAt"] > newest["lastRecordedAt"]:
+                newest = bucket
+        if newest is None or not newest["readings"]:
+            return None
+        packed = newest["readings"][0]
+        if packed["t"] != newest["lastRecordedAt"]:
+            bucket = await collection.find_one({"_id": newest["_id"]})
+            packed = max(bucket["readings"], key=lambda candidate: candidate["t"])
+        return self.unpack(newest, packed)
+
+    async def get_reading(self, db, vital_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """One reading by id, located through the hour encoded in the id"""
+        hour = bucket_start(as_utc(vital_id.generation_time))
+        bucket = await db[self.collection].find_one({"bucketStart": hour, "readings._id": vital_id})
+        if bucket is None:
+            return None
+        packed = next(packed for packed in bucket["readings"] if packed["_id"] == vital_id)
+        return self.unpack(bucket, packed)
+
+    async def update_reading(self, db, vital_id: ObjectId, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Rewrite one reading inside its bucket; returns it updated, or None if missing
+
+        The bucket's readings are replaced as a whole, guarded by its
+        ``count`` so a concurrent append makes the write miss and retry.
+        """
+        hour = bucket_start(as_utc(vital_id.generation_time))
+        collection = db[self.collection]
+        for _ in range(BUCKET_UPDATE_ATTEMPTS):
+            bucket = await collection.find_one({"bucketStart": hour, "readings._id": vital_id})
+            if bucket is None:
+                return None
+            readings = list(bucket["readings"])
+            position = next(index for index, packed in enumerate(readings) if packed["_id"] == vital_id)
+            reading = self.unpack(bucket, readings[position])
+            reading.update(updates)
+            readings[position] = self.pack(reading)
+            result = await collection.update_one(
+                {"_id": bucket["_id"], "count": bucket["count"]},
+                {"$set": {"readings": readings}}
+            )
+            if result.matched_count:
+                return reading
+        raise RuntimeError(f"Bucket for reading {vital_id} kept changing; update abandoned")
+
+    async def alert_counts(self, db, start: datetime, end: datetime) -> Dict[str, int]:
+        """Alerts raised by readings recorded in ``[start, end)``, by severity"""
+        cursor = db[self.collection].aggregate([
+            {"$match": {"bucketStart": {"$gte": bucket_start(start), "$lt": end}, "readings.a": {"$exists": True}}},
+            {"$unwind": "$readings"},
+            {"$match": {"readings.t": {"$gte": start, "$lt": end}}},
+            {"$unwind": "$readings.a"},
+            {"$group": {"_id": "$readings.a.severity", "count": {"$sum": 1}}},
+        ])
+        return {group["_id"]: group["count"] async for group in cursor}
+
+def create_vitals_store(mode: str):
+    if mode == BucketedVitalsStore.name:
+        return BucketedVitalsStore(settings.VITALS_BUCKET_MAX_READINGS)
+    if mode != DocumentVitalsStore.name:
+        logger.warning(f"Unknown VITALS_STORAGE '{mode}', using documents")
+    return DocumentVitalsStore()
+
+vitals_store = create_vitals_store(settings.VITALS_STORAGE)
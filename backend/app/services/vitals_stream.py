@@ -0,0 +1,205 @@
+"""Live fan-out of new vitals readings to streaming clients.
+
+Each subscriber owns a bounded queue; publishing never waits on a client.
+When a queue is full the oldest event is dropped and counted, so a slow
+consumer loses old readings instead of stalling ingestion or growing memory.
+Events are serialized once per reading and the same bytes are shared by
+every subscriber of that patient.
+
+Readings reach the broker from one of two sources. Against MongoDB a
+change stream on the vitals collection is followed, so readings written by
+any worker are delivered. Where change streams are unavailable (standalone
+server, fallback store) the ingest path publishes its own writes
+(``publish_local``). Whenever the change stream stops, for whatever reason,
+the broker falls back to ``publish_local`` until it is followed again.
+"""
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+import asyncio
+import logging
+
+from fastapi import HTTPException, status
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.config.database import MockDatabase
+from app.config.settings import settings
+from app.models.vital import VitalResponse
+from app.services.vitals_store import BucketedVitalsStore, vitals_store
+
+logger = logging.getLogger(__name__)
+
+# Server errors meaning the saved resume token can never be used again
+# (ChangeStreamHistoryLost, ChangeStreamFatalError, InvalidResumeToken)
+RESUME_FAILED_CODES = {286, 280, 260}
+
+class Subscriber:
+    """One streaming client: the patients it follows and its bounded event queue"""
+
+    def __init__(self, patient_ids: Set[str], alerts_only: bool, queue_size: int):
+        self.patient_ids = patient_ids
+        self.alerts_only = alerts_only
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(queue_size)
+        self.delivered = 0
+        self.dropped = 0
+        self.reported_dropped = 0
+
+    def offer(self, event: bytes) -> bool:
+        """Enqueue without blocking; returns False if an older event was dropped"""
+        dropped = False
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            dropped = True
+        self.queue.put_nowait(event)
+        self.delivered += 1
+        return not dropped
+
+def format_event(document: Dict[str, Any]) -> bytes:
+    """Server-Sent Events frame for one reading"""
+    payload = VitalResponse.from_document(document).json()
+    return f"id: {document['_id']}\nevent: vital\ndata: {payload}\n\n".encode()
+
+class VitalsBroker:
+    """In-process pub/sub keyed by patient id"""
+
+    def __init__(self, max_subscribers: int, queue_size: int):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._by_patient: Dict[str, Set[Subscriber]] = {}
+        self._subscribers: Set[Subscriber] = set()
+        self.source = "local"
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token: Optional[Dict[str, Any]] = None
+        # Counters
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def subscribe(self, patient_ids: Iterable[str], alerts_only: bool = False) -> Subscriber:
+        if len(self._subscribers) >= self.max_subscribers:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many live vitals subscribers, please retry",
+                headers={"Retry-After": "5"},
+            )
+        subscriber = Subscriber(set(patient_ids), alerts_only, self.queue_size)
+        self._subscribers.add(subscriber)
+        for patient_id in subscriber.patient_ids:
+            self._by_patient.setdefault(patient_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        for patient_id in subscriber.patient_ids:
+            followers = self._by_patient.get(patient_id)
+            if followers is not None:
+                followers.discard(subscriber)
+                if not followers:
+                    del self._by_patient[patient_id]
+
+    def publish(self, documents: Iterable[Dict[str, Any]]):
+        """Fan readings out to the subscribers of their patients"""
+        for document in documents:
+            followers = self._by_patient.get(str(document["patientId"]))
+            self.published += 1
+            if not followers:
+                continue
+            has_alerts = bool(document.get("alerts"))
+            event = None
+            for subscriber in followers:
+                if subscriber.alerts_only and not has_alerts:
+                    continue
+                if event is None:
+                    event = format_event(document)
+                if not subscriber.offer(event):
+                    self.dropped += 1
+                self.delivered += 1
+
+    def publish_local(self, documents: Iterable[Dict[str, Any]]):
+        """Ingest path: publish our own writes unless a change stream delivers them"""
+        if self.source == "local" and self._by_patient:
+            self.publish(documents)
+
+    def start(self, get_database: Callable[[], Awaitable[Any]]):
+        """Follow the vitals change stream whenever MongoDB supports it"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(get_database))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.source = "local"
+
+    async def _run(self, get_database: Callable[[], Awaitable[Any]]):
+        while True:
+            try:
+                database = await get_database()
+                if not isinstance(database, MockDatabase):
+                    await self._watch(database)
+            except PyMongoError as e:
+                if isinstance(e, OperationFailure) and e.code in RESUME_FAILED_CODES:
+                    # The oplog rolled past the token; start over from now
+                    self._resume_token = None
+                # Standalone servers have no change streams; publish from ingest instead
+                logger.info(f"Vitals change stream unavailable ({e}); publishing from the ingest path")
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Vitals change stream failed ({e}); publishing from the ingest path")
+            await asyncio.sleep(settings.MONGO_RECONNECT_INTERVAL_SECONDS)
+
+    async def _watch(self, database):
+        bucketed = isinstance(vitals_store, BucketedVitalsStore)
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update"] if bucketed else ["insert"]}}}]
+        options = {"full_document": "updateLookup"} if bucketed else {}
+        if self._resume_token is not None:
+            options["resume_after"] = self._resume_token
+        try:
+            async with database[vitals_store.collection].watch(pipeline, **options) as stream:
+                if self.source != "change_stream":
+                    logger.info("Following the vitals change stream for live subscribers")
+                self.source = "change_stream"
+                async for change in stream:
+                    # Saved first, so a change that cannot be published is skipped on resume
+                    self._resume_token = stream.resume_token
+                    self.publish(self._readings_from_change(change, bucketed))
+        finally:
+            self.source = "local"
+
+    @staticmethod
+    def _readings_from_change(change: Dict[str, Any], bucketed: bool) -> List[Dict[str, Any]]:
+        document = change.get("fullDocument")
+        if not bucketed:
+            return [document] if document else []
+        if not document:
+            return []
+        if change["operationType"] == "insert":
+            return [BucketedVitalsStore.unpack(document, packed) for packed in document["readings"]]
+        # Appends show up as "readings.<n>"; whole-array rewrites are corrections, not new readings
+        updated = change.get("updateDescription", {}).get("updatedFields", {})
+        return [
+            BucketedVitalsStore.unpack(document, packed)
+            for field, packed in updated.items()
+            if field.startswith("readings.") and field[len("readings."):].isdigit()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "subscribers": len(self._subscribers),
+            "maxSubscribers": self.max_subscribers,
+            "followedPatients": len(self._by_patient),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+vitals_broker = VitalsBroker(settings.VITALS_STREAM_MAX_SUBSCRIBERS, settings.VITALS_STREAM_QUEUE_SIZE)
@@ -0,0 +1,122 @@
+"""Background coalescer for small, frequent field updates.
+
+Touches such as ``users.lastLogin`` or ``patients.updatedAt`` are buffered
+per document (later values replace earlier ones) and written as a single
+unordered ``bulk_write`` every ``interval_ms`` or as soon as ``max_batch``
+documents are pending, whichever comes first.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import time
+
+from pymongo import UpdateOne
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class WriteCoalescer:
+    """Buffers ``$set`` touches and flushes them in batches"""
+
+    def __init__(self, interval_ms: int, max_batch: int):
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self._pending: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self._depth = 0
+        self._get_database: Optional[Callable[[], Awaitable[Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        # Counters
+        self.queued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def touch(self, collection: str, doc_id: Any, fields: Dict[str, Any]):
+        """Queue ``$set`` of ``fields`` on one document; never blocks"""
+        documents = self._pending.setdefault(collection, {})
+        if doc_id in documents:
+            documents[doc_id].update(fields)
+            self.coalesced += 1
+        else:
+            documents[doc_id] = dict(fields)
+            self._depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._depth)
+        self.queued += 1
+        if self._depth >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self, get_database: Callable[[], Awaitable[Any]]):
+        """Start the periodic flush loop on the running event loop"""
+        self._get_database = get_database
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out everything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write all pending touches, one bulk_write per collection"""
+        if not self._pending or self._get_database is None:
+            return
+        async with self._flush_lock:
+            pending, self._pending, self._depth = self._pending, {}, 0
+            started = time.perf_counter()
+            db = await self._get_database()
+            for collection, documents in pending.items():
+                operations = [UpdateOne({"_id": doc_id}, {"$set": fields})
+                              for doc_id, fields in documents.items()]
+                try:
+                    await db[collection].bulk_write(operations, ordered=False)
+                    self.written += len(operations)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"Coalesced write to {collection} failed ({len(operations)} ops): {e}")
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue-depth and flush-latency counters"""
+        return {
+            "queueDepth": self._depth,
+            "maxQueueDepth": self.max_queue_depth,
+            "queued": self.queued,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "lastFlushMs": round(self.last_flush_ms, 2),
+            "maxFlushMs": round(self.max_flush_ms, 2),
+            "avgFlushMs": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+        }
+
+write_coalescer = WriteCoalescer(settings.WRITE_COALESCE_INTERVAL_MS, settings.WRITE_COALESCE_MAX_BATCH)
@@ -1,14 +1,23 @@
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict
+import asyncio
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Query
 from fastapi.security import OAuth2PasswordBearer
 from app.config.settings import settings
+from app.models.user import TokenData
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login", auto_error=False)
+
+# Scope of the short-lived tickets that authenticate the vitals event stream
+STREAM_TICKET_SCOPE = "vitals:stream"
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -18,6 +27,106 @@ def get_password_hash(password: str) -> str:
     """Generate password hash"""
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Runs bcrypt on a bounded worker pool so hashing never blocks the event loop
+
+    At most ``max_workers`` hashes run at once; further callers wait on a
+    semaphore and are rejected with 503 once ``max_queue`` are waiting.
+    """
+    
+    def __init__(self, executor_type: str, max_workers: int, max_queue: int):
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+    
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created on first use, inside the event loop that serves requests
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        return self._semaphore
+    
+    async def run(self, func: Callable, *args):
+        """Run a hashing function on the pool, waiting for a free worker"""
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        
+        enqueued_at = time.perf_counter()
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        semaphore = self._get_semaphore()
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queued -= 1
+        
+        started_at = time.perf_counter()
+        self.total_wait_seconds += started_at - enqueued_at
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            semaphore.release()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queueing metrics for monitoring"""
+        return {
+            "executor": self.executor_type,
+            "workers": self.max_workers,
+            "inFlight": self.in_flight,
+            "queued": self.queued,
+            "maxQueueDepth": self.max_queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avgWaitMs": round(self.total_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "avgRunMs": round(self.total_run_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_EXECUTOR,
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate a password hash on the hashing pool"""
+    return await password_hasher.run(get_password_hash, password)
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -42,31 +151,120 @@ def verify_token(token: str) -> Dict[str, Any]:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
+class TokenCache:
+    """Bounded LRU of verified tokens; entries are dropped once their ``exp`` passes"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, token: str) -> Optional[TokenData]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        token_data, expires_at = entry
+        if expires_at is not None and time.time() >= expires_at:
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return token_data
+    
+    def put(self, token: str, token_data: TokenData, expires_at: Optional[float]):
+        if self.max_size <= 0:
+            return
+        self._entries[token] = (token_data, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
+
+def decode_token_data(token: str, scope: Optional[str] = None) -> TokenData:
+    """Verify a token once and reuse the result until it expires
+
+    Scoped tokens (stream tickets) are only accepted where that ``scope`` is asked for.
+    """
+    token_data = token_cache.get(token)
+    if token_data is None:
+        payload = verify_token(token)
+        token_data = TokenData(
+            username=payload.get("sub"),
+            user_id=payload.get("user_id"),
+            role=payload.get("role"),
+            scope=payload.get("scope")
+        )
+        token_cache.put(token, token_data, payload.get("exp"))
+    if token_data.scope != scope:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return token_data
+
+def create_stream_ticket(token_data: TokenData) -> str:
+    """Short-lived token that only opens the vitals stream, for EventSource clients"""
+    return create_access_token(
+        {"sub": token_data.username, "user_id": token_data.user_id, "role": token_data.role,
+         "scope": STREAM_TICKET_SCOPE},
+        expires_delta=timedelta(seconds=settings.VITALS_STREAM_TICKET_TTL_SECONDS)
+    )
+
+async def get_token_data(token: str = Depends(oauth2_scheme)) -> TokenData:
+    """Get verified token claims (resolved once per request and shared by dependents)"""
+    return decode_token_data(token)
+
+async def get_stream_token_data(
+    ticket: Optional[str] = Query(None, description="Stream ticket, for clients that cannot set headers (EventSource)"),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+) -> TokenData:
+    """Token claims from the Authorization header, or from a stream ticket"""
+    if token:
+        return decode_token_data(token)
+    if ticket:
+        return decode_token_data(ticket, STREAM_TICKET_SCOPE)
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def get_current_user_id(token_data: TokenData = Depends(get_token_data)) -> str:
     """Get current user ID from token"""
-    payload = verify_token(token)
-    user_id = payload.get("user_id")
-    if user_id is None:
+    if token_data.user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
-    return user_id
+    return token_data.user_id
 
-async def get_current_user_role(token: str = Depends(oauth2_scheme)) -> str:
+async def get_current_user_role(token_data: TokenData = Depends(get_token_data)) -> str:
     """Get current user role from token"""
-    payload = verify_token(token)
-    role = payload.get("role")
-    if role is None:
+    if token_data.role is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
-    return role
+    return token_data.role
 
-def require_role(required_roles: list):
-    """Decorator to require specific roles"""
-    def role_checker(current_role: str = Depends(get_current_user_role)):
+def require_role(required_roles: list, claims: Callable = get_token_data):
+    """Decorator to require specific roles (``claims`` resolves the caller's token)"""
+    async def role_checker(token_data: TokenData = Depends(claims)):
+        current_role = await get_current_user_role(token_data)
         if current_role not in required_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,7 @@
+from datetime import datetime, timezone
+
+def as_utc(moment: datetime) -> datetime:
+    """Naive UTC, matching the ``datetime.utcnow()`` values stored elsewhere"""
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,128 @@
+"""Conditional and partial file responses.
+
+``FileRangeResponse`` sends one byte range of a file. Where the ASGI
+server offers the ``http.response.zerocopy`` extension the range is handed
+over as a file descriptor and the server sends it with ``sendfile(2)``; a
+whole file may go through ``http.response.pathsend`` instead. Otherwise it
+is read with aiofiles in ``chunk_size`` pieces, so memory stays at one
+chunk per download either way. The file is opened before the status is
+sent, so one that disappeared after the route looked is still answered
+with a 404 instead of a started 200 that breaks off.
+
+``parse_range`` and ``etag_matches`` implement the request side of RFC 9110
+(Range / If-Range / If-None-Match) for a single strong validator.
+"""
+from typing import Mapping, Optional, Tuple
+import os
+
+import aiofiles
+from fastapi import HTTPException, status
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# More than one range gets the whole file, as RFC 9110 allows
+MAX_RANGES = 1
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match value matches ``etag`` (weak comparison)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """``(start, end)`` (end exclusive) of a Range header, or None to send everything
+
+    Raises 416 when the range is well formed but lies outside the file.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    specs = [spec.strip() for spec in header[len("bytes="):].split(",")]
+    if len(specs) > MAX_RANGES:
+        return None
+    first, separator, last = specs[0].partition("-")
+    if not separator or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise range_not_satisfiable(size)
+        return max(size - length, 0), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise range_not_satisfiable(size)
+    return start, end
+
+def range_not_satisfiable(size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        detail="Requested range not satisfiable",
+        headers={"Content-Range": f"bytes */{size}", "Accept-Ranges": "bytes"}
+    )
+
+class FileRangeResponse(Response):
+    """Bytes ``start``..``end`` (exclusive) of the file at ``path``"""
+
+    def __init__(self, path: str, size: int, start: int, end: int, status_code: int,
+                 headers: Mapping[str, str], media_type: str, send_body: bool = True,
+                 chunk_size: int = 1048576):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.size = size
+        self.send_body = send_body
+        self.chunk_size = chunk_size
+        self.headers["content-length"] = str(end - start)
+        if status_code == status.HTTP_206_PARTIAL_CONTENT:
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        start_message = {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+        extensions = scope.get("extensions") or {}
+        if not self.send_body or self.end == self.start:
+            await send(start_message)
+            await send({"type": "http.response.body", "body": b""})
+        elif "http.response.zerocopy" in extensions:
+            with await self._open(asynchronous=False) as file:
+                await send(start_message)
+                await send({"type": "http.response.zerocopy", "file": file,
+                            "offset": self.start, "count": self.end - self.start})
+        elif "http.response.pathsend" in extensions and self.start == 0 and self.end == self.size:
+            # The server opens the path itself; make sure it still can before sending a status
+            (await self._open(asynchronous=False)).close()
+            await send(start_message)
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+        else:
+            file = await self._open(asynchronous=True)
+            try:
+                await send(start_message)
+                await file.seek(self.start)
+                remaining = self.end - self.start
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        # The file shrank underneath us; the client sees a short body
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining:
+                    await send({"type": "http.response.body", "body": b""})
+            finally:
+                await file.close()
+        if self.background is not None:
+            await self.background()
+
+    async def _open(self, asynchronous: bool):
+        """Open the file before any status is sent, so a file removed since the route looked is a 404"""
+        try:
+            if asynchronous:
+                return await aiofiles.open(self.path, "rb")
+            return open(self.path, "rb")
+        except FileNotFoundError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
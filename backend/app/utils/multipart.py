@@ -0,0 +1,86 @@
+"""Incremental multipart/form-data parsing over the request stream.
+
+``UploadFile`` spools each file to a temporary file before the endpoint
+runs, so size limits can only be checked after the whole body arrived.
+``iter_multipart`` instead feeds the body to python-multipart as it is
+received and yields events in order:
+
+    ("part", {"name": ..., "filename": ..., "contentType": ...})
+    ("data", b"...")   # zero or more per part
+    ("end", None)
+
+Only the chunk being parsed is held in memory.
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from multipart.multipart import MultipartParser, parse_options_header
+
+class _PartCollector:
+    """python-multipart callbacks that queue part events"""
+
+    def __init__(self):
+        self.events: List[Tuple[str, Any]] = []
+        self._headers: Dict[str, str] = {}
+        self._field = b""
+        self._value = b""
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._field.decode("latin-1").lower()] = self._value.decode("latin-1")
+        self._field = self._value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get("content-disposition", ""))
+        filename: Optional[bytes] = options.get(b"filename")
+        self.events.append(("part", {
+            "name": options.get(b"name", b"").decode("utf-8", "replace"),
+            "filename": filename.decode("utf-8", "replace") if filename is not None else None,
+            "contentType": self._headers.get("content-type"),
+        }))
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        self.events.append(("data", data[start:end]))
+
+    def on_part_end(self):
+        self.events.append(("end", None))
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in (
+            "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+            "on_headers_finished", "on_part_data", "on_part_end",
+        )}
+
+async def iter_multipart(request: Request) -> AsyncIterator[Tuple[str, Any]]:
+    """Part events of a multipart/form-data request body, as it streams in"""
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a multipart/form-data body"
+        )
+    collector = _PartCollector()
+    parser = MultipartParser(options[b"boundary"], collector.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            events, collector.events = collector.events, []
+            for event in events:
+                yield event
+        parser.finalize()
+    except ValueError as e:
+        # MultipartParseError and friends
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Malformed multipart body: {e}"
+        )
+    for event in collector.events:
+        yield event
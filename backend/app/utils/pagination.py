@@ -0,0 +1,75 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException, status
+from app.utils.dates import as_utc
+
+# Listing order used for keyset pagination; backed by the (createdAt, _id) index
+KEYSET_SORT = [("createdAt", 1), ("_id", 1)]
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Build an opaque continuation token from the last document of a page"""
+    created_at = doc["createdAt"]
+    payload = {
+        "c": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+        "t": isinstance(created_at, datetime),
+        "i": str(doc["_id"]),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Tuple[Any, Any]:
+    """Decode a continuation token into its (createdAt, _id) position"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        created_at = datetime.fromisoformat(payload["c"]) if payload["t"] else payload["c"]
+        doc_id = ObjectId(payload["i"]) if ObjectId.is_valid(payload["i"]) else payload["i"]
+        return created_at, doc_id
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def keyset_filter(query: Dict[str, Any], token: Optional[str]) -> Dict[str, Any]:
+    """Restrict a filter to documents after the position encoded in ``token``
+
+    The range on ``createdAt`` lets both MongoDB and the fallback engine seek
+    straight into the index; the ``$or`` only breaks ties on ``_id``. A
+    caller's ``$or`` and ``$and`` are kept alongside it under ``$and``.
+    """
+    if not token:
+        return query
+    created_at, doc_id = decode_cursor(token)
+    if isinstance(created_at, datetime):
+        created_at = as_utc(created_at)
+    rest = {key: value for key, value in query.items() if key not in ("$and", "$or")}
+    clauses = list(query.get("$and", []))
+    if "$or" in query:
+        clauses.append({"$or": query["$or"]})
+
+    bounds = rest.get("createdAt")
+    if bounds is None:
+        rest["createdAt"] = {"$gte": created_at}
+    elif isinstance(bounds, dict) and all(key.startswith("$") for key in bounds):
+        # Keep a caller's createdAt range; the cursor only raises its lower bound
+        bounds = dict(bounds)
+        lower = bounds.get("$gte")
+        if isinstance(lower, datetime):
+            lower = bounds["$gte"] = as_utc(lower)
+        if lower is None or (type(lower) is type(created_at) and lower < created_at):
+            bounds["$gte"] = created_at
+        elif type(lower) is not type(created_at):
+            # Bounds of different types cannot be ordered here; let the database apply both
+            clauses.append({"createdAt": {"$gte": created_at}})
+        rest["createdAt"] = bounds
+    else:
+        clauses.append({"createdAt": {"$gte": created_at}})
+
+    tie_break = {"$or": [{"createdAt": {"$gt": created_at}}, {"_id": {"$gt": doc_id}}]}
+    if not clauses:
+        return {**rest, **tie_break}
+    return {**rest, "$and": clauses + [tie_break]}
@@ -0,0 +1,55 @@
+"""Per-request JWT overhead: decoding in every dependency vs the verified-token cache.
+
+    cd backend && python -m benchmarks.bench_auth_overhead 20000
+
+"before" repeats the old dependency chain: get_current_user_id and
+get_current_user_role each call verify_token. "after" resolves
+get_token_data once, as FastAPI does per request, and serves it from
+the LRU. The last column runs a protected route end to end through the
+ASGI stack.
+"""
+import sys
+import time
+from datetime import timedelta
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.auth import (create_access_token, decode_token_data, get_current_user_id,
+                            require_role, token_cache, verify_token)
+
+def per_call_us(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main(iterations: int):
+    token = create_access_token({"sub": "nurse", "user_id": "3", "role": "nurse"},
+                                expires_delta=timedelta(minutes=30))
+
+    def before():
+        verify_token(token)["user_id"]
+        verify_token(token)["role"]
+
+    def after():
+        decode_token_data(token)
+
+    print(f"before (2 decodes/request): {per_call_us(before, iterations):8.2f} us")
+    print(f"after  (cached TokenData):  {per_call_us(after, iterations):8.2f} us")
+
+    app = FastAPI()
+
+    @app.get("/protected")
+    async def protected(user_id: str = Depends(get_current_user_id),
+                        _: str = Depends(require_role(["nurse"]))):
+        return {"user_id": user_id}
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {token}"}
+    requests_count = max(iterations // 10, 100)
+    print(f"full request (cached):      {per_call_us(lambda: client.get('/protected', headers=headers), requests_count):8.2f} us")
+    print("token cache:", token_cache.stats())
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
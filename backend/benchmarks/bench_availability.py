@@ -0,0 +1,124 @@
+"""Appointment availability: compiled bitsets vs a query per candidate slot.
+
+    cd backend && python -m benchmarks.bench_availability 300 0.8
+
+Fills the fallback store with ``doctors`` doctors (a fifth of them
+cardiologists) working 08:00-17:00 on weekdays, and books ``fill`` of next
+week's 30-minute slots. Then it times "first 10 free 30-minute slots across
+all cardiologists next week" three ways: from a cold ``AvailabilityIndex``
+(schedule compile plus one appointments query per 7 days), from the warm
+index, and the naive way of probing every candidate slot with an overlap
+query in time order until 10 free ones are found.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.config.indexes import INDEX_REGISTRY
+from app.config.mock_engine import MockCollection
+from app.models.appointment import INACTIVE_APPOINTMENT_STATUSES, MAX_APPOINTMENT_MINUTES
+from app.services.availability import AvailabilityIndex, WEEKDAYS
+
+SLOT = 30
+LIMIT = 10
+
+class Database(dict):
+    def __getattr__(self, name):
+        return self[name]
+
+def build(doctors: int, fill: float, monday: datetime) -> Database:
+    random.seed(11)
+    workdays = {day: {"startTime": "08:00", "endTime": "17:00", "available": True} for day in WEEKDAYS[:5]}
+    doctor_documents = [
+        {"_id": ObjectId(), "licenseNumber": f"MD{index:06d}",
+         "specialization": ["cardiology"] if index % 5 == 0 else ["internal_medicine"],
+         "department": "Cardiology" if index % 5 == 0 else "Internal Medicine",
+         "schedule": workdays, "isAvailable": True}
+        for index in range(doctors)
+    ]
+    appointments = []
+    for doctor in doctor_documents:
+        for day in range(5):
+            for slot in range(18):
+                if random.random() < fill:
+                    appointments.append({
+                        "_id": ObjectId(), "doctorId": doctor["_id"], "patientId": ObjectId(),
+                        "scheduledDate": monday + timedelta(days=day, hours=8, minutes=slot * SLOT),
+                        "duration": SLOT, "status": "scheduled",
+                    })
+    data = {"doctors": doctor_documents, "appointments": appointments}
+    return Database({name: MockCollection(name, documents, INDEX_REGISTRY.get(name, []))
+                     for name, documents in data.items()})
+
+async def naive(db, monday: datetime):
+    """Probe each candidate slot of each cardiologist in time order"""
+    cardiologists = await db.doctors.find({"specialization": "cardiology", "isAvailable": True}, {"_id": 1}).to_list(None)
+    found, queries = [], 0
+    for day in range(5):
+        for slot in range(18):
+            start = monday + timedelta(days=day, hours=8, minutes=slot * SLOT)
+            for doctor in cardiologists:
+                queries += 1
+                # Latest appointment starting before the slot ends; it clashes if it runs into the slot
+                clashes = await db.appointments.find({
+                    "doctorId": doctor["_id"],
+                    "scheduledDate": {"$gt": start - timedelta(minutes=MAX_APPOINTMENT_MINUTES),
+                                      "$lt": start + timedelta(minutes=SLOT)},
+                    "status": {"$nin": list(INACTIVE_APPOINTMENT_STATUSES)},
+                }).sort("scheduledDate", -1).limit(1).to_list(1)
+                if not clashes or clashes[0]["scheduledDate"] + timedelta(minutes=clashes[0]["duration"]) <= start:
+                    found.append((start, doctor["_id"]))
+                    if len(found) >= LIMIT:
+                        return found, queries
+    return found, queries
+
+async def run(args):
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    monday = today + timedelta(days=7 - today.weekday())
+    started = time.perf_counter()
+    db = build(args.doctors, args.fill, monday)
+    print(f"{args.doctors} doctors, {len(db.appointments.docs):,} appointments next week "
+          f"(built in {time.perf_counter() - started:.1f}s)")
+
+    index = AvailabilityIndex(SLOT, 50000, 60)
+
+    async def search():
+        return await index.find_slots(db, monday, monday + timedelta(days=7), SLOT, LIMIT, specialization="cardiology")
+
+    cold = []
+    for _ in range(args.repeat):
+        index = AvailabilityIndex(SLOT, 50000, 60)
+        started = time.perf_counter()
+        slots = await search()
+        cold.append((time.perf_counter() - started) * 1000)
+    warm = []
+    for _ in range(args.repeat * 10):
+        started = time.perf_counter()
+        await search()
+        warm.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    probed, queries = await naive(db, monday)
+    naive_ms = (time.perf_counter() - started) * 1000
+
+    assert [(slot["start"], slot["doctorId"]) for slot in slots] == sorted(
+        (start, str(doctor_id)) for start, doctor_id in probed)
+    print(f"first {LIMIT} free {SLOT}-minute cardiology slots next week: first at {slots[0]['start']:%a %H:%M}")
+    print(f"    cold index: {statistics.median(cold):.1f} ms median")
+    print(f"    warm index: {statistics.median(warm):.2f} ms median")
+    print(f"    query per candidate slot: {naive_ms:.1f} ms, {queries} queries")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("doctors", type=int, nargs="?", default=300)
+    parser.add_argument("fill", type=float, nargs="?", default=0.8)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Measure /health and /patients latency while a login storm is running.
+
+Start the API first (``uvicorn app.main:app``), then:
+
+    cd backend && python -m benchmarks.bench_login_storm --logins 300 --concurrency 100
+
+The probe requests run in their own thread. They record p50/p99 before the
+storm and during it. When bcrypt runs on the hashing pool, p99 stays
+roughly flat. When it runs on the event loop, p99 grows with the storm.
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+def probe(session, url, headers, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(url, headers=headers, timeout=30)
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.01)
+
+def measure(base_url, headers, seconds, storm=None):
+    """Probe both endpoints for ``seconds`` (or while ``storm`` runs)"""
+    stop = threading.Event()
+    results = {"/health": [], "/api/v1/patients/": []}
+    threads = [threading.Thread(target=probe, args=(requests.Session(), base_url + path, headers, stop, samples))
+               for path, samples in results.items()]
+    for thread in threads:
+        thread.start()
+    if storm is not None:
+        storm()
+    else:
+        time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+def report(label, results):
+    for path, samples in results.items():
+        print(f"{label:<8}{path:<22}n={len(samples):<6}p50={percentile(samples, 50):8.1f}ms"
+              f"  p99={percentile(samples, 99):8.1f}ms  mean={statistics.mean(samples) * 1000:8.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="nurse")
+    parser.add_argument("--password", default="nurse123")
+    parser.add_argument("--logins", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    login_url = f"{args.url}/api/v1/auth/login"
+    credentials = {"username": args.username, "password": args.password}
+    token = requests.post(login_url, data=credentials, timeout=30).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    report("idle", measure(args.url, headers, seconds=3))
+
+    statuses = []
+
+    def storm():
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            statuses.extend(pool.map(lambda _: requests.post(login_url, data=credentials, timeout=120).status_code,
+                                     range(args.logins)))
+        print(f"storm: {args.logins} logins in {time.perf_counter() - started:.1f}s, "
+              f"statuses={sorted(set(statuses))}")
+
+    report("storm", measure(args.url, headers, seconds=0, storm=storm))
+    print("hashing pool:", requests.get(f"{args.url}/health", timeout=30).json().get("passwordHashing"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Dashboard overview: full recount vs the materialized stats document.
+
+    cd backend && python -m benchmarks.bench_overview 50000 100000
+
+Fills the fallback store with ``patients`` patients over 200 doctors, one
+appointment per 5 patients spread over the coming week and ``readings``
+vitals recorded today (5% with alerts). Then it times a full recount (what
+every refresh would cost without the stats document), an uncached read of
+the stats document and a cached read.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.config.indexes import INDEX_REGISTRY
+from app.config.mock_engine import MockCollection
+from app.services.overview_stats import OverviewStats
+
+class Database(dict):
+    def __getattr__(self, name):
+        return self[name]
+
+def build(patients: int, readings: int) -> Database:
+    random.seed(3)
+    doctors = [ObjectId() for _ in range(200)]
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    patient_documents = [
+        {"_id": ObjectId(), "patientId": f"P{index:08d}", "assignedDoctor": random.choice(doctors),
+         "isActive": random.random() < 0.9, "createdAt": now}
+        for index in range(patients)
+    ]
+    appointments = [
+        {"_id": ObjectId(), "patientId": patient["_id"], "doctorId": patient["assignedDoctor"],
+         "scheduledDate": today + timedelta(days=random.randrange(7), minutes=random.randrange(600)),
+         "status": random.choice(["scheduled", "confirmed", "cancelled"])}
+        for patient in patient_documents[::5]
+    ]
+    vitals = [
+        {"_id": ObjectId(), "patientId": random.choice(patient_documents)["_id"], "vitals": {"heartRate": 72},
+         "alerts": [{"type": "heartRate", "message": "Heart rate high: 110 bpm", "severity": "warning"}]
+                   if random.random() < 0.05 else [],
+         "recordedAt": today + timedelta(seconds=random.randrange(max(1, int((now - today).total_seconds()))))}
+        for _ in range(readings)
+    ]
+    data = {"patients": patient_documents, "appointments": appointments, "vitals": vitals, "stats": []}
+    return Database({name: MockCollection(name, documents, INDEX_REGISTRY.get(name, []))
+                     for name, documents in data.items()})
+
+async def timed(call, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+async def run(args):
+    started = time.perf_counter()
+    db = build(args.patients, args.readings)
+    print(f"{args.patients:,} patients, {len(db.appointments.docs):,} appointments, "
+          f"{args.readings:,} readings today (built in {time.perf_counter() - started:.1f}s)")
+
+    stats = OverviewStats(1000, 300, 5, 7)
+    recount_ms = await timed(lambda: stats._recount(db), 3)
+    await stats.reconcile(db)
+    overview = await stats.overview(db)
+
+    async def uncached():
+        stats._cached = None
+        await stats.overview(db)
+
+    read_ms = await timed(uncached, 50)
+    cached_ms = await timed(lambda: stats.overview(db), 1000)
+    print(f"activePatients={overview['activePatients']:,} appointmentsToday={overview['appointmentsToday']} "
+          f"alertsToday={overview['alertsToday']}")
+    print(f"full recount: {recount_ms:.1f} ms; stats document read: {read_ms:.2f} ms; "
+          f"cached: {cached_ms * 1000:.1f} us")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("patients", type=int, nargs="?", default=50000)
+    parser.add_argument("readings", type=int, nargs="?", default=100000)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Patient export: throughput and peak memory per format.
+
+    cd backend && python -m benchmarks.bench_patient_export 100000
+
+Fills the fallback store with ``patients`` patients (one latest reading
+each when ``--vitals`` is given) and drains ``export_patients`` for every
+format, counting bytes as a client would. Peak memory is measured with
+tracemalloc from the first batch to the footer, so it covers what the
+export itself holds and not the store. It should stay flat as ``patients``
+grows; compare with ``--batch`` set to ``patients`` to see a
+load-everything export.
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.config.indexes import INDEX_REGISTRY
+from app.config.mock_engine import MockCollection
+from app.services.patient_export import FORMATS, export_patients
+
+class Database(dict):
+    def __getattr__(self, name):
+        return self[name]
+
+def build(patients: int, vitals: bool) -> Database:
+    random.seed(5)
+    doctors = [ObjectId() for _ in range(200)]
+    start = datetime(2025, 1, 1)
+    patient_documents = []
+    readings = []
+    for index in range(patients):
+        created = start + timedelta(seconds=index * 30)
+        patient = {
+            "_id": ObjectId(),
+            "patientId": f"P{index:08d}",
+            "personalInfo": {
+                "firstName": f"First{index}", "lastName": f"Last{index % 5000}",
+                "dateOfBirth": datetime(1950 + index % 60, 1 + index % 12, 1 + index % 28),
+                "gender": random.choice(["male", "female"]), "phone": f"555-{index % 10000:04d}",
+                "email": f"patient{index}@example.com",
+                "address": {"street": f"{index} Main St", "city": "Springfield", "state": "IL",
+                            "zipCode": "62701", "country": "USA"},
+                "emergencyContact": {"name": "Contact", "relationship": "spouse", "phone": "555-0000"},
+            },
+            "medicalInfo": {"bloodType": "O+", "height": 170.0, "weight": 70.0,
+                            "allergies": ["penicillin"] if index % 4 == 0 else [],
+                            "chronicConditions": [], "medications": []},
+            "assignedDoctor": random.choice(doctors),
+            "registrationDate": created,
+            "isActive": True,
+            "createdAt": created,
+            "updatedAt": created,
+        }
+        patient_documents.append(patient)
+        if vitals:
+            readings.append({
+                "_id": ObjectId(), "patientId": patient["_id"], "recordedBy": doctors[0],
+                "vitals": {"heartRate": random.randint(60, 100),
+                           "bloodPressure": {"systolic": 120, "diastolic": 80}},
+                "alerts": [], "recordedAt": created, "createdAt": created,
+            })
+    data = {"patients": patient_documents, "vitals": readings}
+    return Database({name: MockCollection(name, documents, INDEX_REGISTRY.get(name, []))
+                     for name, documents in data.items()})
+
+async def drain(db, export_format: str, include_vitals: bool, batch_size: int):
+    # Warm up on one patient so lazy imports (pyarrow) stay out of the measurement
+    async for _ in export_patients(db, {"patientId": "P00000000"}, export_format, include_vitals, batch_size):
+        pass
+    size = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    async for chunk in export_patients(db, {}, export_format, include_vitals, batch_size):
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, size, peak
+
+async def run(args):
+    started = time.perf_counter()
+    db = build(args.patients, args.vitals)
+    print(f"{args.patients:,} patients (built in {time.perf_counter() - started:.1f}s), "
+          f"batch {args.batch}, vitals {'joined' if args.vitals else 'off'}")
+    for export_format in args.formats:
+        elapsed, size, peak = await drain(db, export_format, args.vitals, args.batch)
+        print(f"    {export_format:8} {args.patients / elapsed:>9,.0f} rows/s  {size / 2 ** 20:8.1f} MiB out  "
+              f"peak {peak / 2 ** 20:6.1f} MiB")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("patients", type=int, nargs="?", default=100000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--vitals", action="store_true")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=list(FORMATS))
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
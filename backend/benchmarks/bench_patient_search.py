@@ -0,0 +1,60 @@
+"""Compare patient search latency: unanchored regex scan vs indexed prefix keys.
+
+Runs against the in-process fallback engine so it needs no MongoDB:
+
+    cd backend && python -m benchmarks.bench_patient_search 10000 100000 1000000
+"""
+import asyncio
+import random
+import string
+import sys
+import time
+
+from app.config.indexes import INDEX_REGISTRY
+from app.config.mock_engine import MockCollection
+from app.services.patient_search import build_search_document, build_search_filter
+
+FIRST_NAMES = ["james", "mary", "john", "patricia", "robert", "jennifer", "michael", "linda",
+               "william", "elizabeth", "david", "barbara", "richard", "susan", "joseph", "jessica"]
+QUERIES = ["jen", "smi", "P0004", "mary.w", "john sm", "zzz"]
+
+def make_patient(i: int, rng: random.Random) -> dict:
+    first = rng.choice(FIRST_NAMES).title()
+    last = "".join(rng.choice(string.ascii_lowercase) for _ in range(6)).title()
+    if i % 50 == 0:
+        last = "Smith"
+    personal_info = {"firstName": first, "lastName": last, "email": f"{first}.{last[0]}{i}@mail.com".lower()}
+    patient_id = f"P{i:07d}"
+    return {"patientId": patient_id, "personalInfo": personal_info, "isActive": True,
+            "search": build_search_document(personal_info, patient_id)}
+
+def regex_filter(search: str) -> dict:
+    return {"isActive": True, "$or": [
+        {"personalInfo.firstName": {"$regex": search, "$options": "i"}},
+        {"personalInfo.lastName": {"$regex": search, "$options": "i"}},
+        {"patientId": {"$regex": search, "$options": "i"}},
+        {"personalInfo.email": {"$regex": search, "$options": "i"}},
+    ]}
+
+async def timed(collection: MockCollection, query: dict, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await collection.find(query).limit(10).to_list(length=10)
+    return (time.perf_counter() - start) / repeat * 1000
+
+async def run(size: int):
+    rng = random.Random(size)
+    collection = MockCollection("patients", (make_patient(i, rng) for i in range(size)), INDEX_REGISTRY["patients"])
+    print(f"\n{size:,} patients")
+    print(f"{'query':<10}{'regex scan ms':>16}{'prefix index ms':>18}")
+    for search in QUERIES:
+        indexed = {"isActive": True, **build_search_filter(search)}
+        # "zzz" has no match, so the regex path scans the whole collection
+        scan_ms = await timed(collection, regex_filter(search), 3)
+        index_ms = await timed(collection, indexed, 50)
+        print(f"{search:<10}{scan_ms:>16.3f}{index_ms:>18.3f}")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        asyncio.run(run(size))
@@ -0,0 +1,167 @@
+"""Report downloads: throughput of concurrent full, resumed and revalidated GETs.
+
+    cd backend && python -m benchmarks.bench_report_download --clients 100 --size 50
+
+Starts uvicorn on the app (fallback store, a temporary UPLOAD_DIR,
+MAX_FILE_SIZE raised to fit), uploads one ``size`` MB report file as the
+demo admin and then, with ``clients`` concurrent httpx streams:
+
+* downloads the whole file once per client (aggregate MB/s, p50/p99);
+* resumes each download from a random offset with Range + If-Range;
+* revalidates with If-None-Match, which must be answered 304 with no body.
+
+The server's peak RSS (VmHWM) is printed at the end; it should not grow with
+``clients`` x ``size``. uvicorn offers neither the ASGI zero-copy nor the
+pathsend extension, so this only measures the chunked aiofiles path of
+FileRangeResponse; the other two are covered by tests/test_file_response.py.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+async def wait_until_up(client: httpx.AsyncClient):
+    for _ in range(200):
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise SystemExit("server did not start")
+
+def file_chunks(size: int):
+    block = os.urandom(1024 * 1024)
+    sent = 0
+    while sent < size:
+        piece = block[:min(len(block), size - sent)]
+        sent += len(piece)
+        yield piece
+
+class StreamedFile:
+    """File-like object so httpx streams the multipart body instead of building it"""
+
+    def __init__(self, size: int):
+        self._chunks = file_chunks(size)
+        self._pending = b""
+
+    def read(self, n: int = -1) -> bytes:
+        while n < 0 or len(self._pending) < n:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._pending += chunk
+        if n < 0:
+            n = len(self._pending)
+        data, self._pending = self._pending[:n], self._pending[n:]
+        return data
+
+async def timed_get(client, url, headers, expect):
+    started = time.perf_counter()
+    received = 0
+    async with client.stream("GET", url, headers=headers) as response:
+        assert response.status_code == expect, (response.status_code, await response.aread())
+        async for chunk in response.aiter_raw():
+            received += len(chunk)
+    return time.perf_counter() - started, received
+
+def summarize(label, results, elapsed):
+    times = sorted(t for t, _ in results)
+    total = sum(n for _, n in results)
+    print(f"{label:<28} {len(results) / elapsed:8.1f} req/s  {total / 2 ** 20 / elapsed:8.1f} MB/s  "
+          f"p50={times[len(times) // 2] * 1000:.0f}ms  p99={times[int(len(times) * .99)] * 1000:.0f}ms")
+    return total
+
+async def run(args, base_url: str, server: subprocess.Popen):
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=600) as client:
+        await wait_until_up(client)
+        token = (await client.post("/api/v1/auth/login", data={"username": "admin", "password": "admin123"})).json()
+        auth = {"Authorization": f"Bearer {token['access_token']}"}
+        patient = await client.post("/api/v1/patients/", headers=auth, json={"personalInfo": {
+            "firstName": "Bench", "lastName": "Mark", "dateOfBirth": "1970-01-01T00:00:00", "gender": "female",
+            "phone": "555-0100", "emergencyContact": {"name": "Contact", "relationship": "spouse", "phone": "555-0101"},
+            "address": {"street": "1 Main St", "city": "Springfield", "state": "IL", "zipCode": "62701"},
+        }})
+        assert patient.status_code == 200, patient.text
+        patient_id = patient.json()["id"]
+        size = args.size * 2 ** 20
+        upload = await client.post("/api/v1/reports/upload", headers=auth,
+                                   data={"patientId": patient_id, "title": "Benchmark CT"},
+                                   files={"file": ("ct.bin", StreamedFile(size), "application/octet-stream")})
+        assert upload.status_code == 201, upload.text
+        url = upload.json()["files"][0]["fileUrl"]
+        print(f"{args.clients} clients, {args.size} MB file, server RSS after upload {peak_rss_mb(server.pid):.0f} MB")
+
+        full = asyncio.gather(*(timed_get(client, url, auth, 200) for _ in range(args.clients)))
+        started = time.perf_counter()
+        results = await full
+        total = summarize("full downloads", results, time.perf_counter() - started)
+        assert total == size * args.clients
+
+        etag = (await client.head(url, headers=auth)).headers["etag"]
+        offsets = [random.randrange(size) for _ in range(args.clients)]
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            timed_get(client, url, {**auth, "Range": f"bytes={offset}-", "If-Range": etag}, 206)
+            for offset in offsets
+        ))
+        total = summarize("resumed (Range + If-Range)", results, time.perf_counter() - started)
+        assert total == sum(size - offset for offset in offsets)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            timed_get(client, url, {**auth, "If-None-Match": etag}, 304) for _ in range(args.clients * 10)
+        ))
+        summarize("revalidated (304)", results, time.perf_counter() - started)
+
+        print(f"server peak RSS {peak_rss_mb(server.pid):.0f} MB")
+        print(f"reportFiles: {(await client.get('/health')).json()['reportFiles']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--size", type=int, default=50, help="file size in MB")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    directory = tempfile.mkdtemp(prefix="report-download-bench-")
+    port = free_port()
+    env = {
+        **os.environ,
+        "UPLOAD_DIR": directory,
+        "MAX_FILE_SIZE": str((args.size + 1) * 2 ** 20),
+        "DATABASE_URL": "mongodb://127.0.0.1:1/",
+        "MONGO_SERVER_SELECTION_TIMEOUT_MS": "100",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+         "--no-access-log", "--timeout-keep-alive", "600"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        asyncio.run(run(args, f"http://127.0.0.1:{port}", server))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(directory)
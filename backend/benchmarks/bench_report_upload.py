@@ -0,0 +1,178 @@
+"""Report uploads: peak memory, throughput and time to reject.
+
+    cd backend && python -m benchmarks.bench_report_upload --sizes 10 200
+
+Feeds ``upload_report`` a multipart body of one ``size`` MB file in the
+64 KiB chunks uvicorn delivers, with MAX_FILE_SIZE raised to fit, and
+reports MB/s and the tracemalloc peak of the upload. The peak should stay
+at about one UPLOAD_CHUNK_SIZE however large the file. Each file is then
+uploaded again, which the blob store should match against the stored copy
+without writing anything. It then sends a file
+``--oversize`` times the regular limit and reports how much of it was read
+before the 413. Last, it uploads a large JPEG and records the longest event
+loop stall while its preview is rendered in the process pool.
+
+Files go to a temporary directory that is removed afterwards.
+"""
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.config.mock_engine import MockCollection
+from app.config.settings import settings
+from app.routes.reports import upload_report
+from app.services.blob_store import blob_store
+from app.services.report_files import report_files
+
+ADMIN_ID = "000000000000000000000001"
+BOUNDARY = "benchboundary7d1f"
+RECEIVE_CHUNK = 64 * 1024
+
+class Database(dict):
+    def __missing__(self, name):
+        return self.setdefault(name, MockCollection(name))
+
+    def __getattr__(self, name):
+        return self[name]
+
+def body_parts(patient_id: str, file_name: str, content_type: str, size: int, pattern: bytes):
+    """The multipart body as a generator of RECEIVE_CHUNK pieces; never holds the whole file"""
+    head = "".join(
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n"
+        for name, value in (("patientId", patient_id), ("title", "Benchmark"), ("reportType", "other"))
+    ) + (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{file_name}\"\r\n"
+         f"Content-Type: {content_type}\r\n\r\n")
+    yield head.encode()
+    block = (pattern * (RECEIVE_CHUNK // len(pattern) + 1))[:RECEIVE_CHUNK]
+    sent = 0
+    while sent < size:
+        piece = block[:min(RECEIVE_CHUNK, size - sent)]
+        sent += len(piece)
+        yield piece
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+def build_request(parts, counter):
+    async def receive():
+        chunk = next(parts, None)
+        if chunk is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        counter[0] += len(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": True}
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/api/v1/reports/upload",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())],
+    }
+    return Request(scope, receive)
+
+async def upload(db, patient_id: str, file_name: str, content_type: str, size: int, pattern: bytes):
+    counter = [0]
+    request = build_request(body_parts(patient_id, file_name, content_type, size, pattern), counter)
+    try:
+        response = await upload_report(request, db=db, current_user_id=ADMIN_ID, _="admin")
+        return response, counter[0]
+    except HTTPException as e:
+        return e, counter[0]
+
+async def watch_loop(stalls, stop):
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(0.001)
+        stalls.append(time.perf_counter() - before - 0.001)
+
+async def run(args):
+    db = Database()
+    patient_id = ObjectId()
+    await db.patients.insert_one({"_id": patient_id, "patientId": "PBENCH", "isActive": True,
+                                  "createdAt": datetime.utcnow()})
+    limit = settings.MAX_FILE_SIZE
+    print(f"chunk={settings.UPLOAD_CHUNK_SIZE // 1024} KiB, MAX_FILE_SIZE={limit // 2 ** 20} MB")
+
+    for size_mb in args.sizes:
+        size = size_mb * 2 ** 20
+        blob_store.max_size = size
+        # Untraced for throughput (tracemalloc slows the parser down a lot), then traced for the peak;
+        # distinct content per run so nothing is deduplicated
+        started = time.perf_counter()
+        response, _ = await upload(db, str(patient_id), f"data{size_mb}.bin", "application/octet-stream",
+                                   size, os.urandom(4096))
+        elapsed = time.perf_counter() - started
+        assert not isinstance(response, HTTPException), response.detail
+        pattern = os.urandom(4096)
+        tracemalloc.start()
+        response, _ = await upload(db, str(patient_id), f"data{size_mb}.bin", "application/octet-stream",
+                                   size, pattern)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert response.files[0].fileSize == size
+        print(f"{size_mb:>5} MB {'upload:':<10} {size / 2 ** 20 / elapsed:7.1f} MB/s  peak={peak / 2 ** 20:.2f} MB")
+
+        # The same content again is matched against the stored blob instead of written
+        stored = response.files[0].sha256
+        not_written = blob_store.bytes_not_written
+        started = time.perf_counter()
+        response, _ = await upload(db, str(patient_id), f"copy{size_mb}.bin", "application/octet-stream",
+                                   size, pattern)
+        elapsed = time.perf_counter() - started
+        assert response.files[0].sha256 == stored and not os.listdir(blob_store.temp_dir)
+        print(f"{size_mb:>5} MB {'duplicate:':<10} {size / 2 ** 20 / elapsed:7.1f} MB/s  "
+              f"written={(size - (blob_store.bytes_not_written - not_written)) / 2 ** 20:.1f} MB")
+
+    blob_store.max_size = limit
+    oversize = limit * args.oversize
+    started = time.perf_counter()
+    response, read = await upload(db, str(patient_id), "huge.bin", "application/octet-stream",
+                                  oversize, os.urandom(4096))
+    elapsed = time.perf_counter() - started
+    assert isinstance(response, HTTPException) and response.status_code == 413
+    print(f"{oversize // 2 ** 20:>5} MB oversize: 413 after reading {read / 2 ** 20:.1f} MB "
+          f"in {elapsed * 1000:.0f}ms; temp files left={len(os.listdir(blob_store.temp_dir))}")
+
+    from PIL import Image
+
+    image = Image.radial_gradient("L").resize((args.image_px, args.image_px * 3 // 4)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    jpeg = buffer.getvalue()
+    stalls = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stalls, stop))
+    started = time.perf_counter()
+    # Form fields and closing boundary of an empty file, with the JPEG spliced in between
+    parts = list(body_parts(str(patient_id), "scan.jpg", "image/jpeg", 0, b"x"))
+    parts[1:1] = [jpeg[i:i + RECEIVE_CHUNK] for i in range(0, len(jpeg), RECEIVE_CHUNK)]
+    response = await upload_report(build_request(iter(parts), [0]), db=db, current_user_id=ADMIN_ID, _="admin")
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+    assert response.files[0].previewUrl
+    print(f"{args.image_px}px JPEG ({len(jpeg) / 2 ** 20:.1f} MB) with preview: {elapsed * 1000:.0f}ms, "
+          f"longest loop stall {max(stalls) * 1000:.1f}ms")
+    print(f"blobs: {blob_store.stats()}")
+    print(f"previews: {report_files.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 200], help="file sizes in MB")
+    parser.add_argument("--oversize", type=int, default=10, help="multiple of MAX_FILE_SIZE to reject")
+    parser.add_argument("--image-px", type=int, default=6000)
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp(prefix="report-bench-")
+    blob_store.root = os.path.join(directory, "blobs")
+    blob_store.temp_dir = os.path.join(blob_store.root, "tmp")
+    report_files.preview_root = os.path.join(directory, "previews")
+    try:
+        asyncio.run(run(args))
+    finally:
+        report_files.shutdown()
+        shutil.rmtree(directory)
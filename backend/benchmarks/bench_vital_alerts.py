@@ -0,0 +1,99 @@
+"""Alert evaluation: per-reading Python branching vs the column-wise NumPy engine.
+
+    cd backend && python -m benchmarks.bench_vital_alerts 100000
+
+Both sides use the same per-patient rules (200 patients, a third with
+chronic-condition overrides) and must produce identical alerts. Rule
+loading is excluded; only evaluation over the batch is timed.
+"""
+import sys
+import random
+import time
+
+import numpy as np
+
+from app.services.vital_alerts import METRICS, VITAL_THRESHOLDS, build_rules, evaluate
+
+PATIENTS = 200
+CONDITIONS = [[], [], ["COPD"], ["Type 2 diabetes", "Hypertension"], [], ["Atrial fibrillation"]]
+
+def make_batch(count: int):
+    readings, patient_rows = [], []
+    for i in range(count):
+        readings.append({
+            "heartRate": random.randint(45, 140),
+            "bloodPressure": {"systolic": random.randint(85, 190), "diastolic": random.randint(55, 125)},
+            "oxygenSaturation": random.randint(86, 100),
+            "respiratoryRate": random.randint(10, 32),
+            "temperature": round(random.uniform(96.0, 103.5), 1),
+            **({"bloodSugar": random.randint(50, 320)} if i % 4 == 0 else {}),
+        })
+        patient_rows.append(i % PATIENTS)
+    return readings, patient_rows
+
+def naive(readings, patient_rows, rules):
+    """The straightforward version: one branch chain per reading per measurement"""
+    bounds = [[[None if np.isnan(b) else float(b) for b in row] for row in patient_rules] for patient_rules in rules]
+    alerts = []
+    for vitals, patient in zip(readings, patient_rows):
+        reading_alerts = []
+        for column, metric in enumerate(METRICS):
+            if "." in metric:
+                parent, field = metric.split(".")
+                value = (vitals.get(parent) or {}).get(field)
+            else:
+                value = vitals.get(metric)
+            if value is None:
+                continue
+            critical_low, warning_low, warning_high, critical_high = bounds[patient][column]
+            if critical_low is not None and value < critical_low:
+                direction, severity = "critically low", "critical"
+            elif critical_high is not None and value > critical_high:
+                direction, severity = "critically high", "critical"
+            elif warning_low is not None and value < warning_low:
+                direction, severity = "low", "warning"
+            elif warning_high is not None and value > warning_high:
+                direction, severity = "high", "warning"
+            else:
+                continue
+            threshold = VITAL_THRESHOLDS[metric]
+            reading_alerts.append({"type": metric,
+                                   "message": f"{threshold.label} {direction}: {value} {threshold.unit}",
+                                   "severity": severity})
+        alerts.append(reading_alerts)
+    return alerts
+
+def main(count: int):
+    random.seed(7)
+    readings, patient_rows = make_batch(count)
+    rules = np.stack([build_rules({"chronicConditions": CONDITIONS[p % len(CONDITIONS)]}) for p in range(PATIENTS)])
+
+    started = time.perf_counter()
+    expected = naive(readings, patient_rows, rules)
+    naive_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = evaluate(readings, rules[patient_rows])
+    vector_seconds = time.perf_counter() - started
+
+    assert actual == expected, "engines disagree"
+    raised = sum(len(a) for a in actual)
+    print(f"{count} readings, {raised} alerts")
+    print(f"naive loop:  {naive_seconds:7.3f}s  {count / naive_seconds:>12,.0f} readings/s")
+    print(f"vectorized:  {vector_seconds:7.3f}s  {count / vector_seconds:>12,.0f} readings/s")
+
+    # Mostly-normal traffic: alert formatting no longer dominates
+    for vitals in readings:
+        vitals.update(heartRate=72, oxygenSaturation=97, respiratoryRate=16, temperature=98.6,
+                      bloodPressure={"systolic": 120, "diastolic": 80})
+        vitals.pop("bloodSugar", None)
+    started = time.perf_counter()
+    naive(readings, patient_rows, rules)
+    naive_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    evaluate(readings, rules[patient_rows])
+    vector_seconds = time.perf_counter() - started
+    print(f"normal readings: naive {naive_seconds:.3f}s, vectorized {vector_seconds:.3f}s")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
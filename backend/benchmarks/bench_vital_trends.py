@@ -0,0 +1,114 @@
+"""Vitals trend queries: precomputed rollups vs aggregating raw readings per request.
+
+    cd backend && python -m benchmarks.bench_vital_trends 90
+
+Loads ``days x 1440`` per-minute readings for one patient through the
+rollup path used at ingest, then times a 90-day chart (500 points) served
+from ``vital_rollups`` against reading every raw reading and aggregating it
+with pandas on each request, and a 1m chart over the longest range allowed
+for raw aggregation. Uses the in-process fallback store.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+from app.config.indexes import INDEX_REGISTRY
+from app.config.settings import settings
+from app.config.mock_engine import MockCollection
+from app.services.vital_trends import VitalRollups, rollup_documents, lttb
+from app.services.vitals_store import DocumentVitalsStore
+
+METRICS = ["heartRate", "bloodPressure.systolic", "oxygenSaturation", "temperature"]
+
+def make_readings(patient_id, days: int, start: datetime):
+    recorded_by = ObjectId()
+    for minute in range(days * 1440):
+        recorded_at = start + timedelta(minutes=minute)
+        yield {
+            "patientId": patient_id,
+            "recordedBy": recorded_by,
+            "vitals": {
+                "heartRate": random.randint(60, 100),
+                "bloodPressure": {"systolic": random.randint(105, 135), "diastolic": random.randint(65, 85)},
+                "oxygenSaturation": random.randint(95, 100),
+                "temperature": round(random.uniform(97.5, 99.5), 1),
+            },
+            "alerts": [],
+            "recordedAt": recorded_at,
+            "createdAt": recorded_at,
+        }
+
+async def timed(call, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+async def run(args):
+    random.seed(7)
+    patient_id = ObjectId()
+    start = datetime(2026, 1, 1)
+    end = start + timedelta(days=args.days)
+    db = {name: MockCollection(name, [], INDEX_REGISTRY[name]) for name in ("vitals", "vital_rollups")}
+    store = DocumentVitalsStore()
+    rollups = VitalRollups(5000, settings.VITALS_TRENDS_MAX_RAW_MINUTES)
+
+    readings = list(make_readings(patient_id, args.days, start))
+    write_ms = 0.0
+    for offset in range(0, len(readings), args.batch):
+        batch = readings[offset:offset + args.batch]
+        await store.insert_batch(db, batch)
+        started = time.perf_counter()
+        await rollups.record(db, batch)
+        write_ms += (time.perf_counter() - started) * 1000
+    print(f"{len(readings):,} readings; rollup upkeep {write_ms / len(readings) * 1000:.1f} us/reading, "
+          f"{len(db['vital_rollups'].docs):,} rollup documents")
+
+    async def from_rollups():
+        return await rollups.trends(db, patient_id, METRICS, "1h", start, end, args.points, [5, 50, 95])
+
+    async def from_raw():
+        # What the endpoint would do without rollups: read everything, aggregate, downsample
+        raw = await store.find_range(db, patient_id, start, end, len(readings))
+        documents = sorted(rollup_documents(raw, "1h"), key=lambda document: document["bucketStart"])
+        for metric in METRICS:
+            parent, _, field = metric.rpartition(".")
+            means = [((document["metrics"][parent] if parent else document["metrics"])[field]) for document in documents]
+            means = [rollup["sum"] / rollup["n"] for rollup in means]
+            lttb(np.arange(len(means), dtype=float), np.array(means), args.points)
+        return documents
+
+    rollup_ms, series = await timed(from_rollups, args.repeat)
+    raw_ms, _ = await timed(from_raw, max(1, args.repeat // 5))
+    points = sum(len(values) for values in series.values())
+    print(f"{args.days}-day chart, {len(METRICS)} measurements, {args.points} points each ({points} returned)")
+    print(f"    from rollups: {rollup_ms:.1f} ms median")
+    print(f"    from raw readings: {raw_ms:.1f} ms median ({raw_ms / rollup_ms:.0f}x slower)")
+
+    # 1m charts are aggregated from raw readings, over at most VITALS_TRENDS_MAX_RAW_MINUTES
+    window = timedelta(minutes=rollups.max_raw_buckets)
+
+    async def one_minute():
+        return await rollups.trends(db, patient_id, METRICS, "1m", end - window, end, args.points, [5, 50, 95])
+
+    minute_ms, _ = await timed(one_minute, args.repeat)
+    print(f"    1m chart over the last {window}: {minute_ms:.1f} ms median")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("days", type=int, nargs="?", default=90)
+    parser.add_argument("--points", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Vitals ingestion throughput: POST /api/v1/vitals/bulk on a single worker.
+
+    cd backend && python -m benchmarks.bench_vitals_ingest 100000 1000
+    cd backend && python -m benchmarks.bench_vitals_ingest 100000 1000 --url http://localhost:8000
+
+Without ``--url`` the app runs in-process through the ASGI stack (MongoDB
+if ``DATABASE_URL`` is reachable, the fallback store otherwise), so the
+figure includes JSON parsing, validation, alerting and the batched
+inserts (into the store selected by ``VITALS_STORAGE``). Rollups are
+folded in by their background flush on the same event loop, so their CPU
+cost still shows; the ``rollups`` line reports what was left queued. With ``--url`` requests go to a running uvicorn worker. The
+``pipeline`` line times prepare + write alone, without HTTP.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+BEDS = 200
+
+def make_readings(count: int, patients):
+    start = datetime.utcnow() - timedelta(seconds=count)
+    readings = []
+    for i in range(count):
+        readings.append({
+            "patientId": patients[i % len(patients)],
+            "recordedAt": (start + timedelta(seconds=i)).isoformat(),
+            "vitals": {
+                "heartRate": random.randint(45, 140),
+                "bloodPressure": {"systolic": random.randint(85, 190), "diastolic": random.randint(55, 125)},
+                "oxygenSaturation": random.randint(86, 100),
+                "respiratoryRate": random.randint(10, 32),
+                "temperature": round(random.uniform(96.0, 103.5), 1),
+            },
+        })
+    return readings
+
+def report(label: str, count: int, seconds: float):
+    print(f"{label:<10} {count:>8} readings in {seconds:7.3f}s  {count / seconds:>10,.0f} readings/s")
+
+def login(client, base_url: str):
+    token = client.post(f"{base_url}/api/v1/auth/login",
+                        data={"username": "nurse", "password": "nurse123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def create_patients(client, base_url: str, headers, count: int):
+    """Readings for unknown patients are rejected, so the beds need real patients"""
+    patients = []
+    for bed in range(count):
+        response = client.post(f"{base_url}/api/v1/patients/", headers=headers, json={"personalInfo": {
+            "firstName": "Bed", "lastName": str(bed), "dateOfBirth": "1970-01-01T00:00:00", "gender": "other",
+            "phone": "555-0100", "emergencyContact": {"name": "Contact", "relationship": "spouse", "phone": "555-0101"},
+            "address": {"street": "1 Main St", "city": "Springfield", "state": "IL", "zipCode": "62701"},
+        }})
+        response.raise_for_status()
+        patients.append(response.json()["id"])
+    return patients
+
+def bench_http(client, base_url: str, headers, readings, batch: int):
+    inserted = 0
+    started = time.perf_counter()
+    for offset in range(0, len(readings), batch):
+        response = client.post(f"{base_url}/api/v1/vitals/bulk",
+                               json={"vitals": readings[offset:offset + batch]}, headers=headers)
+        response.raise_for_status()
+        inserted += response.json()["inserted"]
+    report("http", inserted, time.perf_counter() - started)
+
+async def bench_pipeline(readings, batch: int):
+    from app.config.database import get_database
+    from app.models.vital import VitalsBulkCreate
+    from app.services.vital_alerts import alert_engine
+    from app.services.vitals_ingest import vitals_ingestor
+
+    db = await get_database()
+    recorded_by = ObjectId()
+    payloads = [VitalsBulkCreate(vitals=readings[offset:offset + batch]) for offset in range(0, len(readings), batch)]
+    inserted = 0
+    started = time.perf_counter()
+    for payload in payloads:
+        documents, positions, rejected = vitals_ingestor.prepare(payload.dict(exclude_none=True)["vitals"],
+                                                                 recorded_by)
+        documents, _ = await vitals_ingestor.check_patients(db.patients, documents, positions, rejected)
+        await alert_engine.annotate(db.patients, documents)
+        count, _ = await vitals_ingestor.write(db, documents)
+        inserted += count
+    report("pipeline", inserted, time.perf_counter() - started)
+    print("ingestor:", vitals_ingestor.stats())
+
+async def drain_rollups():
+    """Rollups are folded in behind the requests; time what is still queued at the end"""
+    from app.services.vital_trends import vital_rollups
+
+    queued = vital_rollups.stats()["queueDepth"]
+    started = time.perf_counter()
+    await vital_rollups.flush()
+    print(f"rollups: {queued} readings still queued, folded in {time.perf_counter() - started:.3f}s later;",
+          vital_rollups.stats())
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("readings", type=int, nargs="?", default=100000)
+    parser.add_argument("batch", type=int, nargs="?", default=1000)
+    parser.add_argument("--url", help="base URL of a running server")
+    args = parser.parse_args()
+
+    if args.url:
+        import httpx
+        base_url = args.url.rstrip("/")
+        with httpx.Client(timeout=60) as client:
+            headers = login(client, base_url)
+            readings = make_readings(args.readings, create_patients(client, base_url, headers, BEDS))
+            bench_http(client, base_url, headers, readings, args.batch)
+        return
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as client:
+        headers = login(client, "")
+        readings = make_readings(args.readings, create_patients(client, "", headers, BEDS))
+        bench_http(client, "", headers, readings, args.batch)
+        client.portal.call(bench_pipeline, readings, args.batch)
+        client.portal.call(drain_rollups)
+
+if __name__ == "__main__":
+    main()
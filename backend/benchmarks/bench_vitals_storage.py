@@ -0,0 +1,124 @@
+"""Vitals storage footprint and range-read latency: per-reading documents vs hourly buckets.
+
+    cd backend && python -m benchmarks.bench_vitals_storage 50 24
+    cd backend && python -m benchmarks.bench_vitals_storage 50 24 --mongo mongodb://localhost:27017/bench
+
+Writes ``patients x hours x 60`` readings (one per bed per minute) through
+both stores, then reports document count, index entries, BSON bytes and
+the latency of 1h and 24h range reads. Without ``--mongo`` the in-process
+fallback store is used and sizes are raw BSON; with ``--mongo`` the
+figures come from ``collStats`` on a scratch database that is dropped
+afterwards.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+
+from app.config.indexes import INDEX_REGISTRY
+from app.config.mock_engine import MockCollection
+from app.services.vitals_store import BucketedVitalsStore, DocumentVitalsStore
+
+def make_readings(patients, hours: int, start: datetime):
+    recorded_by = ObjectId()
+    for minute in range(hours * 60):
+        recorded_at = start + timedelta(minutes=minute)
+        for patient_id in patients:
+            yield {
+                "patientId": patient_id,
+                "recordedBy": recorded_by,
+                "vitals": {
+                    "heartRate": random.randint(60, 100),
+                    "bloodPressure": {"systolic": random.randint(105, 135), "diastolic": random.randint(65, 85)},
+                    "oxygenSaturation": random.randint(95, 100),
+                    "respiratoryRate": random.randint(12, 18),
+                    "temperature": round(random.uniform(97.5, 99.5), 1),
+                },
+                "alerts": [],
+                "recordedAt": recorded_at,
+                "createdAt": recorded_at,
+            }
+
+async def load(store, db, readings, batch: int = 1000):
+    pending = []
+    for reading in readings:
+        pending.append(reading)
+        if len(pending) == batch:
+            await store.insert_batch(db, pending)
+            pending = []
+    if pending:
+        await store.insert_batch(db, pending)
+
+async def read_latency(store, db, patients, end: datetime, span: timedelta, limit: int):
+    timings = []
+    returned = 0
+    for patient_id in patients:
+        started = time.perf_counter()
+        readings = await store.find_range(db, patient_id, end - span, end, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+        returned += len(readings)
+    return statistics.median(timings), returned / len(patients)
+
+async def mock_sizes(store, db):
+    collection = db[store.collection]
+    documents = list(collection.docs.values())
+    index_entries = len(documents) + sum(len(index.entries) for index in collection.indexes)
+    return len(documents), index_entries, sum(len(bson.encode(document)) for document in documents)
+
+async def mongo_sizes(store, db):
+    stats = await db.command("collStats", store.collection)
+    return stats["count"], stats["nindexes"], stats["storageSize"] + stats["totalIndexSize"]
+
+async def run(args):
+    random.seed(11)
+    patients = [ObjectId() for _ in range(args.patients)]
+    start = datetime(2026, 1, 1)
+    end = start + timedelta(hours=args.hours)
+
+    client = None
+    if args.mongo:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo)
+        db = client.get_default_database("vitals_storage_bench")
+        for name in ("vitals", "vitals_buckets"):
+            await db.drop_collection(name)
+            await db[name].create_indexes(INDEX_REGISTRY[name])
+        sizes = mongo_sizes
+        size_columns = ("docs", "indexes", "bytes (data+index, compressed)")
+    else:
+        db = {name: MockCollection(name, [], INDEX_REGISTRY[name]) for name in ("vitals", "vitals_buckets")}
+        sizes = mock_sizes
+        size_columns = ("docs", "index entries", "BSON bytes")
+
+    total = args.patients * args.hours * 60
+    print(f"{args.patients} patients x {args.hours}h x 60/h = {total} readings")
+    for store in (DocumentVitalsStore(), BucketedVitalsStore(720)):
+        started = time.perf_counter()
+        await load(store, db, make_readings(patients, args.hours, start))
+        write_seconds = time.perf_counter() - started
+        documents, indexes, size = await sizes(store, db)
+        hour_ms, hour_rows = await read_latency(store, db, patients, end, timedelta(hours=1), 60)
+        day_ms, day_rows = await read_latency(store, db, patients, end, timedelta(hours=24), 1000)
+        print(f"[{store.name}] write {total / write_seconds:,.0f} readings/s; "
+              f"{size_columns[0]}={documents:,} {size_columns[1]}={indexes:,} {size_columns[2]}={size:,}")
+        print(f"    1h read: {hour_ms:.2f} ms median ({hour_rows:.0f} rows); "
+              f"24h read (limit 1000): {day_ms:.2f} ms median ({day_rows:.0f} rows)")
+
+    if client is not None:
+        await client.drop_database(db.name)
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("patients", type=int, nargs="?", default=50)
+    parser.add_argument("hours", type=int, nargs="?", default=24)
+    parser.add_argument("--mongo", help="MongoDB URL for collStats-based sizes")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Live vitals fan-out with thousands of subscribers on one worker.
+
+    cd backend && python -m benchmarks.bench_vitals_stream 5000 2000
+    cd backend && python -m benchmarks.bench_vitals_stream 1000 2000 --url http://localhost:8000
+
+In-process mode subscribes N clients straight to the broker (25 per
+patient, every tenth alerts-only, every fiftieth deliberately slow) and
+drains each queue from its own task the way the SSE response does. It then
+publishes readings in ingest-sized batches and reports publish cost,
+delivery rate, end-to-end latency and slow-consumer drops.
+
+With ``--url`` it opens N real SSE connections to a running server and
+posts readings to /vitals/bulk; latency is receipt time minus the
+reading's ``createdAt``.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+PER_PATIENT = 25
+
+def make_batch(patients, size: int, offset: int):
+    now = datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "patientId": patients[(offset + i) % len(patients)],
+        "recordedBy": ObjectId(),
+        "vitals": {"heartRate": 150 if (offset + i) % 10 == 0 else 72, "oxygenSaturation": 97},
+        "alerts": [{"type": "heartRate", "message": "Heart rate critically high: 150 bpm", "severity": "critical"}]
+                  if (offset + i) % 10 == 0 else [],
+        "recordedAt": now,
+        "createdAt": now,
+    } for i in range(size)]
+
+def latency_ms(payload: bytes) -> float:
+    data = json.loads(payload.split(b"data: ", 1)[1])
+    return (datetime.utcnow() - datetime.fromisoformat(data["createdAt"])).total_seconds() * 1000
+
+def summarize(latencies, received: int, seconds: float):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    print(f"delivered {received:,} events in {seconds:.2f}s ({received / seconds:,.0f}/s); "
+          f"latency p50 {statistics.median(latencies) if latencies else 0:.1f} ms, p99 {p99:.1f} ms")
+
+async def in_process(subscribers: int, readings: int, batch: int):
+    from app.services.vitals_stream import VitalsBroker
+
+    broker = VitalsBroker(subscribers, 256)
+    patients = [ObjectId() for _ in range(max(subscribers // PER_PATIENT, 1))]
+    latencies = []
+    received = 0
+
+    async def consume(subscriber, slow: bool):
+        nonlocal received
+        while True:
+            event = await subscriber.queue.get()
+            received += 1
+            if received % 97 == 0:
+                latencies.append(latency_ms(event))
+            if slow:
+                await asyncio.sleep(0.05)
+
+    consumers = []
+    for i in range(subscribers):
+        subscriber = broker.subscribe({str(patients[i % len(patients)])}, alerts_only=i % 10 == 0)
+        consumers.append(asyncio.create_task(consume(subscriber, slow=i % 50 == 0)))
+
+    publish_seconds = 0.0
+    started = time.perf_counter()
+    for offset in range(0, readings, batch):
+        documents = make_batch(patients, batch, offset)
+        publish_started = time.perf_counter()
+        broker.publish(documents)
+        publish_seconds += time.perf_counter() - publish_started
+        await asyncio.sleep(0)  # let consumers drain, as the event loop would between requests
+    while any(not s.queue.empty() for s in broker._subscribers if s.dropped == 0):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    print(f"{subscribers} subscribers over {len(patients)} patients, {readings} readings")
+    print(f"publish: {publish_seconds * 1000 / (readings / batch):.2f} ms per {batch}-reading batch")
+    summarize(latencies, received, elapsed)
+    print("broker:", broker.stats())
+    for task in consumers:
+        task.cancel()
+
+async def over_http(url: str, subscribers: int, readings: int, batch: int):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=url, timeout=None,
+                                 limits=httpx.Limits(max_connections=subscribers + 10)) as client:
+        token = (await client.post("/api/v1/auth/login",
+                                   data={"username": "nurse", "password": "nurse123"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        patients = []
+        for bed in range(max(subscribers // PER_PATIENT, 1)):
+            # Readings for unknown patients are rejected, so followed beds need real patients
+            response = await client.post("/api/v1/patients/", headers=headers, json={"personalInfo": {
+                "firstName": "Bed", "lastName": str(bed), "dateOfBirth": "1970-01-01T00:00:00", "gender": "other",
+                "phone": "555-0100", "emergencyContact": {"name": "Contact", "relationship": "spouse", "phone": "555-0101"},
+                "address": {"street": "1 Main St", "city": "Springfield", "state": "IL", "zipCode": "62701"},
+            }})
+            response.raise_for_status()
+            patients.append(response.json()["id"])
+        latencies = []
+        received = 0
+        ready = 0
+
+        async def listen(patient_id: str):
+            nonlocal received, ready
+            params = {"patientIds": patient_id}
+            async with client.stream("GET", "/api/v1/vitals/stream", params=params, headers=headers) as response:
+                ready += 1
+                async for line in response.aiter_lines():
+                    if line.startswith("data: "):
+                        received += 1
+                        data = json.loads(line[6:])
+                        latencies.append((datetime.utcnow() - datetime.fromisoformat(data["createdAt"]))
+                                         .total_seconds() * 1000)
+
+        listeners = [asyncio.create_task(listen(patients[i % len(patients)])) for i in range(subscribers)]
+        while ready < subscribers:
+            await asyncio.sleep(0.1)
+        print(f"{subscribers} SSE connections open")
+
+        started = time.perf_counter()
+        for offset in range(0, readings, batch):
+            body = {"vitals": [{"patientId": patients[(offset + i) % len(patients)], "vitals": {"heartRate": 72}}
+                               for i in range(batch)]}
+            (await client.post("/api/v1/vitals/bulk", json=body, headers=headers)).raise_for_status()
+        expected = readings * PER_PATIENT
+        while received < expected and time.perf_counter() - started < 60:
+            await asyncio.sleep(0.05)
+        summarize(latencies, received, time.perf_counter() - started)
+        for task in listeners:
+            task.cancel()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("subscribers", type=int, nargs="?", default=5000)
+    parser.add_argument("readings", type=int, nargs="?", default=2000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--url", help="base URL of a running server")
+    args = parser.parse_args()
+    if args.url:
+        asyncio.run(over_http(args.url.rstrip("/"), args.subscribers, args.readings, args.batch))
+    else:
+        asyncio.run(in_process(args.subscribers, args.readings, args.batch))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Concurrency check for appointment booking.
+
+    cd backend && python -m benchmarks.stress_booking --attempts 20000 --concurrency 200
+    cd backend && python -m benchmarks.stress_booking --mongo mongodb://localhost:27017
+
+Fires ``attempts`` create_appointment calls, ``concurrency`` at a time, at
+random 15-60 minute ranges on one doctor-day, so almost every attempt
+collides with another. ``cancel_rate`` of the successful bookings are
+cancelled right away to keep the day contended. Afterwards the script
+checks that no two active appointments overlap, that the claimed ranges
+match the active appointments exactly, and reports attempts/s and latency.
+
+Runs against the fallback store by default, with every collection call
+yielding to the event loop first so that concurrent bookings interleave
+between their reads and writes as they would over the network. With
+``--mongo`` it uses the ``meditrack_stress`` database on that server,
+which is dropped first.
+"""
+import argparse
+import asyncio
+import inspect
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.config.database import MockDatabase
+from app.models.appointment import AppointmentCancel, AppointmentCreate, INACTIVE_APPOINTMENT_STATUSES
+from app.routes.appointments import cancel_appointment, create_appointment
+from app.services.appointment_booking import appointment_booker
+from app.services.availability import WEEKDAYS
+
+ADMIN_ID = "000000000000000000000001"
+OPEN_MINUTE = 8 * 60
+CLOSE_MINUTE = 18 * 60
+
+class Interleaved:
+    """Collection wrapper that yields to the event loop before each awaited call"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if not inspect.iscoroutinefunction(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return await attribute(*args, **kwargs)
+        return call
+
+class InterleavedDatabase(MockDatabase):
+    def __getattr__(self, name):
+        return Interleaved(super().__getattr__(name))
+
+async def open_database(mongo_url):
+    if not mongo_url:
+        return InterleavedDatabase(), None
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(mongo_url)
+    await client.drop_database("meditrack_stress")
+    return client.get_database("meditrack_stress"), client
+
+async def seed(db, patients: int):
+    doctor_id = ObjectId()
+    hours = {"startTime": "08:00", "endTime": "18:00", "available": True}
+    await db.doctors.insert_one({
+        "_id": doctor_id, "licenseNumber": f"STRESS{doctor_id}", "specialization": ["cardiology"],
+        "department": "Cardiology", "schedule": {day: hours for day in WEEKDAYS}, "isAvailable": True,
+    })
+    patient_ids = [ObjectId() for _ in range(patients)]
+    await db.patients.insert_many([
+        {"_id": patient_id, "patientId": f"PSTRESS{index:06d}", "isActive": True, "createdAt": datetime.utcnow()}
+        for index, patient_id in enumerate(patient_ids)
+    ])
+    return doctor_id, patient_ids
+
+async def verify(db, doctor_id: ObjectId, day: datetime):
+    active = await db.appointments.find({
+        "doctorId": doctor_id,
+        "scheduledDate": {"$gte": day, "$lt": day + timedelta(days=1)},
+        "status": {"$nin": list(INACTIVE_APPOINTMENT_STATUSES)},
+    }).to_list(None)
+    ranges = sorted((a["scheduledDate"], a["scheduledDate"] + timedelta(minutes=a["duration"]), a["_id"]) for a in active)
+    overlaps = sum(1 for before, after in zip(ranges, ranges[1:]) if after[0] < before[1])
+    claimed = await db.appointment_days.find_one({"_id": f"{doctor_id}:{day:%Y-%m-%d}"}) or {}
+    claims_match = sorted(str(slot["appointmentId"]) for slot in claimed.get("slots", [])) == \
+        sorted(str(a["_id"]) for a in active)
+    booked = sum((end - start for start, end, _ in ranges), timedelta()) // timedelta(minutes=1)
+    return len(active), overlaps, claims_match, booked
+
+async def run(args):
+    random.seed(args.seed)
+    db, client = await open_database(args.mongo)
+    doctor_id, patient_ids = await seed(db, 200)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    day = today + timedelta(days=2)
+
+    outcomes = {"booked": 0, "conflict": 0, "cancelled": 0, "error": 0}
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def attempt():
+        duration = random.choice([15, 30, 45, 60])
+        start = random.randrange(OPEN_MINUTE, CLOSE_MINUTE - duration + 1, 15)
+        request = AppointmentCreate(
+            patientId=str(random.choice(patient_ids)), doctorId=str(doctor_id),
+            scheduledDate=day + timedelta(minutes=start), duration=duration,
+        )
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                created = await create_appointment(request, db=db, current_user_id=ADMIN_ID, _="admin")
+                outcomes["booked"] += 1
+                if random.random() < args.cancel_rate:
+                    await cancel_appointment(created.id, AppointmentCancel(), db=db,
+                                             current_user_id=ADMIN_ID, _="admin")
+                    outcomes["cancelled"] += 1
+            except HTTPException as e:
+                outcomes["conflict" if e.status_code == 409 else "error"] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(attempt() for _ in range(args.attempts)))
+    elapsed = time.perf_counter() - started
+
+    active, overlaps, claims_match, booked = await verify(db, doctor_id, day)
+    latencies.sort()
+    print(f"{'MongoDB' if args.mongo else 'fallback store'}: {args.attempts:,} attempts on one doctor-day, "
+          f"{args.concurrency} in flight")
+    print(f"    {args.attempts / elapsed:,.0f} attempts/s  p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+          f"p99={latencies[int(len(latencies) * .99)] * 1000:.1f}ms")
+    print(f"    booked={outcomes['booked']} cancelled={outcomes['cancelled']} conflicts={outcomes['conflict']} "
+          f"errors={outcomes['error']}")
+    print(f"    active={active} ({booked} of {CLOSE_MINUTE - OPEN_MINUTE} minutes) overlaps={overlaps} "
+          f"claims match appointments={claims_match}")
+    print(f"    booker: {appointment_booker.stats()}")
+    if client is not None:
+        await client.drop_database("meditrack_stress")
+        client.close()
+    if overlaps or not claims_match or outcomes["error"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--attempts", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--cancel-rate", type=float, default=0.3)
+    parser.add_argument("--mongo", help="MongoDB URL; defaults to the fallback store")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,76 @@
+"""Concurrency check for patient ID generation.
+
+    cd backend && python -m benchmarks.stress_patient_ids --creates 5000 --processes 8
+
+1. Several processes, each with its own node number, mint IDs as fast as
+   they can. The script checks that all IDs are unique, that each process
+   produced them in sorted order, and reports throughput.
+2. Thousands of simultaneous create_patient calls run against the fallback
+   store. The script checks that every call succeeded with a distinct
+   patientId and reports latency.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from app.config.database import MockDatabase
+from app.models.patient import PatientCreate
+from app.routes.patients import create_patient
+from app.services.patient_ids import PatientIdGenerator
+
+ADMIN_ID = "000000000000000000000001"
+
+def mint(node_id: int, count: int):
+    generator = PatientIdGenerator(node_id)
+    ids = [generator.next_id() for _ in range(count)]
+    return ids, ids == sorted(ids)
+
+def check_processes(processes: int, per_process: int):
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(mint, range(processes), [per_process] * processes))
+    elapsed = time.perf_counter() - started
+    all_ids = [patient_id for ids, _ in results for patient_id in ids]
+    print(f"{processes} processes x {per_process:,} ids: unique={len(set(all_ids)) == len(all_ids)} "
+          f"sorted={all(ordered for _, ordered in results)} ({len(all_ids) / elapsed:,.0f} ids/s incl. startup)")
+
+def patient_payload(i: int) -> PatientCreate:
+    return PatientCreate(personalInfo={
+        "firstName": f"Stress{i}", "lastName": "Test", "dateOfBirth": datetime(1980, 1, 1),
+        "gender": "other", "phone": "+10000000000",
+        "emergencyContact": {"name": "Contact", "relationship": "friend", "phone": "+10000000001"},
+        "address": {"street": "1 Main St", "city": "Springfield", "state": "IL", "zipCode": "62701"},
+    })
+
+async def check_creates(creates: int):
+    db = MockDatabase()
+    payloads = [patient_payload(i) for i in range(creates)]
+    latencies = []
+
+    async def create(payload):
+        started = time.perf_counter()
+        response = await create_patient(payload, return_document=False, db=db,
+                                        current_user_id=ADMIN_ID, _="admin")
+        latencies.append(time.perf_counter() - started)
+        return response.patientId
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(create(payload) for payload in payloads), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    errors = [r for r in results if isinstance(r, Exception)]
+    ids = [r for r in results if not isinstance(r, Exception)]
+    latencies.sort()
+    print(f"{creates:,} simultaneous creates: errors={len(errors)} unique={len(set(ids)) == len(ids)} "
+          f"p50={latencies[len(latencies) // 2] * 1000:.2f}ms p99={latencies[int(len(latencies) * .99)] * 1000:.2f}ms "
+          f"total={elapsed:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--creates", type=int, default=5000)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--per-process", type=int, default=50000)
+    args = parser.parse_args()
+    check_processes(args.processes, args.per_process)
+    asyncio.run(check_creates(args.creates))
@@ -0,0 +1,24 @@
+"""Add normalized search keys to patients created before search indexing.
+
+    cd backend && python -m scripts.backfill_search_keys
+"""
+import asyncio
+import logging
+
+from app.config.database import close_mongo_connection, connect_to_mongo, get_database
+from app.services.patient_search import backfill_search_documents
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main():
+    await connect_to_mongo()
+    try:
+        db = await get_database()
+        updated = await backfill_search_documents(db)
+        logger.info(f"Backfilled search keys for {updated} patients")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
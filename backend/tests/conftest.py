@@ -0,0 +1,19 @@
+import pytest
+
+from app.config.indexes import INDEX_REGISTRY
+from app.config.mock_engine import MockCollection
+
+ADMIN_ID = "000000000000000000000001"
+
+class Database(dict):
+    """Fresh fallback collections, with the indexes the app declares"""
+
+    def __missing__(self, name):
+        return self.setdefault(name, MockCollection(name, [], INDEX_REGISTRY.get(name, [])))
+
+    def __getattr__(self, name):
+        return self[name]
+
+@pytest.fixture
+def db():
+    return Database()
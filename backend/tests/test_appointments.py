@@ -0,0 +1,89 @@
+"""Appointment booking: the doctor's current schedule and one winner per contended slot."""
+import asyncio
+import inspect
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.models.appointment import AppointmentCreate
+from app.routes.appointments import create_appointment
+from app.services.availability import WEEKDAYS, availability_index
+from tests.conftest import ADMIN_ID
+
+class Interleaved(dict):
+    """Collections that yield to the event loop before every awaited call, as a network round trip would"""
+
+    def __init__(self, db):
+        super().__init__()
+        self._db = db
+
+    def __missing__(self, name):
+        collection = self._db[name]
+
+        class Collection:
+            def __getattr__(self, attribute):
+                value = getattr(collection, attribute)
+                if not inspect.iscoroutinefunction(value):
+                    return value
+
+                async def call(*args, **kwargs):
+                    await asyncio.sleep(0)
+                    return await value(*args, **kwargs)
+                return call
+
+        return self.setdefault(name, Collection())
+
+    def __getattr__(self, name):
+        return self[name]
+
+def working(start: str, end: str):
+    return {day: {"startTime": start, "endTime": end, "available": True} for day in WEEKDAYS}
+
+async def seed(db):
+    doctor_id, patient_id = ObjectId(), ObjectId()
+    await db.doctors.insert_one({"_id": doctor_id, "specialization": ["cardiology"], "department": "Cardiology",
+                                 "schedule": working("08:00", "18:00"), "isAvailable": True})
+    await db.patients.insert_one({"_id": patient_id, "patientId": "PTEST000001", "isActive": True})
+    return doctor_id, patient_id
+
+def request(doctor_id, patient_id, hour: int, duration: int = 30) -> AppointmentCreate:
+    day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=2)
+    return AppointmentCreate(patientId=str(patient_id), doctorId=str(doctor_id),
+                             scheduledDate=day + timedelta(hours=hour), duration=duration)
+
+def test_booking_uses_the_stored_schedule_not_the_cached_roster(db):
+    async def scenario():
+        doctor_id, patient_id = await seed(db)
+        # Slot searches cache the roster with the old hours
+        await availability_index.roster(db)
+        await db.doctors.update_one({"_id": doctor_id}, {"$set": {"schedule": working("12:00", "18:00")}})
+        with pytest.raises(HTTPException) as rejected:
+            await create_appointment(request(doctor_id, patient_id, 9), db=db, current_user_id=ADMIN_ID, _="admin")
+        assert rejected.value.status_code == 400
+        created = await create_appointment(request(doctor_id, patient_id, 13), db=db,
+                                           current_user_id=ADMIN_ID, _="admin")
+        assert created.doctorId == str(doctor_id)
+
+    asyncio.run(scenario())
+
+def test_concurrent_overlapping_bookings_have_one_winner(db):
+    async def scenario():
+        doctor_id, patient_id = await seed(db)
+        interleaved = Interleaved(db)
+        # Ten 60-minute requests at 10:00 and ten 30-minute ones at 10:30 all overlap each other
+        requests = [request(doctor_id, patient_id, 10, 60) for _ in range(10)]
+        requests += [request(doctor_id, patient_id, 10, 30) for _ in range(10)]
+        for later in requests[10:]:
+            later.scheduledDate += timedelta(minutes=30)
+        results = await asyncio.gather(*(
+            create_appointment(booking, db=interleaved, current_user_id=ADMIN_ID, _="admin")
+            for booking in requests
+        ), return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        assert len(results) - len(failures) == 1
+        assert all(isinstance(failure, HTTPException) and failure.status_code == 409 for failure in failures)
+        assert len(db.appointments.docs) == 1
+
+    asyncio.run(scenario())
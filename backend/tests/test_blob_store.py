@@ -0,0 +1,104 @@
+"""Garbage collection finishes interrupted deletions and never costs a new upload its file."""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from app.services.blob_store import COLLECT_STALE_SECONDS, BlobGone, BlobStore
+
+SHA = "ab" * 32
+
+def make_store(tmp_path) -> BlobStore:
+    return BlobStore(str(tmp_path), max_size=2 ** 20, chunk_size=65536, gc_interval=3600, gc_grace=0)
+
+def write_blob(store: BlobStore, content: bytes):
+    os.makedirs(os.path.dirname(store.path(SHA)), exist_ok=True)
+    with open(store.path(SHA), "wb") as f:
+        f.write(content)
+
+def write_temp(store: BlobStore, content: bytes) -> str:
+    os.makedirs(store.temp_dir, exist_ok=True)
+    path = store.temp_path()
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+def stuck_blob(marked_at):
+    return {"_id": SHA, "size": 3, "head": "h", "refCount": 0, "collecting": True,
+            "collectingAt": marked_at, "updatedAt": datetime.utcnow() - timedelta(days=1)}
+
+def test_collect_finishes_a_stale_collection(db, tmp_path):
+    store = make_store(tmp_path)
+
+    async def failing_callback(sha256):
+        raise RuntimeError("preview directory unavailable")
+
+    store.on_collect.append(failing_callback)
+
+    async def scenario():
+        write_blob(store, b"old")
+        await db.blobs.insert_one(stuck_blob(datetime.utcnow() - timedelta(seconds=COLLECT_STALE_SECONDS + 1)))
+        result = await store.collect(db)
+        assert result["collected"] == 1
+        assert await db.blobs.find_one({"_id": SHA}) is None
+        assert not os.path.exists(store.path(SHA))
+
+    asyncio.run(scenario())
+
+def test_collect_leaves_a_live_collection_alone(db, tmp_path):
+    store = make_store(tmp_path)
+
+    async def scenario():
+        await db.blobs.insert_one(stuck_blob(datetime.utcnow()))
+        assert (await store.collect(db))["collected"] == 0
+        assert await db.blobs.find_one({"_id": SHA}) is not None
+
+    asyncio.run(scenario())
+
+def test_new_upload_outlasts_a_collection(db, tmp_path):
+    store = make_store(tmp_path)
+
+    async def scenario():
+        write_blob(store, b"new")
+        await db.blobs.insert_one(stuck_blob(datetime.utcnow()))
+        temp_path = write_temp(store, b"new")
+
+        async def finish_collection():
+            # The collector deleting the marked blob while the upload waits
+            await asyncio.sleep(0.1)
+            await store.discard(store.path(SHA))
+            await db.blobs.delete_one({"_id": SHA, "collecting": True})
+
+        collector = asyncio.create_task(finish_collection())
+        await store.acquire(db, {"sha256": SHA, "size": 3, "head": "h", "tempPath": temp_path})
+        await collector
+        blob = await db.blobs.find_one({"_id": SHA})
+        assert blob["refCount"] == 1 and not blob.get("collecting")
+        with open(store.path(SHA), "rb") as f:
+            assert f.read() == b"new"
+
+    asyncio.run(scenario())
+
+def test_new_upload_finishes_a_stale_collection(db, tmp_path):
+    store = make_store(tmp_path)
+
+    async def scenario():
+        await db.blobs.insert_one(stuck_blob(None))
+        temp_path = write_temp(store, b"new")
+        await store.acquire(db, {"sha256": SHA, "size": 3, "head": "h", "tempPath": temp_path})
+        assert (await db.blobs.find_one({"_id": SHA}))["refCount"] == 1
+        assert os.path.exists(store.path(SHA))
+
+    asyncio.run(scenario())
+
+def test_duplicate_of_a_collecting_blob_is_gone(db, tmp_path):
+    store = make_store(tmp_path)
+
+    async def scenario():
+        await db.blobs.insert_one(stuck_blob(datetime.utcnow()))
+        try:
+            await store.acquire(db, {"sha256": SHA, "size": 3, "head": "h", "tempPath": None})
+        except BlobGone:
+            return
+        raise AssertionError("duplicate referenced a blob being collected")
+
+    asyncio.run(scenario())
@@ -0,0 +1,67 @@
+"""FileRangeResponse on each ASGI send path, and for a file that vanished."""
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.file_response import FileRangeResponse
+
+CONTENT = bytes(range(256)) * 64
+
+@pytest.fixture
+def path(tmp_path):
+    target = tmp_path / "blob"
+    target.write_bytes(CONTENT)
+    return str(target)
+
+def call(response: FileRangeResponse, extensions=None):
+    messages = []
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopy":
+            # What a server would do with the descriptor
+            message = {**message, "body": os.pread(message["file"].fileno(), message["count"], message["offset"])}
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    asyncio.run(response(scope={"type": "http", "extensions": extensions or {}}, receive=receive, send=send))
+    return messages
+
+def body(messages):
+    return b"".join(message.get("body", b"") for message in messages[1:])
+
+def test_chunked_range(path):
+    response = FileRangeResponse(path, len(CONTENT), 100, 5000, 206, {}, "application/octet-stream", chunk_size=1024)
+    messages = call(response)
+    assert messages[0]["status"] == 206 and body(messages) == CONTENT[100:5000]
+    assert (b"content-range", f"bytes 100-4999/{len(CONTENT)}".encode()) in messages[0]["headers"]
+
+def test_zerocopy_range(path):
+    response = FileRangeResponse(path, len(CONTENT), 10, 20, 206, {}, "application/octet-stream")
+    messages = call(response, {"http.response.zerocopy": {}})
+    assert [message["type"] for message in messages] == ["http.response.start", "http.response.zerocopy"]
+    assert body(messages) == CONTENT[10:20]
+
+def test_pathsend_whole_file(path):
+    response = FileRangeResponse(path, len(CONTENT), 0, len(CONTENT), 200, {}, "application/octet-stream")
+    messages = call(response, {"http.response.pathsend": {}})
+    assert messages[1] == {"type": "http.response.pathsend", "path": os.path.abspath(path)}
+
+@pytest.mark.parametrize("extensions", [{}, {"http.response.zerocopy": {}}, {"http.response.pathsend": {}}])
+def test_missing_file_fails_before_the_status_is_sent(path, extensions):
+    response = FileRangeResponse(path, len(CONTENT), 0, len(CONTENT), 200, {}, "application/octet-stream")
+    os.remove(path)
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    with pytest.raises(HTTPException) as missing:
+        asyncio.run(response({"type": "http", "extensions": extensions}, receive, send))
+    assert missing.value.status_code == 404 and not messages
@@ -0,0 +1,65 @@
+"""The in-process storage engine: cursors survive writes, datetimes compare as UTC instants."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.config.mock_engine import MockCollection
+
+ORIGINAL = [f"d{i:03}" for i in range(0, 100, 2)]
+
+def build(indexed: bool) -> MockCollection:
+    collection = MockCollection("items", ({"_id": f"d{i:03}", "n": i, "group": i % 2} for i in range(100)))
+    if indexed:
+        collection.create_index([("group", 1), ("n", 1)])
+    return collection
+
+async def read_while_writing(collection: MockCollection, cursor, doomed, writes: int = 10):
+    """Each of the first ``writes`` reads inserts a document and deletes one the cursor has not reached"""
+    seen = []
+    async for doc in cursor:
+        seen.append(doc["_id"])
+        if len(seen) <= writes:
+            await collection.insert_one({"_id": f"new{len(seen):03}", "n": -len(seen), "group": 0})
+            if doomed:
+                await collection.delete_one({"_id": doomed[len(seen) - 1]})
+    return seen
+
+def surviving(collection: MockCollection):
+    return [doc_id for doc_id in ORIGINAL if doc_id in collection.docs]
+
+def test_full_scan_survives_inserts_and_deletes():
+    for doomed in ((), ORIGINAL[::-1]):
+        collection = build(indexed=False)
+        seen = asyncio.run(read_while_writing(collection, collection.find({"group": 0}), doomed))
+        assert len(seen) == len(set(seen))
+        assert set(surviving(collection)) <= set(seen)
+
+def test_index_walk_neither_skips_nor_repeats():
+    for direction in (1, -1):
+        collection = build(indexed=True)
+        cursor = collection.find({"group": 0, "n": {"$gte": 0}}).sort("n", direction)
+        seen = asyncio.run(read_while_writing(collection, cursor, ORIGINAL[::-direction]))
+        assert seen == surviving(collection)[::direction]
+
+def test_slice_projection():
+    collection = MockCollection("items", [{"_id": 1, "values": [1, 2, 3, 4], "other": True}])
+    assert asyncio.run(collection.find_one({"_id": 1}, {"values": {"$slice": -1}})) == {
+        "_id": 1, "values": [4], "other": True}
+    assert asyncio.run(collection.find_one({"_id": 1}, {"other": 1, "values": {"$slice": [1, 2]}})) == {
+        "_id": 1, "values": [2, 3], "other": True}
+
+def test_aware_datetimes_compare_as_utc():
+    collection = MockCollection("events", [])
+    collection.create_index([("at", 1)])
+    plus_five = timezone(timedelta(hours=5))
+    asyncio.run(collection.insert_many([
+        {"_id": 1, "at": datetime(2025, 1, 1, 10)},
+        # 12:00 at UTC+5 is 07:00 UTC, before the naive 10:00 UTC value
+        {"_id": 2, "at": datetime(2025, 1, 1, 12, tzinfo=plus_five)},
+        {"_id": 3, "at": datetime(2025, 1, 1, 11)},
+    ]))
+    ordered = asyncio.run(collection.find().sort("at", 1).to_list(None))
+    assert [doc["_id"] for doc in ordered] == [2, 1, 3]
+    after = asyncio.run(collection.find({"at": {"$gte": datetime(2025, 1, 1, 14, 30, tzinfo=plus_five)}}).to_list(None))
+    assert sorted(doc["_id"] for doc in after) == [1, 3]
+    same = asyncio.run(collection.find_one({"at": datetime(2025, 1, 1, 7)}))
+    assert same["_id"] == 2
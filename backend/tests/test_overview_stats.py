@@ -0,0 +1,45 @@
+"""Reconciling the overview counters keeps recent deltas and stays out of the request path."""
+import asyncio
+
+from app.services.overview_stats import OverviewStats
+
+def test_deltas_recorded_during_recount_survive(db, monkeypatch):
+    stats = OverviewStats(flush_interval_ms=1000, reconcile_interval=60, cache_ttl=1, appointment_days=7)
+    stats.record({"activePatients": 5})
+    recount = stats._recount
+
+    async def slow_recount(database):
+        counts = await recount(database)
+        # A write lands while the recount is in flight
+        stats.record({"activePatients": 1})
+        await asyncio.sleep(0)
+        return counts
+
+    monkeypatch.setattr(stats, "_recount", slow_recount)
+    asyncio.run(stats.reconcile(db))
+    assert stats._pending == {"activePatients": 1}
+
+def test_first_overview_does_not_recount_inline(db, monkeypatch):
+    stats = OverviewStats(flush_interval_ms=1000, reconcile_interval=60, cache_ttl=60, appointment_days=7)
+    asyncio.run(db.patients.insert_one({"patientId": "P1", "isActive": True}))
+
+    async def scenario():
+        release = asyncio.Event()
+        recount = stats._recount
+
+        async def slow_recount(database):
+            await release.wait()
+            return await recount(database)
+
+        monkeypatch.setattr(stats, "_recount", slow_recount)
+        first = await stats.overview(db)
+        assert first["reconciling"] and first["activePatients"] == 0
+        # A second request does not start another recount
+        await stats.overview(db)
+        release.set()
+        await stats._reconcile_task
+        return await stats.overview(db)
+
+    settled = asyncio.run(scenario())
+    assert not settled["reconciling"] and settled["activePatients"] == 1
+    assert stats.reconciles == 1
@@ -0,0 +1,43 @@
+"""Keyset cursors combine with the caller's own createdAt bounds and compound filters."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from app.utils.pagination import KEYSET_SORT, encode_cursor, keyset_filter
+
+def page_after(db, query, last):
+    return asyncio.run(db.patients.find(keyset_filter(query, encode_cursor(last))).sort(KEYSET_SORT).to_list(None))
+
+def seed(db, count):
+    start = datetime(2025, 1, 1)
+    patients = [{"_id": ObjectId(), "createdAt": start + timedelta(hours=i), "isActive": i % 2 == 0,
+                 "gender": "female" if i % 3 else "male"} for i in range(count)]
+    for patient in patients:
+        asyncio.run(db.patients.insert_one(patient))
+    return patients
+
+def test_aware_lower_bound_is_compared_in_utc(db):
+    patients = seed(db, 6)
+    # 02:00 in UTC+5 is 21:00 the previous day in UTC, before every patient
+    bound = datetime(2025, 1, 1, 2, tzinfo=timezone(timedelta(hours=5)))
+    page = page_after(db, {"createdAt": {"$gte": bound}}, patients[2])
+    assert [p["_id"] for p in page] == [p["_id"] for p in patients[3:]]
+
+def test_later_aware_lower_bound_wins_over_the_cursor(db):
+    patients = seed(db, 6)
+    bound = (patients[4]["createdAt"] + timedelta(hours=3)).replace(tzinfo=timezone(timedelta(hours=3)))
+    page = page_after(db, {"createdAt": {"$gte": bound}}, patients[1])
+    assert [p["_id"] for p in page] == [p["_id"] for p in patients[4:]]
+
+def test_non_datetime_bound_does_not_raise(db):
+    patients = seed(db, 3)
+    query = keyset_filter({"createdAt": {"$gte": "2025-01-01"}}, encode_cursor(patients[0]))
+    assert query["createdAt"] == {"$gte": "2025-01-01"}
+    assert {"createdAt": {"$gte": patients[0]["createdAt"]}} in query["$and"]
+
+def test_existing_and_is_kept(db):
+    patients = seed(db, 9)
+    query = {"$and": [{"isActive": True}], "$or": [{"gender": "female"}, {"gender": "male"}]}
+    page = page_after(db, query, patients[2])
+    assert [p["_id"] for p in page] == [p["_id"] for p in patients[3:] if p["isActive"]]
@@ -0,0 +1,47 @@
+"""Patient IDs stay unique under concurrent creates."""
+import asyncio
+from datetime import datetime
+
+from app.models.patient import PatientCreate
+from app.routes.patients import create_patient
+from app.services.patient_ids import PatientIdGenerator, patient_id_generator
+from tests.conftest import ADMIN_ID
+
+def payload(i: int) -> PatientCreate:
+    return PatientCreate(personalInfo={
+        "firstName": f"Concurrent{i}", "lastName": "Test", "dateOfBirth": datetime(1980, 1, 1),
+        "gender": "other", "phone": "+10000000000",
+        "emergencyContact": {"name": "Contact", "relationship": "friend", "phone": "+10000000001"},
+        "address": {"street": "1 Main St", "city": "Springfield", "state": "IL", "zipCode": "62701"},
+    })
+
+async def create_many(db, count: int):
+    return await asyncio.gather(*(
+        create_patient(payload(i), return_document=False, db=db, current_user_id=ADMIN_ID, _="admin")
+        for i in range(count)
+    ))
+
+def test_concurrent_creates_get_distinct_ids(db):
+    responses = asyncio.run(create_many(db, 500))
+    ids = [response.patientId for response in responses]
+    assert len(set(ids)) == len(ids) == 500
+    assert sorted(doc["patientId"] for doc in db.patients.docs.values()) == sorted(ids)
+
+def test_generators_on_one_node_never_repeat():
+    generator = PatientIdGenerator(3)
+    ids = [generator.next_id() for _ in range(20000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+
+def test_colliding_id_is_retried(db, monkeypatch):
+    # Another worker with the same node number already stored the next ID
+    taken = patient_id_generator.next_id()
+    asyncio.run(db.patients.insert_one({"patientId": taken}))
+    issued = [taken]
+    original = patient_id_generator.next_id
+    monkeypatch.setattr(patient_id_generator, "next_id",
+                        lambda: issued.pop() if issued else original())
+    response = asyncio.run(create_patient(payload(0), return_document=False, db=db,
+                                          current_user_id=ADMIN_ID, _="admin"))
+    assert response.patientId != taken
+    assert len(db.patients.docs) == 2
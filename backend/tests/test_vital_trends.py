@@ -0,0 +1,28 @@
+"""Trend ranges are bounded at every resolution, including the coarsest."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.routes.analytics import get_vitals_trends
+from app.services.vital_trends import vital_rollups
+from tests.conftest import ADMIN_ID
+
+def trends(db, start, end, resolution=None):
+    return asyncio.run(get_vitals_trends(
+        patientId=str(ObjectId()), metrics=[], start=start, end=end, resolution=resolution,
+        points=500, percentiles=[50], db=db, current_user_id=ADMIN_ID, _="doctor"
+    ))
+
+def test_range_past_the_daily_limit_is_rejected(db):
+    end = datetime(2025, 1, 1)
+    with pytest.raises(HTTPException) as error:
+        trends(db, end - timedelta(days=vital_rollups.max_buckets + 1), end)
+    assert error.value.status_code == 400
+
+def test_longest_daily_range_is_served(db):
+    end = datetime(2025, 1, 1)
+    response = trends(db, end - timedelta(days=vital_rollups.max_buckets), end)
+    assert response.resolution == "1d"
@@ -0,0 +1,53 @@
+"""Bulk ingest rejects unknown patients and leaves rollup upkeep to a background flush."""
+import asyncio
+
+from bson import ObjectId
+
+from app.models.vital import VitalsBulkCreate
+from app.routes.vitals import record_vitals_bulk
+from app.services import vitals_ingest
+from app.services.vital_trends import MATERIALIZED, VitalRollups
+from tests.conftest import ADMIN_ID
+
+def test_unknown_patients_are_rejected_by_index(db):
+    known = ObjectId()
+    asyncio.run(db.patients.insert_one({"_id": known, "patientId": "P1"}))
+    readings = [{"patientId": str(patient_id), "vitals": {"heartRate": 70}}
+                for patient_id in (known, ObjectId(), known, ObjectId())]
+    response = asyncio.run(record_vitals_bulk(VitalsBulkCreate(vitals=readings), db=db,
+                                              current_user_id=ADMIN_ID, _="nurse"))
+    assert response.inserted == 2
+    assert [(rejection.index, rejection.reason) for rejection in response.rejected] == [
+        (1, "Patient not found"), (3, "Patient not found")
+    ]
+
+def ingest(db, readings):
+    return asyncio.run(record_vitals_bulk(VitalsBulkCreate(vitals=readings), db=db,
+                                          current_user_id=ADMIN_ID, _="nurse"))
+
+def test_rollups_are_folded_in_after_the_request(db, monkeypatch):
+    rollups = VitalRollups(5000, 360)
+    monkeypatch.setattr(vitals_ingest, "vital_rollups", rollups)
+    patient_id = ObjectId()
+    asyncio.run(db.patients.insert_one({"_id": patient_id, "patientId": "P1"}))
+    response = ingest(db, [{"patientId": str(patient_id), "vitals": {"heartRate": rate}} for rate in (60, 80)])
+    assert response.inserted == 2
+    assert not db["vital_rollups"].docs and rollups.stats()["queueDepth"] == 2
+
+    asyncio.run(rollups.flush(db))
+    hourly = asyncio.run(db["vital_rollups"].find_one({"patientId": patient_id, "resolution": "1h"}))
+    assert hourly["metrics"]["heartRate"]["n"] == 2
+
+def test_failed_rollup_writes_do_not_fail_the_request(db, monkeypatch):
+    rollups = VitalRollups(5000, 360)
+    monkeypatch.setattr(vitals_ingest, "vital_rollups", rollups)
+
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("rollups unavailable")
+
+    monkeypatch.setattr(db["vital_rollups"], "bulk_write", unavailable)
+    patient_id = ObjectId()
+    asyncio.run(db.patients.insert_one({"_id": patient_id, "patientId": "P1"}))
+    assert ingest(db, [{"patientId": str(patient_id), "vitals": {"heartRate": 70}}]).inserted == 1
+    asyncio.run(rollups.flush(db))
+    assert rollups.stats()["failed"] == len(MATERIALIZED) and rollups.stats()["queueDepth"] == 0
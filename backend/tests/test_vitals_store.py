@@ -0,0 +1,31 @@
+"""Both vitals layouts find a patient's latest reading, however readings arrived."""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.services.vitals_store import BucketedVitalsStore, DocumentVitalsStore
+
+HOUR = datetime(2026, 1, 1, 8)
+
+def reading(patient_id, minute: int):
+    moment = HOUR + timedelta(minutes=minute)
+    return {"patientId": patient_id, "recordedBy": ObjectId(), "vitals": {"heartRate": 60 + minute},
+            "alerts": [], "recordedAt": moment, "createdAt": moment}
+
+async def latest_after(store, db, patient_id, minutes):
+    await store.insert_batch(db, [reading(patient_id, minute) for minute in minutes])
+    found = await store.latest(db, patient_id)
+    return found and found["recordedAt"]
+
+def test_latest_reading_in_every_layout(db):
+    patient_id = ObjectId()
+    for store in (DocumentVitalsStore(), BucketedVitalsStore(max_readings=5)):
+        assert asyncio.run(store.latest(db, patient_id)) is None
+        # In order, then an older reading arriving last
+        assert asyncio.run(latest_after(store, db, patient_id, [1, 2, 3])) == HOUR + timedelta(minutes=3)
+        assert asyncio.run(latest_after(store, db, patient_id, [0])) == HOUR + timedelta(minutes=3)
+        # Fills the hour's bucket; the next readings go to an overflow bucket, out of order
+        assert asyncio.run(latest_after(store, db, patient_id, [4])) == HOUR + timedelta(minutes=4)
+        assert asyncio.run(latest_after(store, db, patient_id, [6, 5])) == HOUR + timedelta(minutes=6)
+        assert asyncio.run(latest_after(store, db, patient_id, [61])) == HOUR + timedelta(minutes=61)
@@ -0,0 +1,85 @@
+"""The broker falls back to local publishing whenever the change stream stops."""
+import asyncio
+
+from pymongo.errors import OperationFailure
+
+from app.config.settings import settings
+from app.services.vitals_stream import VitalsBroker
+
+class Stream:
+    def __init__(self, changes):
+        self.changes = changes
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.changes:
+            # Idle stream: wait for the next change
+            await asyncio.sleep(3600)
+        change = self.changes.pop(0)
+        self.resume_token = {"_data": str(id(change))}
+        return change
+
+class Collection:
+    def __init__(self, watches):
+        self.watches = watches
+        self.options = []
+
+    def watch(self, pipeline, **options):
+        self.options.append(options)
+        outcome = self.watches.pop(0) if self.watches else []
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Stream(outcome)
+
+class Database(dict):
+    def __missing__(self, name):
+        raise KeyError(name)
+
+def run_broker(broker, collection, monkeypatch, seconds=0.05):
+    monkeypatch.setattr(settings, "MONGO_RECONNECT_INTERVAL_SECONDS", 0.01)
+    database = Database(vitals=collection)
+
+    async def get_database():
+        return database
+
+    async def scenario():
+        broker.start(get_database)
+        await asyncio.sleep(seconds)
+        alive = not broker._task.done()
+        source = broker.source
+        await broker.stop()
+        return alive, source
+
+    return asyncio.run(scenario())
+
+def test_unexpected_change_falls_back_to_local_publishing(monkeypatch):
+    broker = VitalsBroker(10, 10)
+    # A change without a patient cannot be published; the second watch stays open
+    collection = Collection([[{"operationType": "insert", "fullDocument": {"vitals": {}}}], []])
+    alive, source = run_broker(broker, collection, monkeypatch)
+    assert alive and source == "change_stream"
+    assert broker.errors == 1 and len(collection.options) == 2
+
+def test_dead_stream_publishes_locally(monkeypatch):
+    broker = VitalsBroker(10, 10)
+    collection = Collection([[{"operationType": "insert", "fullDocument": {"vitals": {}}}]] +
+                            [OperationFailure("not a replica set", code=40573)] * 10)
+    alive, source = run_broker(broker, collection, monkeypatch)
+    assert alive and source == "local"
+
+def test_lost_history_drops_the_resume_token(monkeypatch):
+    broker = VitalsBroker(10, 10)
+    broker._resume_token = {"_data": "stale"}
+    collection = Collection([OperationFailure("history lost", code=286), []])
+    run_broker(broker, collection, monkeypatch)
+    assert collection.options[0] == {"resume_after": {"_data": "stale"}}
+    assert collection.options[1] == {}